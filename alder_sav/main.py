@@ -1,30 +1,20 @@
 import sys
 import logging
-from pathlib import Path
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtCore import Qt
 from sqlalchemy.orm import sessionmaker
 
 # Imports absolus
-from alder_sav.config.settings import LOG_CONFIG, APP_NAME, APP_VERSION
+from alder_sav.config.settings import APP_NAME, APP_VERSION
 from alder_sav.database.models import init_db
 from alder_sav.ui.main_window import MainWindow
 
 def setup_logging():
     """Configuration du système de logging"""
     try:
-        log_dir = Path(LOG_CONFIG['file']).parent
-        log_dir.mkdir(parents=True, exist_ok=True)
-        
-        logging.basicConfig(
-            level=getattr(logging, LOG_CONFIG['level']),
-            format=LOG_CONFIG['format'],
-            handlers=[
-                logging.FileHandler(LOG_CONFIG['file']),
-                logging.StreamHandler()
-            ]
-        )
-        logging.info("Configuration du logging terminée")
+        # L'instance unique installe la file de logs (écriture dans un thread dédié)
+        from alder_sav.utils.logger import logger as app_logger
+        app_logger.info("Configuration du logging terminée")
     except Exception as e:
         print(f"Erreur lors de la configuration du logging: {str(e)}")
         raise
@@ -1,13 +1,24 @@
 import logging
-import logging.handlers
 import os
 from pathlib import Path
 from datetime import datetime
 
+from log_pipeline import log_pipeline
+
 from ..config.settings import LOG_CONFIG
 
+# Valeurs par défaut des clés absentes de LOG_CONFIG
+DEFAULT_MAX_SIZE = 10 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+
 class Logger:
-    """Gestionnaire de logs de l'application."""
+    """Gestionnaire de logs de l'application.
+    
+    Les appels ne font que déposer l'enregistrement dans une file ; un
+    QueueListener écrit le fichier (JSON, avec rotation) et la console dans
+    son propre thread, pour ne jamais bloquer l'interface sur le disque.
+    """
     
     def __init__(self):
         """Initialise le gestionnaire de logs."""
@@ -18,23 +29,19 @@ class Logger:
         log_dir = Path(LOG_CONFIG['file']).parent
         log_dir.mkdir(parents=True, exist_ok=True)
         
-        # Configuration du format
-        formatter = logging.Formatter(LOG_CONFIG['format'])
-        
-        # Handler pour fichier avec rotation
-        file_handler = logging.handlers.RotatingFileHandler(
+        # File de logs partagée avec l'application web (log_pipeline) : fichier
+        # JSON avec rotation et console, écrits par le thread du QueueListener
+        log_pipeline.install(LOG_CONFIG['level'])
+        log_pipeline.add_file(
             LOG_CONFIG['file'],
-            maxBytes=LOG_CONFIG['max_size'],
-            backupCount=LOG_CONFIG['backup_count'],
-            encoding='utf-8'
+            max_bytes=LOG_CONFIG.get('max_size', DEFAULT_MAX_SIZE),
+            backup_count=LOG_CONFIG.get('backup_count', DEFAULT_BACKUP_COUNT)
         )
-        file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
-        
-        # Handler pour console
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
-        self.logger.addHandler(console_handler)
+        log_pipeline.add_console(fmt=LOG_CONFIG['format'])
+    
+    def shutdown(self):
+        """Écrit les enregistrements encore en file puis arrête le thread d'écriture."""
+        log_pipeline.stop()
     
     def debug(self, message: str, **kwargs):
         """Enregistre un message de niveau DEBUG.
@@ -93,7 +100,7 @@ class Logger:
             'timestamp': datetime.now().isoformat(),
             **kwargs
         }
-        self.logger.log(level, message, extra=extra)
+        self.logger.log(level, message, extra=extra, stacklevel=3)
     
     def get_log_file(self) -> Path:
         """Retourne le chemin du fichier de log actuel.
@@ -117,7 +124,7 @@ class Logger:
             log_files.append(Path(LOG_CONFIG['file']))
         
         # Fichiers de backup
-        for i in range(1, LOG_CONFIG['backup_count'] + 1):
+        for i in range(1, LOG_CONFIG.get('backup_count', DEFAULT_BACKUP_COUNT) + 1):
             backup_file = log_dir / f"{Path(LOG_CONFIG['file']).stem}.{i}"
             if os.path.exists(backup_file):
                 log_files.append(backup_file)
@@ -133,16 +140,18 @@ class Logger:
             except Exception as e:
                 self.error(f"Erreur lors de la suppression du fichier de log {log_file} : {str(e)}")
     
-    def set_level(self, level: str):
-        """Change le niveau de log.
+    def set_level(self, level: str, module: str = None):
+        """Change le niveau de log, à chaud.
         
         Args:
             level: Nouveau niveau de log (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+            module: Logger à régler (ex. 'alder_sav.database') ; par défaut 'alder_sav'
         """
         level = level.upper()
         if level in ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']:
-            self.logger.setLevel(getattr(logging, level))
-            self.info(f"Niveau de log changé pour {level}")
+            target = logging.getLogger(module) if module else self.logger
+            target.setLevel(getattr(logging, level))
+            self.info(f"Niveau de log changé pour {level}", logger_name=target.name)
         else:
             self.error(f"Niveau de log invalide : {level}")
 
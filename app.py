@@ -1,21 +1,37 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, current_app, Response, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, current_app, Response, session, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash
 from urllib.parse import urlparse
 from datetime import datetime, timezone, timedelta, time
 import os
 from werkzeug.utils import secure_filename
-import csv
-from io import StringIO
-from fpdf import FPDF
 import logging
+import tempfile
 from functools import wraps
-from io import BytesIO
+from sqlalchemy.orm import selectinload
 
 from extensions import db, login_manager
-from models import User, Client, Ticket, Product, Message, ReceptionLog, Attachment, UserAction, Settings
-from notifications import init_mail, notify_new_ticket, notify_status_change, notify_anomaly
+from models import User, Client, Ticket, Product, Message, ReceptionLog, Attachment, UserAction, Settings, TicketDailyStat, ExportJob, init_ticket_sequence
+from notifications import init_mail, notify_new_ticket, notify_status_change, notify_anomaly, notify_ticket_import, notify_status_changes
 from config import Config
+from pagination import keyset_paginate, StaticPagination
+from loaders import with_ticket_profile, ticket_loader_options
+from search_index import init_search_index, get_search_backend
+from client_index import client_index
+from ticket_filters import apply_ticket_filters
+from exports import generate_tickets_csv, render_tickets_pdf, EXPORT_MIMETYPES
+from export_jobs import export_jobs
+from presence import presence
+from audit import audit_writer, ActionCountCache
+from log_reader import LogReader
+from log_pipeline import log_pipeline
+from response_cache import response_cache
+from data_versions import init_data_versions, conditional_on
+from ticket_import import read_import_file, import_tickets
+from ticket_batch import bulk_update_status, bulk_validate_credit_notes
+from attachment_store import attachment_store
+from attachment_derivatives import attachment_derivatives, DERIVATIVES
+from attachment_delivery import send_stored_file, not_modified
 
 def create_app():
     app = Flask(__name__)
@@ -26,6 +42,17 @@ def create_app():
     db.init_app(app)
     login_manager.init_app(app)
     init_mail(app)
+    init_search_index(app)
+    export_jobs.init_app(app)
+    presence.init_app(app)
+    audit_writer.init_app(app)
+    response_cache.init_app(app)
+    init_data_versions(app)
+    init_ticket_sequence(app)
+    attachment_store.init_app(app)
+    attachment_derivatives.init_app(app)
+    action_counts = ActionCountCache(app.config['AUDIT_COUNT_TTL'])
+    log_reader = LogReader.from_config(app.config)
     
     # Décorateur pour limiter les tentatives de connexion
     def login_required_with_attempts(f):
@@ -92,8 +119,8 @@ def create_app():
     @app.before_request
     def before_request():
         if current_user.is_authenticated:
-            current_user.last_seen = datetime.now(timezone.utc)
-            db.session.commit()
+            # Mise en attente sans écriture : presence regroupe les UPDATE
+            presence.touch(current_user.id, current_user.last_seen)
     
     @app.after_request
     def after_request(response):
@@ -111,13 +138,31 @@ def create_app():
     def load_user(user_id):
         return db.session.get(User, int(user_id))
     
+    # Pagination par curseur des listes de tickets
+    def get_tickets_per_page():
+        per_page = request.args.get('per_page', type=int)
+        if not per_page:
+            settings = Settings.query.first()
+            per_page = settings.tickets_per_page if settings and settings.tickets_per_page else app.config['TICKETS_PER_PAGE']
+        return min(max(per_page, 1), 200)
+    
+    def paginate_tickets(query):
+        return keyset_paginate(
+            query,
+            Ticket.created_at,
+            Ticket.id,
+            get_tickets_per_page(),
+            after=request.args.get('after'),
+            before=request.args.get('before')
+        )
+    
     # Routes
     @app.route('/')
     @login_required_with_attempts
     @log_action('view_index')
     def index():
-        tickets = Ticket.query.order_by(Ticket.created_at.desc()).all()
-        return render_template('index.html', tickets=tickets)
+        # Tableau de bord rempli par /dashboard-data : aucun ticket chargé ici
+        return render_template('index.html')
     
     @app.route('/login', methods=['GET', 'POST'])
     def login():
@@ -234,6 +279,7 @@ def create_app():
 
     @app.route('/api/client/<int:client_id>')
     @admin_required
+    @conditional_on('client')
     def get_client(client_id):
         client = db.session.get(Client, client_id)
         if not client:
@@ -250,16 +296,16 @@ def create_app():
     @app.route('/api/check-client/<account_number>')
     @admin_required
     def check_client(account_number):
-        client = Client.query.filter_by(account_number=account_number).first()
+        client = client_index.get(account_number)
         if not client:
             return jsonify({'exists': False})
         return jsonify({
             'exists': True,
-            'id': client.id,
-            'name': client.name,
-            'address': client.address,
-            'email': client.email,
-            'phone': client.phone
+            'id': client['id'],
+            'name': client['name'],
+            'address': client['address'],
+            'email': client['email'],
+            'phone': client['phone']
         })
 
     @app.route('/api/clients/search')
@@ -268,19 +314,33 @@ def create_app():
         if not account_number:
             return jsonify({'error': 'Numéro de compte requis'}), 400
 
-        client = Client.query.filter_by(account_number=account_number).first()
+        client = client_index.get(account_number)
         if client:
             return jsonify({
                 'client': {
-                    'id': client.id,
-                    'name': client.name,
-                    'email': client.email,
-                    'phone': client.phone,
-                    'address': client.address
+                    'id': client['id'],
+                    'name': client['name'],
+                    'email': client['email'],
+                    'phone': client['phone'],
+                    'address': client['address']
                 }
             })
         return jsonify({'client': None})
 
+    @app.route('/api/clients/autocomplete')
+    @login_required
+    def autocomplete_clients():
+        prefix = request.args.get('q', '')
+        limit = request.args.get('limit', app.config['CLIENT_AUTOCOMPLETE_LIMIT'], type=int)
+        limit = min(max(limit, 1), app.config['CLIENT_AUTOCOMPLETE_MAX_LIMIT'])
+        return jsonify({
+            'clients': [{
+                'id': client['id'],
+                'account_number': client['account_number'],
+                'name': client['name']
+            } for client in client_index.search(prefix, limit)]
+        })
+
     @app.route('/create_ticket', methods=['GET', 'POST'])
     @admin_required
     def create_ticket():
@@ -332,34 +392,34 @@ def create_app():
                         db.session.add(product)
                 
                 # Gestion des fichiers joints
+                attachments = []
                 if 'attachments[]' in request.files:
                     files = request.files.getlist('attachments[]')
                     for file in files:
                         if file and file.filename:
-                            # Générer un nom de fichier unique
                             filename = secure_filename(file.filename)
-                            unique_filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{filename}"
                             
-                            # Créer le dossier uploads s'il n'existe pas
-                            upload_dir = os.path.join(app.root_path, 'uploads', str(ticket.id))
-                            os.makedirs(upload_dir, exist_ok=True)
-                            
-                            # Sauvegarder le fichier
-                            file_path = os.path.join(upload_dir, unique_filename)
-                            file.save(file_path)
+                            # Stocké par empreinte : un fichier déjà connu n'est pas réécrit
+                            content_hash, file_size = attachment_store.save(file.stream)
                             
                             # Créer l'entrée dans la base de données
                             attachment = Attachment()
-                            attachment.filename = unique_filename
+                            attachment.filename = filename
                             attachment.original_filename = filename
+                            attachment.content_hash = content_hash
                             attachment.file_type = file.content_type
-                            attachment.file_size = os.path.getsize(file_path)
+                            attachment.file_size = file_size
                             attachment.user_id = current_user.id
                             attachment.ticket_id = ticket.id
                             db.session.add(attachment)
+                            attachments.append(attachment)
                 
                 db.session.commit()
                 
+                # Miniatures et versions web construites en arrière-plan
+                for attachment in attachments:
+                    attachment_derivatives.schedule(attachment)
+                
                 # Notification de création de ticket
                 notify_new_ticket(ticket)
                 
@@ -373,10 +433,39 @@ def create_app():
         
         return render_template('create_ticket.html')
 
+    @app.route('/tickets/import')
+    @admin_required
+    def import_tickets_page():
+        return render_template('import_tickets.html')
+
+    @app.route('/api/tickets/import', methods=['POST'])
+    @admin_required
+    def import_tickets_api():
+        # Import groupé : tout est validé avant d'écrire, puis inséré en une transaction
+        file = request.files.get('file')
+        if not file or not file.filename:
+            return jsonify({'error': 'Aucun fichier fourni'}), 400
+        dry_run = request.form.get('dry_run') in ('1', 'true', 'on')
+        try:
+            rows = read_import_file(file.stream, file.filename)
+        except (ValueError, RuntimeError) as e:
+            return jsonify({'error': str(e)}), 400
+        try:
+            result = import_tickets(rows, dry_run=dry_run, max_rows=app.config['IMPORT_MAX_ROWS'])
+        except Exception as e:
+            app.logger.error(f"Erreur lors de l'import de tickets ({file.filename}): {str(e)}")
+            return jsonify({'error': "Erreur lors de l'import, aucun ticket n'a été créé"}), 500
+        if not result.ok:
+            return jsonify(result.to_dict()), 400
+        if not dry_run:
+            log_user_action('import', 'tickets', f"{len(result.ticket_numbers)} ticket(s) importé(s) depuis {file.filename}")
+            notify_ticket_import(result, file.filename)
+        return jsonify(result.to_dict())
+
     @app.route('/ticket/<int:ticket_id>')
     @admin_required
     def view_ticket(ticket_id):
-        ticket = db.session.get(Ticket, ticket_id)
+        ticket = db.session.get(Ticket, ticket_id, options=ticket_loader_options('detail'))
         if ticket is None:
             return render_template('404.html'), 404
         return render_template('view_ticket.html', ticket=ticket)
@@ -575,9 +664,36 @@ def create_app():
     @app.route('/logistics')
     @admin_required
     def logistics():
-        # Récupérer tous les tickets avec leurs produits et clients associés
-        tickets = Ticket.query.order_by(Ticket.created_at.desc()).all()
-        return render_template('logistics.html', tickets=tickets)
+        # Récupérer une page de tickets avec leurs produits et clients associés
+        try:
+            page = paginate_tickets(with_ticket_profile(Ticket.query, 'logistics'))
+        except ValueError as e:
+            flash(str(e), 'warning')
+            return redirect(url_for('logistics'))
+        return render_template('logistics.html', tickets=page.items, page=page)
+
+    @app.route('/api/tickets')
+    @login_required
+    def list_tickets_api():
+        try:
+            page = paginate_tickets(with_ticket_profile(Ticket.query, 'list'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'tickets': [{
+                'id': ticket.id,
+                'ticket_number': ticket.ticket_number,
+                'client_name': ticket.client.name,
+                'return_type': ticket.return_type,
+                'status': ticket.status,
+                'created_at': ticket.created_at.isoformat(),
+                'total_refund': ticket.total_refund
+            } for ticket in page.items],
+            'per_page': page.per_page,
+            'next_cursor': page.next_cursor,
+            'prev_cursor': page.prev_cursor
+        })
 
     @app.route('/product/<int:product_id>/reception', methods=['GET', 'POST'])
     @admin_required
@@ -663,30 +779,55 @@ def create_app():
     @admin_required
     def download_attachment(attachment_id):
         attachment = Attachment.query.get_or_404(attachment_id)
-        file_path = os.path.join(app.root_path, 'uploads', str(attachment.ticket_id), attachment.filename)
         
-        if not os.path.exists(file_path):
+        # L'empreinte du contenu sert d'ETag fort ; envoi délégué au serveur frontal si configuré
+        try:
+            return send_stored_file(
+                attachment_store.path_for(attachment),
+                etag=attachment.content_hash,
+                mimetype=attachment.file_type,
+                download_name=attachment.original_filename,
+                as_attachment=True
+            )
+        except FileNotFoundError:
             flash('Le fichier n\'existe plus.', 'error')
             return redirect(url_for('view_ticket', ticket_id=attachment.ticket_id))
+
+    @app.route('/attachment/<int:attachment_id>/preview/<kind>')
+    @admin_required
+    def preview_attachment(attachment_id, kind):
+        if kind not in DERIVATIVES:
+            return jsonify({'error': 'Aperçu inconnu'}), 404
+        attachment = Attachment.query.get_or_404(attachment_id)
+        if not attachment.is_image:
+            return jsonify({'error': 'Aperçu disponible uniquement pour les images'}), 404
         
-        return send_file(
-            file_path,
-            as_attachment=True,
-            download_name=attachment.original_filename
-        )
+        etag = attachment_derivatives.etag_for(attachment, kind)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        
+        # Dérivé en cache, construit à la première demande ; sans Pillow, l'original
+        try:
+            path = attachment_derivatives.get(attachment, kind)
+            if path is not None:
+                return send_stored_file(path, etag=etag, mimetype='image/jpeg')
+            if attachment_derivatives.available:
+                # Pillow n'a pas pu décoder le fichier : ce n'est pas l'image annoncée
+                return jsonify({'error': 'Aperçu indisponible pour ce fichier'}), 404
+            # Type matriciel uniquement (is_image) et nosniff : jamais interprété comme du HTML/SVG
+            return send_stored_file(attachment_store.path_for(attachment), etag=attachment.content_hash,
+                                    mimetype=attachment.file_type)
+        except FileNotFoundError:
+            return jsonify({'error': 'Le fichier n\'existe plus'}), 404
 
     @app.route('/attachment/<int:attachment_id>/delete', methods=['POST'])
     @admin_required
     def delete_attachment(attachment_id):
         attachment = Attachment.query.get_or_404(attachment_id)
-        file_path = os.path.join(app.root_path, 'uploads', str(attachment.ticket_id), attachment.filename)
         
         try:
-            # Supprimer le fichier physique
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            
-            # Supprimer l'entrée dans la base de données
+            # Le fichier est supprimé au commit s'il n'est plus joint à aucun ticket
             db.session.delete(attachment)
             db.session.commit()
             
@@ -755,53 +896,76 @@ def create_app():
     @app.route('/accounting')
     @login_required
     def accounting():
+        page = request.args.get('page', 1, type=int)
+        per_page = min(request.args.get('per_page', 50, type=int), 200)
+        sort = request.args.get('sort', 'total')
+        order = request.args.get('order', 'desc')
+        # Totaux et page de clients mis en cache jusqu'au prochain changement d'avoir ou de client
+        def build():
+            # Totaux globaux lus depuis les cumuls journaliers (payé = avoir validé)
+            total_amount, paid_amount = db.session.query(
+                db.func.coalesce(db.func.sum(TicketDailyStat.refund_sum), 0.0),
+                db.func.coalesce(db.func.sum(TicketDailyStat.validated_refund_sum), 0.0)
+            ).one()
+
+            # Regrouper par client en une seule requête jointe à Client
+            total = db.func.sum(TicketDailyStat.refund_sum)
+            paid = db.func.sum(TicketDailyStat.validated_refund_sum)
+            pending = total - paid
+            sort_columns = {
+                'name': Client.name,
+                'total': total,
+                'paid': paid,
+                'pending': pending
+            }
+            sort_column = sort_columns.get(sort, total)
+            sort_column = sort_column.asc() if order == 'asc' else sort_column.desc()
+
+            query = db.session.query(
+                Client.id,
+                Client.name,
+                total.label('total'),
+                paid.label('paid'),
+                pending.label('pending')
+            ).join(
+                TicketDailyStat, TicketDailyStat.client_id == Client.id
+            ).group_by(Client.id, Client.name).having(total != 0).order_by(sort_column, Client.id)
+            pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+
+            return {
+                'total_amount': total_amount,
+                'paid_amount': paid_amount,
+                'total': pagination.total,
+                'clients': [{
+                    'name': row.name,
+                    'total': row.total,
+                    'paid': row.paid,
+                    'pending': row.pending
+                } for row in pagination.items]
+            }
+
         try:
-            # Récupérer les données de comptabilité
-            tickets = Ticket.query.all()
-            total_amount = sum(ticket.total_amount for ticket in tickets if ticket.total_amount)
-            paid_amount = sum(ticket.total_amount for ticket in tickets if ticket.total_amount and ticket.status == 'paye')
-            pending_amount = total_amount - paid_amount
-
-            # Regrouper par client
-            client_totals = {}
-            for ticket in tickets:
-                if ticket.client_id and ticket.total_amount:
-                    if ticket.client_id not in client_totals:
-                        client_totals[ticket.client_id] = {
-                            'total': 0,
-                            'paid': 0,
-                            'pending': 0
-                        }
-                    client_totals[ticket.client_id]['total'] += ticket.total_amount
-                    if ticket.status == 'paye':
-                        client_totals[ticket.client_id]['paid'] += ticket.total_amount
-                    else:
-                        client_totals[ticket.client_id]['pending'] += ticket.total_amount
-
-            # Récupérer les informations des clients
-            clients = Client.query.filter(Client.id.in_(client_totals.keys())).all()
-            client_data = []
-            for client in clients:
-                if client.id in client_totals:
-                    client_data.append({
-                        'name': client.name,
-                        'total': client_totals[client.id]['total'],
-                        'paid': client_totals[client.id]['paid'],
-                        'pending': client_totals[client.id]['pending']
-                    })
+            data = response_cache.get_or_set('accounting', ('credit_note', 'client'), build, key=(page, per_page, sort, order))
+            pagination = StaticPagination(data['clients'], page, per_page, data['total'])
 
             return render_template('accounting.html',
-                                 total_amount=total_amount,
-                                 paid_amount=paid_amount,
-                                 pending_amount=pending_amount,
-                                 clients=client_data)
+                                 total_amount=data['total_amount'],
+                                 paid_amount=data['paid_amount'],
+                                 pending_amount=data['total_amount'] - data['paid_amount'],
+                                 clients=data['clients'],
+                                 pagination=pagination,
+                                 sort=sort,
+                                 order=order)
         except Exception as e:
             flash(f'Erreur lors de la récupération des données comptables : {str(e)}', 'error')
             return render_template('accounting.html',
                                  total_amount=0,
                                  paid_amount=0,
                                  pending_amount=0,
-                                 clients=[])
+                                 clients=[],
+                                 pagination=None,
+                                 sort=sort,
+                                 order=order)
 
     @app.route('/accounting/search')
     @admin_required
@@ -813,12 +977,13 @@ def create_app():
         status = request.args.get('status', '')
         
         # Construire la requête
-        query = Ticket.query.join(Client)
+        query = with_ticket_profile(Ticket.query.join(Client), 'list', client_joined=True)
         
+        search = get_search_backend()
         if ticket_number:
-            query = query.filter(Ticket.ticket_number.ilike(f'%{ticket_number}%'))
+            query = query.filter(search.ticket_condition('ticket_number', ticket_number))
         if client:
-            query = query.filter(Client.name.ilike(f'%{client}%'))
+            query = query.filter(search.ticket_condition('client_name', client))
         if date:
             query = query.filter(db.func.date(Ticket.created_at) == date)
         if status:
@@ -839,6 +1004,7 @@ def create_app():
                 'client_name': ticket.client.name,
                 'created_at': ticket.created_at.strftime('%d/%m/%Y'),
                 'total_refund': ticket.total_refund,
+                'status': ticket.status,
                 'credit_note_number': ticket.credit_note_number,
                 'credit_note_date': ticket.credit_note_date.strftime('%d/%m/%Y') if ticket.credit_note_date else None,
                 'credit_note_validated': ticket.credit_note_validated
@@ -878,6 +1044,40 @@ def create_app():
             db.session.rollback()
             return jsonify({'success': False, 'message': str(e)}), 500
 
+    @app.route('/accounting/credit-notes', methods=['POST'])
+    @admin_required
+    def validate_credit_notes():
+        # Validation groupée : unicité contrôlée pour tout le lot, une seule transaction
+        data = request.get_json(silent=True) or {}
+        try:
+            result = bulk_validate_credit_notes(data.get('credit_notes'), current_user.id,
+                                                max_tickets=app.config['BULK_MAX_TICKETS'])
+        except Exception as e:
+            app.logger.error(f"Erreur lors de la validation groupée des avoirs: {str(e)}")
+            return jsonify({'error': "Erreur lors de la validation, aucun avoir n'a été enregistré"}), 500
+        if not result.ok:
+            return jsonify(result.to_dict()), 400
+        log_user_action('credit_notes', 'accounting', f"{len(result.changes)} avoir(s) validé(s)")
+        return jsonify(result.to_dict())
+
+    @app.route('/api/tickets/status', methods=['POST'])
+    @admin_required
+    def update_tickets_status():
+        data = request.get_json(silent=True) or {}
+        status = data.get('status')
+        try:
+            result = bulk_update_status(data.get('ticket_ids'), status, max_tickets=app.config['BULK_MAX_TICKETS'])
+        except Exception as e:
+            app.logger.error(f"Erreur lors du changement de statut groupé: {str(e)}")
+            return jsonify({'error': "Erreur lors du changement de statut, aucun ticket n'a été modifié"}), 500
+        if not result.ok:
+            return jsonify(result.to_dict()), 400
+        if result.changes:
+            log_user_action('status', 'tickets', f"{len(result.changes)} ticket(s) passé(s) au statut {status}")
+            # Un seul email par destinataire pour tout le lot
+            notify_status_changes(result.changes)
+        return jsonify(result.to_dict())
+
     @app.route('/client-data')
     @admin_required
     def client_data():
@@ -885,16 +1085,18 @@ def create_app():
 
     @app.route('/client-data/search')
     @admin_required
+    @conditional_on('client')
     def client_data_search():
         account_number = request.args.get('account_number', '')
         client_name = request.args.get('client_name', '')
         
         query = Client.query
+        search = get_search_backend()
         
         if account_number:
-            query = query.filter(Client.account_number.ilike(f'%{account_number}%'))
+            query = query.filter(search.client_condition('account_number', account_number))
         if client_name:
-            query = query.filter(Client.name.ilike(f'%{client_name}%'))
+            query = query.filter(search.client_condition('name', client_name))
         
         clients = query.all()
         
@@ -910,72 +1112,84 @@ def create_app():
 
     @app.route('/client-data/<int:client_id>')
     @login_required
+    @conditional_on('ticket', 'client', 'credit_note')
     def client_data_details(client_id):
-        client = Client.query.get_or_404(client_id)
-        tickets = Ticket.query.filter_by(client_id=clientid).all()
+        def build():
+            client = Client.query.get_or_404(client_id)
+            # Une page de tickets (curseurs after/before) ; les statistiques couvrent tout l'historique
+            page = paginate_tickets(with_ticket_profile(Ticket.query, 'list').filter_by(client_id=client_id))
         
-        # Calculer les statistiques
-        total_credit_notes = sum(ticket.total_refund for ticket in tickets)
-        validated_credit_notes = sum(ticket.total_refund for ticket in tickets if ticket.credit_note_validated)
-        pending_credit_notes = sum(ticket.total_refund for ticket in tickets if not ticket.credit_note_validated)
-        total_tickets = len(tickets)
+            # Statistiques, évolution et types de retour lus depuis les cumuls journaliers
+            rows = db.session.query(
+                TicketDailyStat.day,
+                TicketDailyStat.return_type,
+                db.func.sum(TicketDailyStat.ticket_count),
+                db.func.sum(TicketDailyStat.refund_sum),
+                db.func.sum(TicketDailyStat.validated_refund_sum)
+            ).filter(
+                TicketDailyStat.client_id == client_id
+            ).group_by(TicketDailyStat.day, TicketDailyStat.return_type).order_by(TicketDailyStat.day).all()
         
-        # Calculer l'évolution des avoirs
-        evolution = {
-            'labels': [],
-            'validated': [],
-            'pending': []
-        }
+            total_credit_notes = 0
+            validated_credit_notes = 0
+            total_tickets = 0
+            return_types = {'S': 0, 'R': 0, 'C': 0}
+            amounts_by_date = {}
+            for day, return_type, ticket_count, refund_sum, validated_sum in rows:
+                total_tickets += ticket_count
+                total_credit_notes += refund_sum
+                validated_credit_notes += validated_sum
+                if return_type in return_types:
+                    return_types[return_type] += ticket_count
+                date_amounts = amounts_by_date.setdefault(day.isoformat(), {'validated': 0, 'pending': 0})
+                date_amounts['validated'] += validated_sum
+                date_amounts['pending'] += refund_sum - validated_sum
+            pending_credit_notes = total_credit_notes - validated_credit_notes
         
-        # Grouper les tickets par date
-        tickets_by_date = {}
-        for ticket in tickets:
-            date_str = ticket.created_at.strftime('%Y-%m-%d')
-            if date_str not in tickets_by_date:
-                tickets_by_date[date_str] = {'validated': 0, 'pending': 0}
-            if ticket.credit_note_validated:
-                tickets_by_date[date_str]['validated'] += ticket.total_refund
-            else:
-                tickets_by_date[date_str]['pending'] += ticket.total_refund
-        
-        # Trier les dates
-        sorted_dates = sorted(tickets_by_date.keys())
-        evolution['labels'] = sorted_dates
-        evolution['validated'] = [tickets_by_date[date]['validated'] for date in sorted_dates]
-        evolution['pending'] = [tickets_by_date[date]['pending'] for date in sorted_dates]
+            # Calculer l'évolution des avoirs
+            sorted_dates = list(amounts_by_date)
+            evolution = {
+                'labels': sorted_dates,
+                'validated': [amounts_by_date[date]['validated'] for date in sorted_dates],
+                'pending': [amounts_by_date[date]['pending'] for date in sorted_dates]
+            }
         
-        # Calculer la répartition par type de retour
-        return_types = {
-            'S': sum(1 for ticket in tickets if ticket.return_type == 'S'),
-            'R': sum(1 for ticket in tickets if ticket.return_type == 'R'),
-            'C': sum(1 for ticket in tickets if ticket.return_type == 'C')
-        }
-        
-        return jsonify({
-            'client': {
-                'id': client.id,
-                'account_number': client.account_number,
-                'name': client.name,
-                'email': client.email,
-                'phone': client.phone
-            },
-            'stats': {
-                'totalCreditNotes': total_credit_notes,
-                'validatedCreditNotes': validated_credit_notes,
-                'pendingCreditNotes': pending_credit_notes,
-                'totalTickets': total_tickets
-            },
-            'evolution': evolution,
-            'returnTypes': return_types,
-            'tickets': [{
-                'id': ticket.id,
-                'ticket_number': ticket.ticket_number,
-                'created_at': ticket.created_at.strftime('%d/%m/%Y'),
-                'return_type': ticket.return_type,
-                'status': ticket.status,
-                'total_refund': ticket.total_refund
-            } for ticket in tickets]
-        })
+            return {
+                'client': {
+                    'id': client.id,
+                    'account_number': client.account_number,
+                    'name': client.name,
+                    'email': client.email,
+                    'phone': client.phone
+                },
+                'stats': {
+                    'totalCreditNotes': total_credit_notes,
+                    'validatedCreditNotes': validated_credit_notes,
+                    'pendingCreditNotes': pending_credit_notes,
+                    'totalTickets': total_tickets
+                },
+                'evolution': evolution,
+                'returnTypes': return_types,
+                'tickets': [{
+                    'id': ticket.id,
+                    'ticket_number': ticket.ticket_number,
+                    'created_at': ticket.created_at.strftime('%d/%m/%Y'),
+                    'return_type': ticket.return_type,
+                    'status': ticket.status,
+                    'total_refund': ticket.total_refund
+                } for ticket in page.items],
+                'next_cursor': page.next_cursor,
+                'prev_cursor': page.prev_cursor
+            }
+
+        try:
+            data = response_cache.get_or_set(
+                'client-data', (f'client:{client_id}',), build,
+                key=(client_id, request.args.get('after'), request.args.get('before'), get_tickets_per_page())
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(data)
 
     @app.route('/client-data/<int:client_id>', methods=['PUT'])
     @login_required
@@ -995,91 +1209,116 @@ def create_app():
             db.session.rollback()
             return jsonify({'success': False, 'message': str(e)}), 500
 
+    def dashboard_hour():
+        # Heure courante tronquée : les fenêtres du tableau de bord (anomalies à
+        # 7 jours, évolution sur 30 jours) n'avancent qu'à chaque heure pleine
+        return datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
     @app.route('/dashboard-data')
     @login_required
+    @conditional_on('ticket', 'client', 'credit_note', key=lambda: dashboard_hour().isoformat())
     def dashboard_data():
-        # Statistiques globales
-        active_tickets = Ticket.query.filter(Ticket.status != 'valide').count()
-        pending_credit_notes = Ticket.query.filter_by(status='en_attente').count()
-        total_credit_notes = db.session.query(db.func.sum(Ticket.total_refund)).filter_by(status='valide').scalar() or 0
-        
-        # Détecter les anomalies (tickets en attente depuis plus de 7 jours)
-        anomalies = Ticket.query.filter(
-            Ticket.status == 'en_attente',
-            Ticket.created_at <= datetime.now(timezone.utc) - timedelta(days=7)
-        ).count()
-
-        # Évolution des tickets sur les 30 derniers jours
-        evolution = []
-        labels = []
-        for i in range(30):
-            date = datetime.now(timezone.utc) - timedelta(days=i)
-            count = Ticket.query.filter(
-                db.func.date(Ticket.created_at) == date.date()
-            ).count()
-            evolution.insert(0, count)
-            labels.insert(0, date.strftime('%d/%m'))
-
-        # Répartition par type de retour
-        return_types = {
-            'S': Ticket.query.filter_by(return_type='S').count(),
-            'R': Ticket.query.filter_by(return_type='R').count(),
-            'C': Ticket.query.filter_by(return_type='C').count()
-        }
+        # Données partagées par tous les utilisateurs : mises en cache jusqu'à
+        # la prochaine modification d'un ticket, d'un client ou d'un avoir
+        now = dashboard_hour()
 
-        # Alertes
-        alerts = []
+        def build():
+            anomaly_limit = now - timedelta(days=7)
         
-        # Alertes pour les tickets en attente depuis longtemps
-        old_tickets = Ticket.query.filter(
-            Ticket.status == 'en_attente',
-            Ticket.created_at <= datetime.now(timezone.utc) - timedelta(days=7)
-        ).all()
+            # Statistiques globales et répartition par type de retour en une seule requête
+            # sur les cumuls journaliers
+            def count_if(condition):
+                return db.func.coalesce(db.func.sum(db.case((condition, TicketDailyStat.ticket_count), else_=0)), 0)
         
-        for ticket in old_tickets:
-            alerts.append({
-                'type': 'warning',
-                'icon': 'fa-clock',
-                'message': f'Ticket {ticket.ticket_number} en attente depuis plus de 7 jours',
-                'link': f'/ticket/{ticket.id}'
-            })
-
-        # Alertes pour les avoirs en attente
-        if pending_credit_notes > 0:
-            alerts.append({
-                'type': 'info',
-                'icon': 'fa-file-invoice-dollar',
-                'message': f'{pending_credit_notes} avoir(s) en attente de validation',
-                'link': '/accounting'
-            })
+            (active_tickets, pending_credit_notes, total_credit_notes,
+             type_s, type_r, type_c) = db.session.query(
+                count_if(TicketDailyStat.status != 'valide'),
+                count_if(TicketDailyStat.status == 'en_attente'),
+                db.func.coalesce(db.func.sum(db.case((TicketDailyStat.status == 'valide', TicketDailyStat.refund_sum), else_=0.0)), 0.0),
+                count_if(TicketDailyStat.return_type == 'S'),
+                count_if(TicketDailyStat.return_type == 'R'),
+                count_if(TicketDailyStat.return_type == 'C')
+            ).one()
+            return_types = {'S': type_s, 'R': type_r, 'C': type_c}
+        
+            # Tickets en attente depuis plus de 7 jours : chargés une fois, comptés en Python
+            old_tickets = db.session.query(Ticket.id, Ticket.ticket_number).filter(
+                Ticket.status == 'en_attente',
+                Ticket.created_at <= anomaly_limit
+            ).order_by(Ticket.created_at).all()
+            anomalies = len(old_tickets)
+
+            # Évolution des tickets sur les 30 derniers jours (GROUP BY date)
+            first_day = (now - timedelta(days=29)).date()
+            counts_by_day = {
+                row_day.isoformat(): count
+                for row_day, count in db.session.query(
+                    TicketDailyStat.day, db.func.sum(TicketDailyStat.ticket_count)
+                ).filter(
+                    TicketDailyStat.day >= first_day
+                ).group_by(TicketDailyStat.day)
+            }
+            labels = []
+            evolution = []
+            for i in range(30):
+                date = first_day + timedelta(days=i)
+                labels.append(date.strftime('%d/%m'))
+                evolution.append(counts_by_day.get(date.isoformat(), 0))
+
+            # Alertes
+            alerts = []
+        
+            # Alertes pour les tickets en attente depuis longtemps
+            for ticket_id, ticket_number in old_tickets:
+                alerts.append({
+                    'type': 'warning',
+                    'icon': 'fa-clock',
+                    'message': f'Ticket {ticket_number} en attente depuis plus de 7 jours',
+                    'link': f'/ticket/{ticket_id}'
+                })
 
-        # Derniers tickets
-        recent_tickets = Ticket.query.order_by(Ticket.created_at.desc()).limit(10).all()
-        recent_tickets_data = [{
-            'id': ticket.id,
-            'ticket_number': ticket.ticket_number,
-            'client_name': ticket.client_name,
-            'created_at': ticket.created_at.strftime('%d/%m/%Y'),
-            'return_type': ticket.return_type,
-            'status': ticket.status,
-            'total_refund': ticket.total_refund
-        } for ticket in recent_tickets]
+            # Alertes pour les avoirs en attente
+            if pending_credit_notes > 0:
+                alerts.append({
+                    'type': 'info',
+                    'icon': 'fa-file-invoice-dollar',
+                    'message': f'{pending_credit_notes} avoir(s) en attente de validation',
+                    'link': '/accounting'
+                })
 
-        return jsonify({
-            'stats': {
-                'activeTickets': active_tickets,
-                'pendingCreditNotes': pending_credit_notes,
-                'totalCreditNotes': total_credit_notes,
-                'anomalies': anomalies
-            },
-            'evolution': {
-                'labels': labels,
-                'tickets': evolution
-            },
-            'returnTypes': return_types,
-            'alerts': alerts,
-            'recentTickets': recent_tickets_data
-        })
+            # Derniers tickets
+            recent_tickets = with_ticket_profile(Ticket.query, 'list').order_by(Ticket.created_at.desc()).limit(10).all()
+            recent_tickets_data = [{
+                'id': ticket.id,
+                'ticket_number': ticket.ticket_number,
+                'client_name': ticket.client.name,
+                'created_at': ticket.created_at.strftime('%d/%m/%Y'),
+                'return_type': ticket.return_type,
+                'status': ticket.status,
+                'total_refund': ticket.total_refund
+            } for ticket in recent_tickets]
+
+            return {
+                'stats': {
+                    'activeTickets': active_tickets,
+                    'pendingCreditNotes': pending_credit_notes,
+                    'totalCreditNotes': total_credit_notes,
+                    'anomalies': anomalies
+                },
+                'evolution': {
+                    'labels': labels,
+                    'tickets': evolution
+                },
+                'returnTypes': return_types,
+                'alerts': alerts,
+                'recentTickets': recent_tickets_data
+            }
+
+        # L'heure fait partie de la clé : la limite des anomalies avance avec elle
+        return jsonify(response_cache.get_or_set(
+            'dashboard', ('ticket', 'client', 'credit_note'), build,
+            key=now.isoformat()
+        ))
 
     @app.route('/api/tickets/search', methods=['POST'])
     @login_required
@@ -1090,104 +1329,10 @@ def create_app():
             per_page = request.form.get('per_page', 10, type=int)
             
             # Construction de la requête de base
-            query = Ticket.query.join(Client)
-            
-            # Filtres sur les informations client
-            account_number = request.form.get('account_number')
-            if account_number:
-                query = query.filter(Client.account_number.ilike(f'%{account_number}%'))
-            
-            client_name = request.form.get('client_name')
-            if client_name:
-                query = query.filter(Client.name.ilike(f'%{client_name}%'))
-            
-            client_email = request.form.get('client_email')
-            if client_email:
-                query = query.filter(Client.email.ilike(f'%{client_email}%'))
-            
-            # Filtres sur les informations ticket
-            ticket_number = request.form.get('ticket_number')
-            if ticket_number:
-                query = query.filter(Ticket.ticket_number.ilike(f'%{ticket_number}%'))
-            
-            status = request.form.getlist('status')
-            if status:
-                query = query.filter(Ticket.status.in_(status))
+            query = with_ticket_profile(Ticket.query.join(Client), 'list', client_joined=True)
             
-            return_type = request.form.getlist('return_type')
-            if return_type:
-                query = query.filter(Ticket.return_type.in_(return_type))
-            
-            # Filtres supplémentaires
-            fault_attribution = request.form.get('fault_attribution')
-            if fault_attribution:
-                query = query.filter(Ticket.fault_attribution == fault_attribution)
-            
-            return_reason = request.form.get('return_reason')
-            if return_reason:
-                query = query.filter(Ticket.return_reason == return_reason)
-            
-            has_attachments = request.form.get('has_attachments')
-            if has_attachments:
-                query = query.filter(Ticket.attachments.any())
-            
-            # Filtres de date
-            date_range = request.form.get('date_range')
-            if date_range:
-                today = datetime.now().date()
-                
-                if date_range == 'today':
-                    query = query.filter(
-                        Ticket.created_at >= datetime.combine(today, time.min),
-                        Ticket.created_at <= datetime.combine(today, time.max)
-                    )
-                elif date_range == 'yesterday':
-                    yesterday = today - timedelta(days=1)
-                    query = query.filter(
-                        Ticket.created_at >= datetime.combine(yesterday, time.min),
-                        Ticket.created_at <= datetime.combine(yesterday, time.max)
-                    )
-                elif date_range == 'last_7_days':
-                    seven_days_ago = today - timedelta(days=7)
-                    query = query.filter(
-                        Ticket.created_at >= datetime.combine(seven_days_ago, time.min),
-                        Ticket.created_at <= datetime.combine(today, time.max)
-                    )
-                elif date_range == 'last_30_days':
-                    thirty_days_ago = today - timedelta(days=30)
-                    query = query.filter(
-                        Ticket.created_at >= datetime.combine(thirty_days_ago, time.min),
-                        Ticket.created_at <= datetime.combine(today, time.max)
-                    )
-                elif date_range == 'this_month':
-                    first_day = today.replace(day=1)
-                    query = query.filter(
-                        Ticket.created_at >= datetime.combine(first_day, time.min),
-                        Ticket.created_at <= datetime.combine(today, time.max)
-                    )
-                elif date_range == 'last_month':
-                    first_day_last_month = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
-                    last_day_last_month = today.replace(day=1) - timedelta(days=1)
-                    query = query.filter(
-                        Ticket.created_at >= datetime.combine(first_day_last_month, time.min),
-                        Ticket.created_at <= datetime.combine(last_day_last_month, time.max)
-                    )
-            else:
-                # Utilisation des dates personnalisées
-                start_date = request.form.get('start_date')
-                end_date = request.form.get('end_date')
-                
-                if start_date:
-                    query = query.filter(Ticket.created_at >= datetime.combine(
-                        datetime.strptime(start_date, '%Y-%m-%d').date(),
-                        time.min
-                    ))
-                    
-                if end_date:
-                    query = query.filter(Ticket.created_at <= datetime.combine(
-                        datetime.strptime(end_date, '%Y-%m-%d').date(),
-                        time.max
-                    ))
+            # Filtres du formulaire de recherche
+            query = apply_ticket_filters(query, request.form)
             
             # Tri et pagination
             query = query.order_by(Ticket.created_at.desc())
@@ -1218,52 +1363,45 @@ def create_app():
             app.logger.error(f"Erreur lors de la recherche des tickets: {str(e)}")
             return jsonify({'error': 'Une erreur est survenue lors de la recherche'}), 500
 
+    @app.route('/api/search')
+    @login_required
+    def ranked_search():
+        q = request.args.get('q', '').strip()
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        if not q:
+            return jsonify({'error': 'Terme de recherche requis'}), 400
+        
+        ranked = get_search_backend().search_tickets(q, limit)
+        tickets = {
+            ticket.id: ticket
+            for ticket in with_ticket_profile(Ticket.query, 'list').filter(Ticket.id.in_([ticket_id for ticket_id, rank in ranked]))
+        }
+        return jsonify({
+            'query': q,
+            'tickets': [{
+                'id': ticket_id,
+                'ticket_number': tickets[ticket_id].ticket_number,
+                'client_name': tickets[ticket_id].client.name,
+                'account_number': tickets[ticket_id].client.account_number,
+                'return_type': tickets[ticket_id].return_type,
+                'status': tickets[ticket_id].status,
+                'created_at': tickets[ticket_id].created_at.isoformat(),
+                'total_refund': tickets[ticket_id].total_refund,
+                'rank': rank
+            } for ticket_id, rank in ranked if ticket_id in tickets]
+        })
+
     @app.route('/api/tickets/export/csv', methods=['POST'])
     @login_required
     def export_tickets_csv():
         try:
             # Réutilisation des filtres de recherche
-            query = Ticket.query.join(Client)
-            
-            # Application des mêmes filtres que la recherche
-            # ... (code de filtrage identique à la route search_tickets)
-            
-            tickets = query.order_by(Ticket.created_at.desc()).all()
-            
-            # Création du fichier CSV
-            output = StringIO()
-            writer = csv.writer(output)
-            
-            # En-têtes
-            writer.writerow([
-                'N° Ticket',
-                'Client',
-                'N° Compte',
-                'Type retour',
-                'Statut',
-                'Date création',
-                'Montant total',
-                'Attribution faute',
-                'Motif retour'
-            ])
-            
-            # Données
-            for ticket in tickets:
-                writer.writerow([
-                    ticket.ticket_number,
-                    ticket.client.name,
-                    ticket.client.account_number,
-                    ticket.return_type,
-                    ticket.status,
-                    ticket.created_at.strftime('%d/%m/%Y %H:%M'),
-                    f"{ticket.total_refund:.2f} €",
-                    ticket.fault_attribution,
-                    ticket.return_reason
-                ])
+            query = with_ticket_profile(Ticket.query.join(Client), 'export', client_joined=True)
+            query = apply_ticket_filters(query, request.form)
+            query = query.order_by(Ticket.created_at.desc(), Ticket.id.desc()).yield_per(1000)
             
-            output.seek(0)
             return Response(
-                output,
+                stream_with_context(generate_tickets_csv(query)),
                 mimetype='text/csv',
                 headers={
                     'Content-Disposition': 'attachment; filename=tickets_export.csv'
@@ -1279,69 +1417,87 @@ def create_app():
     def export_tickets_pdf():
         try:
             # Réutilisation des filtres de recherche
-            query = Ticket.query.join(Client)
-            
-            # Application des mêmes filtres que la recherche
-            # ... (code de filtrage identique à la route search_tickets)
-            
-            tickets = query.order_by(Ticket.created_at.desc()).all()
-            
-            # Création du PDF
-            pdf = FPDF()
-            pdf.add_page()
-            
-            # En-tête
-            pdf.set_font('Arial', 'B', 16)
-            pdf.cell(0, 10, 'Export des tickets', 0, 1, 'C')
-            pdf.ln(10)
+            query = with_ticket_profile(Ticket.query.join(Client), 'export', client_joined=True)
+            query = apply_ticket_filters(query, request.form)
             
-            # Tableau
-            pdf.set_font('Arial', 'B', 10)
-            headers = [
-                'N° Ticket',
-                'Client',
-                'Type',
-                'Statut',
-                'Date',
-                'Montant'
-            ]
+            tickets = query.order_by(Ticket.created_at.desc(), Ticket.id.desc()).yield_per(1000)
             
-            # Largeurs des colonnes
-            col_widths = [30, 40, 30, 30, 30, 30]
-            
-            # En-têtes du tableau
-            for i, header in enumerate(headers):
-                pdf.cell(col_widths[i], 10, header, 1, 0, 'C')
-            pdf.ln()
-            
-            # Données
-            pdf.set_font('Arial', '', 9)
-            for ticket in tickets:
-                pdf.cell(col_widths[0], 10, ticket.ticket_number, 1)
-                pdf.cell(col_widths[1], 10, ticket.client.name, 1)
-                pdf.cell(col_widths[2], 10, ticket.return_type, 1)
-                pdf.cell(col_widths[3], 10, ticket.status, 1)
-                pdf.cell(col_widths[4], 10, ticket.created_at.strftime('%d/%m/%Y'), 1)
-                pdf.cell(col_widths[5], 10, f"{ticket.total_refund:.2f} €", 1)
-                pdf.ln()
-            
-            # Génération du PDF
-            output = BytesIO()
-            pdf.output(output)
+            # Génération du PDF page par page dans un fichier temporaire
+            output = tempfile.TemporaryFile()
+            try:
+                render_tickets_pdf(tickets, output)
+            except Exception:
+                output.close()
+                raise
             output.seek(0)
             
-            return Response(
+            return send_file(
                 output,
                 mimetype='application/pdf',
-                headers={
-                    'Content-Disposition': 'attachment; filename=tickets_export.pdf'
-                }
+                as_attachment=True,
+                download_name='tickets_export.pdf'
             )
             
         except Exception as e:
             app.logger.error(f"Erreur lors de l'export PDF: {str(e)}")
             return jsonify({'error': 'Une erreur est survenue lors de l\'export'}), 500
 
+    @app.route('/api/exports/<export_format>', methods=['POST'])
+    @login_required
+    def create_export_job(export_format):
+        if export_format not in EXPORT_MIMETYPES:
+            return jsonify({'error': 'Format d\'export inconnu'}), 400
+        try:
+            job = export_jobs.submit(export_format, request.form, current_user.id)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Erreur lors de la création de l'export: {str(e)}")
+            return jsonify({'error': 'Une erreur est survenue lors de l\'export'}), 500
+        
+        return jsonify({
+            'job': job.to_dict(),
+            'status_url': url_for('export_job_status', job_id=job.id),
+            'download_url': url_for('download_export', job_id=job.id)
+        }), 202
+
+    def get_export_job_or_404(job_id):
+        job = db.session.get(ExportJob, job_id)
+        if job is None or (job.user_id != current_user.id and not current_user.is_admin):
+            return None
+        return job
+
+    @app.route('/api/exports/<job_id>')
+    @login_required
+    def export_job_status(job_id):
+        job = get_export_job_or_404(job_id)
+        if job is None:
+            return jsonify({'error': 'Export non trouvé'}), 404
+        
+        data = job.to_dict()
+        data['progress'] = job.total if job.status == 'termine' else (export_jobs.progress(job.id) or 0)
+        if job.status == 'termine':
+            data['download_url'] = url_for('download_export', job_id=job.id)
+        return jsonify(data)
+
+    @app.route('/api/exports/<job_id>/download')
+    @login_required
+    def download_export(job_id):
+        job = get_export_job_or_404(job_id)
+        if job is None:
+            return jsonify({'error': 'Export non trouvé'}), 404
+        if job.status != 'termine':
+            return jsonify({'error': 'Export non terminé', 'status': job.status}), 409
+        
+        path = export_jobs.path_for(job)
+        if not path or not os.path.exists(path):
+            return jsonify({'error': 'Le fichier d\'export a expiré'}), 410
+        return send_file(
+            path,
+            mimetype=EXPORT_MIMETYPES[job.format],
+            as_attachment=True,
+            download_name=f'tickets_export.{job.format}'
+        )
+
     @app.route('/actions')
     @login_required
     def actions():
@@ -1350,8 +1506,7 @@ def create_app():
             return redirect(url_for('index'))
 
         # Récupérer les paramètres de filtrage
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
+        per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
         user_id = request.args.get('user', '')
         action_type = request.args.get('action_type', '')
         date_from = request.args.get('date_from', '')
@@ -1372,14 +1527,31 @@ def create_app():
         if date_to:
             query = query.filter(UserAction.timestamp <= datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1))
 
-        # Exécuter la requête avec pagination
-        pagination = query.order_by(UserAction.timestamp.desc()).paginate(page=page, per_page=per_page)
+        # Pagination par curseur sur (timestamp, id) : pas d'OFFSET
+        try:
+            page = keyset_paginate(
+                query.options(selectinload(UserAction.user)),
+                UserAction.timestamp,
+                UserAction.id,
+                per_page,
+                after=request.args.get('after'),
+                before=request.args.get('before')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Total mis en cache quelques secondes par combinaison de filtres
+        total = action_counts.get(
+            (user_id, action_type, date_from, date_to),
+            lambda: query.order_by(None).count()
+        )
         
         return jsonify({
-            'actions': [action.to_dict() for action in pagination.items],
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'current_page': page
+            'actions': [action.to_dict() for action in page.items],
+            'total': total,
+            'total_max_age': action_counts.ttl,
+            'next_cursor': page.next_cursor,
+            'prev_cursor': page.prev_cursor
         })
 
     @app.route('/actions-page')
@@ -1396,15 +1568,14 @@ def create_app():
     def log_user_action(action_type, module, details, user=None):
         if user is None:
             user = current_user
-        action = UserAction(
-            user_id=user.id if user else None,
-            action_type=action_type,
-            module=module,
-            details=details,
+        # Écriture différée et groupée par audit_writer, hors de la transaction de la requête
+        audit_writer.record(
+            action_type,
+            module,
+            details,
+            user_id=user.id if user and user.is_authenticated else None,
             ip_address=request.remote_addr
         )
-        db.session.add(action)
-        db.session.commit()
 
     @app.route('/settings')
     @admin_required
@@ -1433,51 +1604,119 @@ def create_app():
         flash('Paramètres mis à jour avec succès', 'success')
         return redirect(url_for('settings_page'))
 
+    def read_logs_page():
+        """Lit une page de logs selon les filtres de la requête. Lève ValueError si invalides."""
+        def parse_datetime(value):
+            if not value:
+                return None
+            parsed = datetime.fromisoformat(value)
+            if parsed.tzinfo is not None:
+                # Les horodatages des logs sont naïfs, en heure locale du serveur
+                parsed = parsed.astimezone().replace(tzinfo=None)
+            return parsed
+
+        filters = {
+            'level': request.args.get('level', ''),
+            'since': request.args.get('since', ''),
+            'until': request.args.get('until', ''),
+            'user': request.args.get('user', '').strip()
+        }
+        try:
+            since = parse_datetime(filters['since'])
+            until = parse_datetime(filters['until'])
+        except ValueError:
+            raise ValueError('Date de filtre invalide')
+        limit = min(max(request.args.get('limit', app.config['LOG_PAGE_SIZE'], type=int), 1), 1000)
+        records, next_cursor = log_reader.read(
+            cursor=request.args.get('after') or None,
+            limit=limit,
+            level=filters['level'] or None,
+            since=since,
+            until=until,
+            user=filters['user'] or None
+        )
+        return records, next_cursor, filters
+
     @app.route('/logs')
     @login_required
     def logs():
         try:
-            # Essayer différents encodages
-            encodings = ['utf-8', 'latin-1', 'cp1252']
-            logs = []
-            
-            for encoding in encodings:
-                try:
-                    with open('app.log', 'r', encoding=encoding) as f:
-                        logs = f.readlines()
-                    break
-                except UnicodeDecodeError:
-                    continue
-            
-            # Nettoyer les logs et les formater
-            logs = [log.strip() for log in logs if log.strip()]
-            return render_template('logs.html', logs=logs)
-        except FileNotFoundError:
-            flash('Aucun fichier de log trouvé', 'warning')
-            return render_template('logs.html', logs=[])
+            records, next_cursor, filters = read_logs_page()
+            return render_template('logs.html', logs=records, next_cursor=next_cursor, filters=filters)
+        except ValueError as e:
+            flash(str(e), 'warning')
         except Exception as e:
             flash(f'Erreur lors de la lecture des logs : {str(e)}', 'error')
-            return render_template('logs.html', logs=[])
+        return render_template('logs.html', logs=[], next_cursor=None, filters={})
+
+    @app.route('/api/logs')
+    @login_required
+    def api_logs():
+        try:
+            records, next_cursor, filters = read_logs_page()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            app.logger.error(f"Erreur lors de la lecture des logs: {str(e)}")
+            return jsonify({'error': 'Une erreur est survenue lors de la lecture des logs'}), 500
+        return jsonify({
+            'logs': [{
+                'timestamp': record['timestamp'].isoformat(),
+                'level': record['level'],
+                'user': record['user'],
+                'message': record['message'],
+                'file': record['file']
+            } for record in records],
+            'next_cursor': next_cursor
+        })
+
+    @app.route('/api/logging/levels', methods=['GET', 'POST'])
+    @admin_required
+    def logging_levels():
+        # Niveaux de log par module, modifiables à chaud (sans redémarrage)
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or request.form
+            try:
+                for name, level in data.items():
+                    log_pipeline.set_level(name, level)
+            except (ValueError, TypeError) as e:
+                return jsonify({'error': str(e)}), 400
+            app.logger.info(f"Niveaux de log modifiés : {dict(data)}")
+        return jsonify({'levels': log_pipeline.levels()})
+
+    @app.route('/api/cache/stats', methods=['GET', 'DELETE'])
+    @admin_required
+    def cache_stats():
+        # Compteurs succès/échecs du cache des pages de consultation (processus courant)
+        if request.method == 'DELETE':
+            response_cache.reset_stats()
+        return jsonify(response_cache.stats())
 
     @app.route('/statistics')
     @admin_required
     def statistics():
-        # Statistiques de base
-        total_tickets = Ticket.query.count()
-        total_clients = Client.query.count()
-        total_products = Product.query.count()
+        def build():
+            # Statistiques par statut, lues depuis les cumuls journaliers
+            status_stats = db.session.query(
+                TicketDailyStat.status, 
+                db.func.sum(TicketDailyStat.ticket_count)
+            ).group_by(TicketDailyStat.status).all()
+            return {
+                'status_stats': [tuple(row) for row in status_stats],
+                'total_clients': Client.query.count(),
+                'total_products': Product.query.count()
+            }
+        
+        data = response_cache.get_or_set('statistics', ('ticket', 'client'), build)
         
-        # Statistiques par statut
-        status_stats = db.session.query(
-            Ticket.status, 
-            db.func.count(Ticket.id)
-        ).group_by(Ticket.status).all()
+        # Statistiques de base
+        total_tickets = sum(count for status, count in data['status_stats'])
         
         return render_template('statistics.html',
             total_tickets=total_tickets,
-            total_clients=total_clients,
-            total_products=total_products,
-            status_stats=status_stats
+            total_clients=data['total_clients'],
+            total_products=data['total_products'],
+            status_stats=data['status_stats']
         )
 
     @app.route('/ticket/<int:ticket_id>/product/<int:product_id>/status', methods=['POST'])
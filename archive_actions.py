@@ -0,0 +1,20 @@
+import argparse
+from datetime import datetime, timezone, timedelta
+
+from app import create_app
+from audit import archive_user_actions
+
+def archive_actions(days=None):
+    """Déplace les actions d'audit plus anciennes que `days` jours vers user_action_archive."""
+    app = create_app()
+    with app.app_context():
+        days = days if days is not None else app.config['AUDIT_ARCHIVE_AFTER_DAYS']
+        before = datetime.now(timezone.utc) - timedelta(days=days)
+        moved = archive_user_actions(before)
+        print(f"{moved} action(s) antérieure(s) au {before.strftime('%d/%m/%Y')} archivée(s)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Archive les anciennes actions du journal d'audit")
+    parser.add_argument('--days', type=int, help="âge minimal en jours (par défaut AUDIT_ARCHIVE_AFTER_DAYS)")
+    args = parser.parse_args()
+    archive_actions(args.days)
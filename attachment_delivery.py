@@ -0,0 +1,82 @@
+import os
+import unicodedata
+from urllib.parse import quote
+
+from flask import current_app, request, send_file
+
+# Modes de ATTACHMENT_SENDFILE : en-tête transmis au serveur frontal
+SENDFILE_HEADERS = {
+    'x-sendfile': 'X-Sendfile',  # Apache (mod_xsendfile), lighttpd
+    'x-accel-redirect': 'X-Accel-Redirect',  # nginx (location internal)
+}
+
+
+def _content_disposition(response, download_name, as_attachment):
+    try:
+        download_name.encode('ascii')
+        names = {'filename': download_name}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        names = {'filename': simple, 'filename*': f"UTF-8''{quote(download_name, safe='')}"}
+    response.headers.set('Content-Disposition', 'attachment' if as_attachment else 'inline', **names)
+
+
+def _set_cache_headers(response, etag):
+    if etag:
+        response.set_etag(etag)
+    # Pièces jointes réservées aux utilisateurs connectés : jamais dans un cache partagé
+    response.cache_control.public = False
+    response.cache_control.no_cache = None
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config['ATTACHMENT_MAX_AGE']
+    response.expires = None
+    return response
+
+
+def _proxy_location(path, mode):
+    if mode == 'x-sendfile':
+        return os.path.abspath(path)
+    # nginx : chemin interne, relatif au dossier des uploads servi par la location protégée
+    relative = os.path.relpath(path, current_app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+    return current_app.config['ATTACHMENT_ACCEL_PREFIX'].rstrip('/') + '/' + quote(relative)
+
+
+def not_modified(etag):
+    """Réponse 304 si le navigateur a déjà cette version, sinon None."""
+    if etag and request.if_none_match.contains(etag):
+        return _set_cache_headers(current_app.response_class(status=304), etag)
+    return None
+
+
+def send_stored_file(path, etag=None, mimetype=None, download_name=None, as_attachment=False):
+    """Envoie un fichier du dossier des uploads avec ETag fort, Cache-Control et Range.
+
+    `etag` doit changer avec le contenu (empreinte du fichier) : le 304 est
+    alors répondu sans toucher au disque. Si ATTACHMENT_SENDFILE est défini,
+    le fichier n'est ni lu ni même testé ici : le serveur frontal l'envoie et
+    gère lui-même les requêtes Range. Sinon, send_file répond aux Range (206)
+    et aux If-Range. Lève FileNotFoundError si le fichier manque (mode direct).
+    """
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    mode = current_app.config['ATTACHMENT_SENDFILE']
+    if mode:
+        response = current_app.response_class(mimetype=mimetype or 'application/octet-stream')
+        response.headers[SENDFILE_HEADERS[mode]] = _proxy_location(path, mode)
+        if download_name:
+            _content_disposition(response, download_name, as_attachment)
+        return _set_cache_headers(response, etag)
+
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        as_attachment=as_attachment,
+        download_name=download_name,
+        conditional=True,
+        etag=etag or True
+    )
+    # Annonce les Range dès la première réponse (lecteurs PDF et vidéo)
+    response.accept_ranges = 'bytes'
+    return _set_cache_headers(response, None)
@@ -0,0 +1,145 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+
+from attachment_store import attachment_store
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # dépendance optionnelle : sans Pillow, les aperçus servent l'original
+    Image = None
+
+# Dérivés d'une image : nom -> plus grand côté en pixels
+DERIVATIVES = {
+    'web': 1600,
+    'thumb': 320,
+}
+
+
+def render_derivatives(source, targets, quality):
+    """Crée les dérivés JPEG d'une image ; exécuté dans un processus du pool.
+
+    `targets` : liste de (chemin, plus grand côté), du plus grand au plus petit :
+    chaque dérivé est réduit à partir du précédent plutôt que de l'original.
+    """
+    with Image.open(source) as image:
+        largest = max(size for path, size in targets)
+        # Décodage JPEG directement à une résolution réduite (photos de téléphone)
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        for path, size in sorted(targets, key=lambda target: -target[1]):
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            image.save(temp_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+            os.replace(temp_path, path)
+    return [path for path, size in targets]
+
+
+class DerivativeBuilder:
+    """Miniatures et versions web des images jointes, construites hors des requêtes.
+
+    Les dérivés sont rangés à côté de l'original dans le stockage par empreinte
+    (`<empreinte>.thumb.jpg`, `<empreinte>.web.jpg`) : une image jointe à
+    plusieurs tickets n'est réduite qu'une fois, et le ramasse-miettes du
+    stockage les supprime avec l'original. Ils sont construits dans un pool de
+    processus après l'envoi, ou à la première demande s'ils manquent encore.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._executor_pid = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config['DERIVATIVE_WORKERS']
+        self.quality = app.config['DERIVATIVE_QUALITY']
+        self.timeout = app.config['DERIVATIVE_TIMEOUT']
+        app.extensions['attachment_derivatives'] = self
+
+    @property
+    def available(self):
+        return Image is not None
+
+    def _get_executor(self):
+        # Pool créé au premier besoin, et recréé dans un processus issu d'un fork
+        if self._executor is None or self._executor_pid != os.getpid():
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                # Les processus du pool naissent d'un serveur sans threads, pas de ce processus
+                # (threads d'audit, de logs, de présence : verrous hérités par un fork)
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload(['attachment_derivatives'])
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            else:
+                # Sous Windows, un processus « spawn » réimporterait toute l'application :
+                # threads à la place (Pillow libère le GIL pendant le décodage et la réduction)
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='derivatives')
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def path_for(self, attachment, kind):
+        if not attachment.content_hash:
+            return None
+        return f'{attachment_store.path_for_hash(attachment.content_hash)}.{kind}.jpg'
+
+    def etag_for(self, attachment, kind):
+        # Le dérivé ne dépend que de l'original, de sa taille cible et de la qualité
+        if not attachment.content_hash:
+            return None
+        return f'{attachment.content_hash}.{kind}.{self.quality}'
+
+    def schedule(self, attachment):
+        """Lance la construction des dérivés manquants ; retourne le Future, ou None s'il n'y a rien à faire."""
+        if not self.available or not attachment.is_image or not attachment.content_hash:
+            return None
+        digest = attachment.content_hash
+        with self._lock:
+            future = self._pending.get(digest)
+            if future is not None:
+                return future
+            targets = [
+                (self.path_for(attachment, kind), size)
+                for kind, size in DERIVATIVES.items()
+                if not os.path.exists(self.path_for(attachment, kind))
+            ]
+            if not targets:
+                return None
+            future = self._get_executor().submit(
+                render_derivatives, attachment_store.path_for_hash(digest), targets, self.quality
+            )
+            self._pending[digest] = future
+        future.add_done_callback(lambda done: self._finished(digest, attachment.id, done))
+        return future
+
+    def _finished(self, digest, attachment_id, future):
+        with self._lock:
+            self._pending.pop(digest, None)
+        error = future.exception()
+        if error is not None:
+            self.app.logger.error(f"Erreur lors de la création des aperçus de la pièce jointe {attachment_id}: {str(error)}")
+
+    def get(self, attachment, kind):
+        """Chemin du dérivé demandé, construit à la volée s'il manque ; None si impossible."""
+        path = self.path_for(attachment, kind)
+        if path is None or os.path.exists(path):
+            return path
+        future = self.schedule(attachment)
+        if future is None:
+            return None
+        try:
+            future.result(timeout=self.timeout)
+        except TimeoutError:
+            return None
+        except Exception:
+            return None  # déjà journalisé par _finished
+        return path if os.path.exists(path) else None
+
+
+attachment_derivatives = DerivativeBuilder()
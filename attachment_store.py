@@ -0,0 +1,248 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from batching import chunked
+from extensions import db
+from models import Attachment
+
+CHUNK_SIZE = 64 * 1024
+MIGRATION_BATCH_SIZE = 100
+
+
+class AttachmentStore:
+    """Stockage des pièces jointes par contenu (SHA-256), sans doublon.
+
+    Un fichier est rangé sous `<dossier>/ab/cd/<empreinte>` : le même bon de
+    commande joint à dix tickets n'est stocké qu'une fois. Les lignes
+    Attachment portant l'empreinte servent de compteur de références ; le
+    fichier est supprimé après le commit qui retire la dernière. Les anciens
+    fichiers `uploads/<ticket_id>/<nom>` (sans empreinte) restent lisibles et
+    sont migrés par migrate_attachments.py, une fois le schéma à jour.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.root = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.upload_folder = app.config['UPLOAD_FOLDER']
+        self.root = app.config['ATTACHMENT_STORE_FOLDER']
+        self.grace = app.config['ATTACHMENT_GC_GRACE']
+        self.temp_folder = os.path.join(self.root, 'tmp')
+        os.makedirs(self.temp_folder, exist_ok=True)
+        app.extensions['attachment_store'] = self
+
+    # Chemins
+
+    def path_for_hash(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def legacy_path(self, attachment):
+        return os.path.join(self.upload_folder, str(attachment.ticket_id), attachment.filename)
+
+    def path_for(self, attachment):
+        if attachment.content_hash:
+            return self.path_for_hash(attachment.content_hash)
+        return self.legacy_path(attachment)
+
+    # Écriture
+
+    def _publish(self, temp_path, digest):
+        """Range un fichier temporaire sous son empreinte ; s'il existe déjà, garde l'existant."""
+        target = self.path_for_hash(digest)
+        if os.path.exists(target):
+            os.remove(temp_path)
+            # Rafraîchit la date : le ramasse-miettes épargne les fichiers récents
+            os.utime(target)
+            return target
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(temp_path, target)
+        return target
+
+    def save(self, stream):
+        """Enregistre un flux en calculant son empreinte au fil de l'écriture.
+
+        Retourne (empreinte, taille). Le fichier n'est lu qu'une fois.
+        """
+        sha256 = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.temp_folder)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    sha256.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            digest = sha256.hexdigest()
+            self._publish(temp_path, digest)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return digest, size
+
+    def import_file(self, path):
+        """Ajoute au stockage un fichier existant, sans le déplacer ; retourne son empreinte."""
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+        target = self.path_for_hash(digest)
+        if os.path.exists(target):
+            os.utime(target)
+            return digest
+        fd, temp_path = tempfile.mkstemp(dir=self.temp_folder)
+        os.close(fd)
+        os.remove(temp_path)
+        try:
+            # Lien physique si possible (même disque), sinon copie
+            os.link(path, temp_path)
+        except OSError:
+            shutil.copyfile(path, temp_path)
+        self._publish(temp_path, digest)
+        return digest
+
+    # Ramasse-miettes
+
+    def _reference_counts(self, connection, digests):
+        table = Attachment.__table__
+        counts = {}
+        for chunk in chunked(digests):
+            counts.update(connection.execute(
+                select(table.c.content_hash, func.count())
+                .where(table.c.content_hash.in_(chunk))
+                .group_by(table.c.content_hash)
+            ).all())
+        return counts
+
+    def _remove_if_stale(self, digest):
+        """Supprime un fichier et ses dérivés (<empreinte>.thumb.jpg...) s'il n'est pas récent."""
+        path = self.path_for_hash(digest)
+        try:
+            if time.time() - os.path.getmtime(path) < self.grace:
+                # Peut-être en cours d'envoi pour un ticket pas encore validé
+                return False
+        except FileNotFoundError:
+            pass  # original déjà supprimé : il peut rester des dérivés
+        directory = os.path.dirname(path)
+        removed = False
+        for name in os.listdir(directory) if os.path.isdir(directory) else ():
+            if name == digest or name.startswith(digest + '.'):
+                try:
+                    os.remove(os.path.join(directory, name))
+                    removed = True
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def release(self, digests=(), legacy_paths=()):
+        """Supprime les fichiers qui ne sont plus référencés par aucune pièce jointe."""
+        removed = 0
+        for path in legacy_paths:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.app.logger.error(f"Erreur lors de la suppression du fichier {path}: {str(e)}")
+        if digests:
+            try:
+                with db.engine.connect() as connection:
+                    referenced = self._reference_counts(connection, digests)
+                for digest in set(digests) - set(referenced):
+                    removed += self._remove_if_stale(digest)
+            except Exception as e:
+                self.app.logger.error(f"Erreur lors du nettoyage des pièces jointes : {str(e)}")
+        return removed
+
+    def collect_garbage(self):
+        """Parcourt tout le stockage et supprime les fichiers orphelins (envoi annulé, arrêt brutal)."""
+        digests = set()
+        for directory, subdirectories, files in os.walk(self.root):
+            if os.path.abspath(directory) == os.path.abspath(self.temp_folder):
+                continue
+            # Originaux et dérivés : les dérivés d'un original disparu sont aussi ramassés
+            digests.update(name[:64] for name in files if len(name) >= 64)
+        if not digests:
+            return 0
+        with db.engine.connect() as connection:
+            referenced = self._reference_counts(connection, digests)
+        return sum(self._remove_if_stale(digest) for digest in digests if digest not in referenced)
+
+    # Migration des anciens fichiers
+
+    def migrate_legacy(self, batch_size=MIGRATION_BATCH_SIZE):
+        """Range dans le stockage les pièces jointes sans empreinte, par lots.
+
+        Chaque lot est validé avant la suppression des anciens fichiers : une
+        interruption ne laisse que des fichiers orphelins, jamais une pièce
+        jointe introuvable. Retourne (migrées, fichiers manquants).
+        """
+        migrated = missing = 0
+        last_id = 0
+        while True:
+            attachments = Attachment.query.filter(
+                Attachment.content_hash.is_(None), Attachment.id > last_id
+            ).order_by(Attachment.id).limit(batch_size).all()
+            if not attachments:
+                break
+            last_id = attachments[-1].id
+            done = []
+            for attachment in attachments:
+                path = self.legacy_path(attachment)
+                try:
+                    attachment.content_hash = self.import_file(path)
+                    done.append(path)
+                except FileNotFoundError:
+                    missing += 1
+                    self.app.logger.error(f"Pièce jointe {attachment.id} introuvable : {path}")
+            db.session.commit()
+            for path in done:
+                try:
+                    os.remove(path)
+                    os.rmdir(os.path.dirname(path))
+                except OSError:
+                    pass  # dossier du ticket pas encore vide
+            migrated += len(done)
+        return migrated, missing
+
+
+attachment_store = AttachmentStore()
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_released_attachments(session, flush_context):
+    for obj in session.deleted:
+        if isinstance(obj, Attachment):
+            if obj.content_hash:
+                session.info.setdefault('released_hashes', set()).add(obj.content_hash)
+            elif attachment_store.app is not None:
+                session.info.setdefault('released_files', set()).add(attachment_store.legacy_path(obj))
+
+
+@event.listens_for(Session, 'after_commit')
+def release_attachments(session):
+    digests = session.info.pop('released_hashes', None)
+    legacy_paths = session.info.pop('released_files', None)
+    if (digests or legacy_paths) and attachment_store.app is not None:
+        attachment_store.release(digests or (), legacy_paths or ())
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_released_attachments(session):
+    session.info.pop('released_hashes', None)
+    session.info.pop('released_files', None)
@@ -0,0 +1,191 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from extensions import db
+from models import UserAction, UserActionArchive
+
+# Marqueur de fin envoyé au thread d'écriture
+_STOP = object()
+
+
+class AuditWriter:
+    """Écrit le journal d'audit (UserAction) par lots, hors des requêtes.
+
+    Les requêtes se contentent de mettre l'action en file ; un thread insère
+    les lots en un seul `executemany` toutes les AUDIT_FLUSH_INTERVAL secondes
+    ou dès que AUDIT_BATCH_SIZE actions sont en attente. À l'arrêt, la file
+    est vidée avant la sortie. Un lot impossible à écrire est conservé dans
+    `audit_fallback.jsonl` du dossier des logs plutôt que perdu.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.queue = None
+        self._thread = None
+        self._write_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config['AUDIT_BATCH_SIZE']
+        self.interval = app.config['AUDIT_FLUSH_INTERVAL']
+        self.fallback_path = os.path.join(app.config['LOG_FOLDER'], 'audit_fallback.jsonl')
+        self.queue = queue.Queue(maxsize=app.config['AUDIT_QUEUE_SIZE'])
+        app.extensions['audit'] = self
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def record(self, action_type, module, details, user_id=None, ip_address=None):
+        """Met une action en file ; bloque seulement si la file est pleine."""
+        self.queue.put({
+            'timestamp': datetime.now(timezone.utc),
+            'user_id': user_id,
+            'action_type': action_type,
+            'module': module,
+            'details': details,
+            'ip_address': ip_address,
+        })
+
+    def _next_batch(self, timeout):
+        """Attend une première action puis prend tout ce qui est déjà en file."""
+        batch = []
+        stop = False
+        try:
+            item = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return batch, stop
+        while True:
+            if item is _STOP:
+                stop = True
+            else:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                break
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+        return batch, stop
+
+    def _write(self, batch):
+        if not batch:
+            return
+        with self._write_lock:
+            try:
+                with self.app.app_context():
+                    engine = db.engines[UserAction.metadata.info.get('bind_key')]
+                    with engine.begin() as connection:
+                        connection.execute(UserAction.__table__.insert(), batch)
+            except Exception as e:
+                self.app.logger.error(f"Erreur lors de l'écriture du journal d'audit: {str(e)}")
+                self._write_fallback(batch)
+
+    def _write_fallback(self, batch):
+        try:
+            with open(self.fallback_path, 'a', encoding='utf-8') as f:
+                for item in batch:
+                    f.write(json.dumps(item, default=str, ensure_ascii=False) + '\n')
+        except OSError as e:
+            self.app.logger.error(f"{len(batch)} action(s) d'audit perdue(s): {str(e)}")
+
+    def _run(self):
+        while True:
+            batch, stop = self._next_batch(self.interval)
+            self._write(batch)
+            if stop:
+                return
+
+    def flush(self):
+        """Écrit immédiatement tout ce qui est en file (depuis le thread appelant)."""
+        while True:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    item = self.queue.get_nowait()
+                    if item is _STOP:
+                        self.queue.put(item)
+                        break
+                    batch.append(item)
+            except queue.Empty:
+                pass
+            if not batch:
+                return
+            self._write(batch)
+
+    def shutdown(self, timeout=10):
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+        # Si le thread n'a pas fini à temps, on écrit le reste nous-mêmes
+        self.flush()
+
+
+audit_writer = AuditWriter()
+
+
+class ActionCountCache:
+    """Totaux du journal d'audit par combinaison de filtres, gardés `ttl` secondes.
+
+    Le pager n'a besoin que d'un ordre de grandeur : on évite ainsi un
+    COUNT(*) complet à chaque page.
+    """
+
+    def __init__(self, ttl=60, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def get(self, key, compute):
+        now = time.monotonic()
+        cached = self._values.get(key)
+        if cached is not None and now - cached[1] < self.ttl:
+            return cached[0]
+        value = compute()
+        with self._lock:
+            if len(self._values) >= self.max_entries:
+                self._values.clear()
+            self._values[key] = (value, now)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+def archive_user_actions(before, batch_size=5000):
+    """Déplace les actions antérieures à `before` vers user_action_archive.
+
+    Chaque lot est copié puis supprimé dans sa propre transaction, pour ne
+    pas bloquer les écritures du journal pendant l'archivage. Retourne le
+    nombre d'actions déplacées.
+    """
+    actions = UserAction.__table__
+    archive = UserActionArchive.__table__
+    columns = [column.name for column in archive.columns]
+    engine = db.engines[UserAction.metadata.info.get('bind_key')]
+    archive.create(engine, checkfirst=True)
+
+    moved = 0
+    while True:
+        with engine.begin() as connection:
+            ids = connection.execute(
+                select(actions.c.id).where(actions.c.timestamp < before).order_by(actions.c.id).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                return moved
+            connection.execute(archive.insert().from_select(
+                columns, select(*[actions.c[name] for name in columns]).where(actions.c.id.in_(ids))
+            ))
+            connection.execute(actions.delete().where(actions.c.id.in_(ids)))
+        moved += len(ids)
@@ -3,17 +3,10 @@ import shutil
 from datetime import datetime, timedelta
 import sqlite3
 import logging
+from log_pipeline import setup_logging
 from pathlib import Path
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('backup.log'),
-        logging.StreamHandler()
-    ]
-)
+logger = logging.getLogger('backup')
 
 def get_backup_dir():
     """Crée et retourne le répertoire de sauvegarde."""
@@ -40,7 +33,7 @@ def get_settings():
                 'retention': result[1]   # jours
             }
     except Exception as e:
-        logging.error(f"Erreur lors de la récupération des paramètres : {e}")
+        logger.error(f"Erreur lors de la récupération des paramètres : {e}")
     
     # Valeurs par défaut si erreur
     return {
@@ -53,7 +46,7 @@ def create_backup():
     try:
         db_path = get_db_path()
         if not db_path.exists():
-            logging.error("Base de données non trouvée")
+            logger.error("Base de données non trouvée")
             return False
 
         backup_dir = get_backup_dir()
@@ -62,11 +55,11 @@ def create_backup():
 
         # Copie de la base de données
         shutil.copy2(db_path, backup_path)
-        logging.info(f"Sauvegarde créée : {backup_path}")
+        logger.info(f"Sauvegarde créée : {backup_path}")
         return True
 
     except Exception as e:
-        logging.error(f"Erreur lors de la création de la sauvegarde : {e}")
+        logger.error(f"Erreur lors de la création de la sauvegarde : {e}")
         return False
 
 def cleanup_old_backups():
@@ -85,12 +78,12 @@ def cleanup_old_backups():
                 
                 if backup_date < cutoff_date:
                     backup_file.unlink()
-                    logging.info(f"Sauvegarde supprimée : {backup_file}")
+                    logger.info(f"Sauvegarde supprimée : {backup_file}")
             except Exception as e:
-                logging.error(f"Erreur lors de la suppression de {backup_file} : {e}")
+                logger.error(f"Erreur lors de la suppression de {backup_file} : {e}")
 
     except Exception as e:
-        logging.error(f"Erreur lors du nettoyage des sauvegardes : {e}")
+        logger.error(f"Erreur lors du nettoyage des sauvegardes : {e}")
 
 def main():
     """Fonction principale."""
@@ -105,17 +98,19 @@ def main():
             time_since_last_backup = datetime.now() - last_backup_time
             
             if time_since_last_backup < timedelta(hours=settings['frequency']):
-                logging.info("Pas besoin de nouvelle sauvegarde")
+                logger.info("Pas besoin de nouvelle sauvegarde")
                 return
 
         # Créer une nouvelle sauvegarde
         if create_backup():
             cleanup_old_backups()
         else:
-            logging.error("Échec de la création de la sauvegarde")
+            logger.error("Échec de la création de la sauvegarde")
 
     except Exception as e:
-        logging.error(f"Erreur dans la fonction principale : {e}")
+        logger.error(f"Erreur dans la fonction principale : {e}")
 
 if __name__ == '__main__':
+    # Journal JSON écrit par le thread de log_pipeline
+    setup_logging('backup.log', console=True)
     main() 
\ No newline at end of file
@@ -0,0 +1,37 @@
+from itertools import islice
+
+# Nombre de valeurs par clause IN (...) : sous la limite de paramètres de SQLite
+IN_CHUNK_SIZE = 500
+
+
+def chunked(values, size=IN_CHUNK_SIZE):
+    """Découpe `values` (tout itérable) en listes d'au plus `size` éléments."""
+    iterator = iter(values)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class OperationResult:
+    """Résultat d'une opération groupée tout ou rien : erreurs par élément, rien n'est écrit s'il y en a.
+
+    `error_key` nomme ce qui identifie l'élément en erreur (n° de ligne,
+    identifiant de ticket...) ; les sous-classes complètent `to_dict`.
+    """
+
+    error_key = 'item'
+
+    def __init__(self):
+        self.errors = []
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def error(self, item, message):
+        self.errors.append({self.error_key: item, 'message': message})
+
+    def to_dict(self):
+        return {'success': self.ok, 'errors': self.errors}
@@ -0,0 +1,94 @@
+"""Mesure le nombre de requêtes SQL et la latence de /dashboard-data.
+
+Usage : python benchmarks/bench_dashboard.py [nombre_de_tickets] [iterations]
+La base est créée en mémoire et remplie par insertion groupée (100 000 tickets par défaut).
+Le cache des réponses est invalidé avant chaque appel et aucun If-None-Match
+n'est envoyé : chaque itération mesure le calcul complet, pas le cache.
+"""
+import os
+import sys
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Base en mémoire : doit être défini avant l'import de la configuration
+os.environ['DATABASE_URL'] = 'sqlite://'
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import event, insert
+
+from app import app
+from extensions import db
+from models import Client, Ticket, refresh_daily_stats
+from response_cache import response_cache
+
+STATUSES = ['en_attente', 'valide', 'refuse']
+RETURN_TYPES = ['retour_client', 'retour_magasin', 'retour_garantie']
+
+
+def seed(ticket_count, client_count=500):
+    now = datetime.now(timezone.utc)
+    db.session.execute(insert(Client.__table__), [
+        {'account_number': f'CLI{i:05d}', 'name': f'Client {i}', 'is_active': True,
+         'created_at': now, 'updated_at': now}
+        for i in range(1, client_count + 1)
+    ])
+    batch = []
+    for i in range(1, ticket_count + 1):
+        created_at = now - timedelta(minutes=random.randint(0, 60 * 24 * 365))
+        batch.append({
+            'ticket_number': f'TKT{i:06d}',
+            'client_id': random.randint(1, client_count),
+            'return_type': random.choice(RETURN_TYPES),
+            'status': random.choice(STATUSES),
+            'created_at': created_at,
+            'updated_at': created_at,
+            'refund_total': round(random.uniform(0, 500), 2),
+        })
+        if len(batch) == 10000:
+            db.session.execute(insert(Ticket.__table__), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Ticket.__table__), batch)
+    # Les insertions groupées contournent les événements ORM : recalcul complet des cumuls
+    refresh_daily_stats(db.session.connection())
+    db.session.commit()
+
+
+def main():
+    ticket_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    app.config['LOGIN_DISABLED'] = True
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        seed(ticket_count)
+        print(f"{ticket_count} tickets insérés en {time.perf_counter() - started:.1f} s")
+
+        statements = []
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        client = app.test_client()
+        durations = []
+        for _ in range(iterations):
+            # Hors chronomètre : sans invalidation, seul le premier appel calculerait
+            response_cache.invalidate('ticket')
+            statements.clear()
+            started = time.perf_counter()
+            response = client.get('/dashboard-data')
+            durations.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.status_code
+
+        durations.sort()
+        print(f"Requêtes SQL par appel : {len(statements)}")
+        print(f"Latence médiane : {durations[len(durations) // 2] * 1000:.1f} ms")
+        print(f"Latence max : {durations[-1] * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Mesure la création concurrente de tickets et l'unicité des numéros attribués.
+
+Usage : python benchmarks/bench_ticket_numbers.py [threads] [tickets_par_thread] [--legacy]
+Chaque thread crée ses tickets un par un (ajout, commit) comme create_ticket.
+--legacy rejoue l'ancienne numérotation (dernier ticket + 1) pour comparaison.
+La base SQLite est un fichier temporaire partagé par les threads.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Base fichier partagée : doit être défini avant l'import de la configuration
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'bench_ticket_numbers.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + DATABASE_PATH
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import event, func
+
+from app import app
+from extensions import db
+from models import Client, Ticket, format_ticket_number
+
+
+def legacy_ticket_number():
+    last_ticket = Ticket.query.order_by(Ticket.id.desc()).first()
+    return format_ticket_number(int(last_ticket.ticket_number[3:]) + 1 if last_ticket else 1)
+
+
+def worker(client_id, count, legacy, durations, errors):
+    with app.app_context():
+        for _ in range(count):
+            started = time.perf_counter()
+            try:
+                ticket = Ticket(client_id=client_id, return_type='retour_client')
+                if legacy:
+                    ticket.ticket_number = legacy_ticket_number()
+                db.session.add(ticket)
+                db.session.commit()
+                durations.append(time.perf_counter() - started)
+            except Exception as e:
+                db.session.rollback()
+                errors.append(type(e).__name__)
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    threads = int(args[0]) if len(args) > 0 else 8
+    per_thread = int(args[1]) if len(args) > 1 else 200
+    legacy = '--legacy' in sys.argv
+
+    with app.app_context():
+        @event.listens_for(db.engine, 'connect')
+        def set_busy_timeout(dbapi_connection, connection_record):
+            # Laisser les écrivains SQLite attendre leur tour plutôt qu'échouer
+            dbapi_connection.execute('PRAGMA busy_timeout = 30000')
+
+        db.create_all()
+        client = Client(account_number='BENCH001', name='Client benchmark')
+        db.session.add(client)
+        db.session.commit()
+        client_id = client.id
+
+    durations = []
+    errors = []
+    workers = [
+        threading.Thread(target=worker, args=(client_id, per_thread, legacy, durations, errors))
+        for _ in range(threads)
+    ]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        created, distinct_numbers = db.session.query(
+            func.count(Ticket.id), func.count(func.distinct(Ticket.ticket_number))
+        ).one()
+
+    durations.sort()
+    print(f"Stratégie : {'dernier ticket + 1' if legacy else 'compteur atomique'}")
+    print(f"{threads} threads x {per_thread} tickets : {created} créés en {elapsed:.2f} s "
+          f"({created / elapsed:.0f} tickets/s)")
+    if durations:
+        print(f"Latence médiane : {durations[len(durations) // 2] * 1000:.1f} ms, "
+              f"p99 : {durations[int(len(durations) * 0.99)] * 1000:.1f} ms")
+    print(f"Numéros distincts : {distinct_numbers}/{created}")
+    if errors:
+        print(f"Échecs : {len(errors)} ({', '.join(sorted(set(errors)))})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+from sqlalchemy import select, union, func
+
+from models import Client, Ticket, Product, ReceptionLog
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # dépendance optionnelle
+    pa = None
+    pq = None
+
+MANIFEST_NAME = '_manifest.json'
+
+FILE_EXTENSIONS = {
+    'parquet': 'parquet',
+    'arrow': 'arrow',
+}
+
+
+def ticket_month_expression():
+    """Mois de création du ticket ('AAAA-MM') : clé de partition de tous les jeux."""
+    return func.strftime('%Y-%m', Ticket.created_at)
+
+
+# Jeux de données exportés : colonnes (nom, expression SQL, type) et source.
+# Chaque ligne est rattachée au mois de création de son ticket, pour que la
+# modification d'un produit ou d'une réception ne réécrive que ce mois-là.
+BI_DATASETS = {
+    'tickets': {
+        'columns': [
+            ('id', Ticket.id, 'int64'),
+            ('ticket_number', Ticket.ticket_number, 'string'),
+            ('client_id', Ticket.client_id, 'int64'),
+            ('account_number', Client.account_number, 'string'),
+            ('client_name', Client.name, 'string'),
+            ('return_type', Ticket.return_type, 'string'),
+            ('status', Ticket.status, 'string'),
+            ('created_at', Ticket.created_at, 'timestamp'),
+            ('updated_at', Ticket.updated_at, 'timestamp'),
+            ('shipping_cost_refund', Ticket.shipping_cost_refund, 'bool'),
+            ('shipping_cost_amount', Ticket.shipping_cost_amount, 'float64'),
+            ('packaging_cost_refund', Ticket.packaging_cost_refund, 'bool'),
+            ('packaging_cost_amount', Ticket.packaging_cost_amount, 'float64'),
+            ('fault_attribution', Ticket.fault_attribution, 'string'),
+            ('return_reason', Ticket.return_reason, 'string'),
+            ('refund_total', Ticket.refund_total, 'float64'),
+        ],
+        'source': lambda columns: select(*columns).select_from(Ticket).join(Client, Client.id == Ticket.client_id),
+    },
+    'products': {
+        'columns': [
+            ('id', Product.id, 'int64'),
+            ('ticket_id', Product.ticket_id, 'int64'),
+            ('ticket_number', Ticket.ticket_number, 'string'),
+            ('product_ref', Product.product_ref, 'string'),
+            ('name', Product.name, 'string'),
+            ('price', Product.price, 'float64'),
+            ('created_at', Product.created_at, 'timestamp'),
+            ('updated_at', Product.updated_at, 'timestamp'),
+        ],
+        'source': lambda columns: select(*columns).select_from(Product).join(Ticket, Ticket.id == Product.ticket_id),
+    },
+    'reception_logs': {
+        'columns': [
+            ('id', ReceptionLog.id, 'int64'),
+            ('ticket_id', ReceptionLog.ticket_id, 'int64'),
+            ('product_id', ReceptionLog.product_id, 'int64'),
+            ('user_id', ReceptionLog.user_id, 'int64'),
+            ('status', ReceptionLog.status, 'string'),
+            ('quantity_received', ReceptionLog.quantity_received, 'int64'),
+            ('created_at', ReceptionLog.created_at, 'timestamp'),
+        ],
+        'source': lambda columns: select(*columns).select_from(ReceptionLog).join(
+            Ticket, Ticket.id == ReceptionLog.ticket_id
+        ),
+    },
+    'credit_notes': {
+        'columns': [
+            ('ticket_id', Ticket.id, 'int64'),
+            ('ticket_number', Ticket.ticket_number, 'string'),
+            ('account_number', Client.account_number, 'string'),
+            ('credit_note_number', Ticket.credit_note_number, 'string'),
+            ('credit_note_date', Ticket.credit_note_date, 'timestamp'),
+            ('validated', Ticket.credit_note_validated, 'bool'),
+            ('validated_by', Ticket.credit_note_validated_by, 'int64'),
+            ('amount', Ticket.refund_total, 'float64'),
+        ],
+        'source': lambda columns: select(*columns).select_from(Ticket).join(
+            Client, Client.id == Ticket.client_id
+        ).where(Ticket.credit_note_number.isnot(None)),
+    },
+}
+
+
+def _arrow_type(name):
+    if name == 'timestamp':
+        # Les dates sont stockées en UTC sans fuseau
+        return pa.timestamp('us', tz='UTC')
+    return {'int64': pa.int64(), 'float64': pa.float64(), 'bool': pa.bool_(), 'string': pa.string()}[name]
+
+
+def dataset_schema(name):
+    return pa.schema([(column, _arrow_type(kind)) for column, _, kind in BI_DATASETS[name]['columns']])
+
+
+def _changed_months(connection, since):
+    """Mois contenant au moins une ligne créée ou modifiée après `since`."""
+    month = ticket_month_expression()
+    changed = union(
+        select(month).where(Ticket.updated_at > since),
+        select(month).join(Client, Client.id == Ticket.client_id).where(Client.updated_at > since),
+        select(month).join(Product, Product.ticket_id == Ticket.id).where(Product.updated_at > since),
+        # Les réceptions ne sont jamais modifiées : leur date de création suffit
+        select(month).join(ReceptionLog, ReceptionLog.ticket_id == Ticket.id).where(ReceptionLog.created_at > since),
+    )
+    return {row[0] for row in connection.execute(changed) if row[0]}
+
+
+def _partition_counts(connection):
+    """Nombre de lignes par jeu et par mois, pour repérer les suppressions."""
+    month = ticket_month_expression()
+    counts = {}
+    for name, dataset in BI_DATASETS.items():
+        rows = connection.execute(dataset['source']([month, func.count()]).group_by(month))
+        for row_month, count in rows:
+            if row_month:
+                counts.setdefault(row_month, {})[name] = count
+    return counts
+
+
+class BIExporter:
+    """Export colonnaire (Parquet ou Arrow IPC) partitionné par mois.
+
+    Arborescence produite, lisible par pyarrow.dataset, DuckDB ou Spark :
+    `<dossier>/<jeu>/month=AAAA-MM/part.<ext>`. Le manifeste garde le
+    filigrane de la dernière exécution et le nombre de lignes par partition :
+    une relance ne réécrit que les mois modifiés depuis le filigrane ou dont
+    le nombre de lignes a changé (suppressions).
+    """
+
+    def __init__(self, folder, export_format='parquet', batch_size=5000):
+        if pa is None:
+            raise RuntimeError("L'export BI nécessite pyarrow (pip install pyarrow)")
+        if export_format not in FILE_EXTENSIONS:
+            raise ValueError(f"Format d'export BI inconnu : {export_format}")
+        self.folder = folder
+        self.format = export_format
+        self.batch_size = batch_size
+        self.manifest_path = os.path.join(folder, MANIFEST_NAME)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['BI_EXPORT_FOLDER'], config['BI_EXPORT_FORMAT'], config['BI_EXPORT_BATCH_SIZE'])
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        # Changer de format impose de tout réécrire
+        return manifest if manifest.get('format') == self.format else None
+
+    def _save_manifest(self, manifest):
+        temp_path = self.manifest_path + '.part'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def partition_dir(self, name, month):
+        return os.path.join(self.folder, name, f'month={month}')
+
+    def _write_partition(self, connection, name, month):
+        dataset = BI_DATASETS[name]
+        schema = dataset_schema(name)
+        directory = self.partition_dir(name, month)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'part.{FILE_EXTENSIONS[self.format]}')
+        temp_path = path + '.part'
+
+        query = dataset['source']([expression.label(column) for column, expression, _ in dataset['columns']]).where(
+            ticket_month_expression() == month
+        ).order_by(dataset['columns'][0][1])
+        result = connection.execution_options(yield_per=self.batch_size).execute(query)
+
+        if self.format == 'parquet':
+            writer = pq.ParquetWriter(temp_path, schema)
+        else:
+            writer = pa.ipc.new_file(temp_path, schema)
+        count = 0
+        try:
+            for rows in result.partitions():
+                batch = pa.RecordBatch.from_pylist([dict(row._mapping) for row in rows], schema=schema)
+                writer.write_batch(batch)
+                count += len(rows)
+        finally:
+            writer.close()
+        os.replace(temp_path, path)
+        return count
+
+    def run(self, connection, full=False):
+        """Exporte les partitions à jour ; retourne {mois: {jeu: lignes}} des partitions réécrites."""
+        started_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        manifest = None if full else self.load_manifest()
+        previous = manifest['partitions'] if manifest else {}
+
+        counts = _partition_counts(connection)
+        if manifest:
+            since = datetime.fromisoformat(manifest['watermark'])
+            months = _changed_months(connection, since)
+            months |= {month for month in counts if counts[month] != previous.get(month)}
+        else:
+            # Export complet : on repart d'une arborescence vide
+            for name in BI_DATASETS:
+                shutil.rmtree(os.path.join(self.folder, name), ignore_errors=True)
+            months = set(counts)
+        os.makedirs(self.folder, exist_ok=True)
+
+        written = {}
+        for month in sorted(months & set(counts)):
+            written[month] = {}
+            for name in BI_DATASETS:
+                directory = self.partition_dir(name, month)
+                if counts[month].get(name):
+                    written[month][name] = self._write_partition(connection, name, month)
+                elif os.path.isdir(directory):
+                    shutil.rmtree(directory)
+
+        # Mois dont tous les tickets ont disparu
+        for month in set(previous) - set(counts):
+            for name in BI_DATASETS:
+                directory = self.partition_dir(name, month)
+                if os.path.isdir(directory):
+                    shutil.rmtree(directory)
+
+        self._save_manifest({
+            'format': self.format,
+            'watermark': started_at.isoformat(),
+            'partitions': {month: counts[month] for month in sorted(counts)},
+        })
+        return written
@@ -0,0 +1,124 @@
+import threading
+from bisect import bisect_left
+from itertools import chain
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from data_versions import get_data_versions
+from extensions import db
+from models import Client
+
+
+class ClientPrefixIndex:
+    """Index mémoire trié des numéros de compte et noms de clients.
+
+    Chargé à la première interrogation, invalidé dès qu'un client est ajouté,
+    modifié ou supprimé. Les recherches par préfixe se font par dichotomie.
+    L'index est un instantané immuable (version, clés de compte, clés de nom,
+    comptes, clients) remplacé d'un bloc : une lecture ne voit jamais un index
+    à moitié vidé. Il porte la version 'client' de data_versions, si bien qu'une
+    modification faite par un autre processus est vue à la requête suivante.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    @staticmethod
+    def _normalize(value):
+        return (value or '').strip().casefold()
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    @staticmethod
+    def _current_version():
+        if 'data_versions' not in current_app.extensions:
+            return None  # versions indisponibles : seule l'invalidation locale s'applique
+        return get_data_versions(('client',))[0]
+
+    def _load(self):
+        """Retourne l'instantané courant, rechargé s'il est absent ou d'une version périmée."""
+        version = self._current_version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot[0] == version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot[0] == version:
+                return snapshot
+            rows = db.session.query(
+                Client.id, Client.account_number, Client.name, Client.email, Client.phone, Client.address
+            ).all()
+            clients = {}
+            account_keys = []
+            name_keys = []
+            by_account = {}
+            for client_id, account_number, name, email, phone, address in rows:
+                clients[client_id] = {
+                    'id': client_id,
+                    'account_number': account_number,
+                    'name': name,
+                    'email': email,
+                    'phone': phone,
+                    'address': address
+                }
+                by_account[account_number] = client_id
+                account_keys.append((self._normalize(account_number), client_id))
+                # Chaque mot du nom est indexé pour l'autocomplétion sur « Dupont » dans « SARL Dupont »
+                for word in self._normalize(name).split():
+                    name_keys.append((word, client_id))
+            account_keys.sort()
+            name_keys.sort()
+            self._snapshot = (version, tuple(account_keys), tuple(name_keys), by_account, clients)
+            return self._snapshot
+
+    def get(self, account_number):
+        """Retourne le client dont le numéro de compte est exactement celui donné."""
+        version, account_keys, name_keys, by_account, clients = self._load()
+        client_id = by_account.get((account_number or '').strip().upper())
+        return clients.get(client_id) if client_id is not None else None
+
+    def search(self, prefix, limit=10):
+        """Retourne au plus `limit` clients dont le compte ou un mot du nom commence par `prefix`."""
+        prefix = self._normalize(prefix)
+        if not prefix:
+            return []
+        version, account_keys, name_keys, by_account, clients = self._load()
+        results = []
+        seen = set()
+        # Tous les numéros de compte correspondants passent avant les noms
+        for keys in (account_keys, name_keys):
+            position = bisect_left(keys, (prefix,))
+            while position < len(keys) and len(results) < limit:
+                key, client_id = keys[position]
+                if not key.startswith(prefix):
+                    break
+                if client_id not in seen:
+                    seen.add(client_id)
+                    results.append(clients[client_id])
+                position += 1
+        return results
+
+
+client_index = ClientPrefixIndex()
+
+
+@event.listens_for(Session, 'after_flush')
+def mark_client_index_stale(session, flush_context):
+    if any(isinstance(obj, Client) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info['client_index_stale'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_client_index(session):
+    if session.info.pop('client_index_stale', False):
+        client_index.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_client_index_changes(session):
+    session.info.pop('client_index_stale', None)
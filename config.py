@@ -1,6 +1,7 @@
 import os
 from datetime import timedelta
 from flask import render_template, jsonify
+from log_pipeline import parse_levels
 
 class Config:
     # Configuration de base
@@ -12,6 +13,15 @@ class Config:
         'sqlite:///' + os.path.join(BASE_DIR, 'instance', 'sav.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Journal d'audit (UserAction) : base séparée facultative, écrite par lots en arrière-plan
+    AUDIT_DATABASE_URL = os.environ.get('AUDIT_DATABASE_URL')
+    SQLALCHEMY_BINDS = {'audit': AUDIT_DATABASE_URL} if AUDIT_DATABASE_URL else {}
+    AUDIT_BATCH_SIZE = 200
+    AUDIT_FLUSH_INTERVAL = 2  # secondes
+    AUDIT_QUEUE_SIZE = 10000
+    AUDIT_COUNT_TTL = 60  # secondes de validité du total affiché par /actions
+    AUDIT_ARCHIVE_AFTER_DAYS = int(os.environ.get('AUDIT_ARCHIVE_AFTER_DAYS') or 90)
+    
     # Configuration des sessions
     PERMANENT_SESSION_LIFETIME = timedelta(minutes=30)
     SESSION_COOKIE_SECURE = False  # Désactivé en développement
@@ -22,6 +32,15 @@ class Config:
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max
     ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx', 'xls', 'xlsx', 'msg'}
+    ATTACHMENT_STORE_FOLDER = os.path.join(UPLOAD_FOLDER, 'store')  # pièces jointes rangées par empreinte
+    ATTACHMENT_GC_GRACE = 60  # secondes pendant lesquelles un fichier récent n'est pas supprimé
+    DERIVATIVE_WORKERS = int(os.environ.get('DERIVATIVE_WORKERS') or 2)  # processus de création des aperçus
+    DERIVATIVE_QUALITY = 82  # qualité JPEG des miniatures et versions web
+    DERIVATIVE_TIMEOUT = 30  # secondes d'attente d'un aperçu construit à la demande
+    # Envoi des pièces jointes par le serveur frontal : vide (Flask), 'x-sendfile' (Apache) ou 'x-accel-redirect' (nginx)
+    ATTACHMENT_SENDFILE = (os.environ.get('ATTACHMENT_SENDFILE') or '').strip().lower() or None
+    ATTACHMENT_ACCEL_PREFIX = os.environ.get('ATTACHMENT_ACCEL_PREFIX') or '/protected-uploads/'  # location internal -> UPLOAD_FOLDER
+    ATTACHMENT_MAX_AGE = 3600  # secondes avant revalidation (ETag) par le navigateur
     
     # Configuration des emails
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
@@ -33,6 +52,10 @@ class Config:
     
     # Configuration de l'application
     TICKETS_PER_PAGE = 25
+    # Numéros de ticket réservés par bloc et par processus (1 : un par transaction, sans trou)
+    TICKET_NUMBER_BLOCK_SIZE = int(os.environ.get('TICKET_NUMBER_BLOCK_SIZE') or 1)
+    IMPORT_MAX_ROWS = 5000  # lignes max. d'un fichier d'import de tickets
+    BULK_MAX_TICKETS = 1000  # tickets max. d'une action groupée (statut, avoirs)
     MAX_LOGIN_ATTEMPTS = 5
     LOGIN_TIMEOUT = 30  # minutes
     
@@ -41,30 +64,78 @@ class Config:
     BACKUP_FREQUENCY = 1  # heures
     BACKUP_RETENTION = 30  # jours
     
+    # Configuration des exports en arrière-plan
+    EXPORT_FOLDER = os.path.join(BASE_DIR, 'instance', 'exports')
+    EXPORT_WORKERS = 2
+    EXPORT_DEDUP_WINDOW = 300  # secondes
+    EXPORT_RETENTION = 24  # heures
+    EXPORT_JOB_TIMEOUT = 1800  # secondes, au-delà une tâche non terminée est considérée interrompue
+
+    # Export colonnaire pour la BI (nécessite pyarrow), format 'parquet' ou 'arrow'
+    BI_EXPORT_FOLDER = os.environ.get('BI_EXPORT_FOLDER') or os.path.join(BASE_DIR, 'instance', 'bi')
+    BI_EXPORT_FORMAT = os.environ.get('BI_EXPORT_FORMAT') or 'parquet'
+    BI_EXPORT_BATCH_SIZE = 5000
+
+    # Présence des utilisateurs : last_seen n'est réécrit que s'il date de plus de
+    # PRESENCE_FRESHNESS secondes, par lots toutes les PRESENCE_FLUSH_INTERVAL secondes
+    PRESENCE_FRESHNESS = int(os.environ.get('PRESENCE_FRESHNESS') or 60)
+    PRESENCE_FLUSH_INTERVAL = int(os.environ.get('PRESENCE_FLUSH_INTERVAL') or 30)
+    PRESENCE_BACKEND = os.environ.get('PRESENCE_BACKEND') or 'memory'  # 'memory' ou 'redis'
+    
     # Configuration des logs
     LOG_FOLDER = os.path.join(BASE_DIR, 'logs')
-    LOG_LEVEL = 'INFO'
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+    # Niveaux par module, ex. LOG_LEVELS="notifications=DEBUG,sqlalchemy.engine=WARNING"
+    LOG_LEVELS = parse_levels(os.environ.get('LOG_LEVELS'))
+    LOG_PAGE_SIZE = 100
+    LOG_INDEX_STEP = 64 * 1024  # octets entre deux entrées de l'index annexe des logs
+    
+    # Autocomplétion des clients (index mémoire)
+    CLIENT_AUTOCOMPLETE_LIMIT = 10
+    CLIENT_AUTOCOMPLETE_MAX_LIMIT = 50
+    
+    # Configuration de la recherche plein texte ('auto', 'sqlite_fts5' ou 'like')
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND') or 'auto'
     
     # Configuration de Redis
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
     
+    # Cache des tableaux de bord et pages de consultation ('auto' : Redis s'il répond,
+    # sinon mémoire du processus), invalidé par étiquettes à chaque écriture
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND') or 'auto'  # 'auto', 'redis' ou 'memory'
+    RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT') or 300)  # secondes
+    RESPONSE_CACHE_THRESHOLD = 500  # entrées max. du cache mémoire
+    RESPONSE_CACHE_PREFIX = 'sav:'
+    
     @staticmethod
     def init_app(app):
         # Créer les dossiers nécessaires
-        for folder in [app.config['UPLOAD_FOLDER'], app.config['BACKUP_FOLDER'], app.config['LOG_FOLDER']]:
+        for folder in [app.config['UPLOAD_FOLDER'], app.config['BACKUP_FOLDER'], app.config['LOG_FOLDER'], app.config['EXPORT_FOLDER']]:
             os.makedirs(folder, exist_ok=True)
         
-        # Configurer le logging
+        # Configurer le logging : les requêtes ne font que mettre en file,
+        # le thread de log_pipeline écrit app.log (JSON, relu par /logs) et la console
         import logging
-        from logging.handlers import RotatingFileHandler
+        from flask.logging import default_handler
+        from log_pipeline import log_pipeline, RequestUserFilter
         
+        log_pipeline.install(logging.getLevelName(app.config['LOG_LEVEL']))
+        log_pipeline.add_filter(RequestUserFilter())
         log_file = os.path.join(app.config['LOG_FOLDER'], 'app.log')
-        handler = RotatingFileHandler(log_file, maxBytes=10000000, backupCount=10)
-        handler.setFormatter(logging.Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-        ))
-        handler.setLevel(logging.INFO)
-        app.logger.addHandler(handler)
+        log_pipeline.add_file(log_file, max_bytes=10000000, backup_count=10)
+        log_pipeline.add_console()
+        app.logger.removeHandler(default_handler)
+        for name, level in app.config['LOG_LEVELS'].items():
+            log_pipeline.set_level(name, level)
+        
+        # Mode d'envoi des pièces jointes vérifié une fois : inconnu, Flask envoie lui-même les fichiers
+        from attachment_delivery import SENDFILE_HEADERS
+        sendfile = app.config['ATTACHMENT_SENDFILE']
+        if sendfile and sendfile not in SENDFILE_HEADERS:
+            app.logger.error(
+                f"ATTACHMENT_SENDFILE inconnu : '{sendfile}' (attendu : {', '.join(SENDFILE_HEADERS)}), envoi direct par Flask"
+            )
+            app.config['ATTACHMENT_SENDFILE'] = None
         
         # Configurer la gestion des erreurs
         @app.errorhandler(404)
@@ -0,0 +1,82 @@
+import hashlib
+from functools import wraps
+
+from flask import current_app, has_app_context, make_response, request
+from sqlalchemy import select, update
+
+from extensions import db
+from models import DataVersion
+
+# Types d'entité suivis ; ce sont aussi les étiquettes globales de response_cache
+ENTITIES = ('ticket', 'client', 'credit_note')
+
+
+def init_data_versions(app):
+    """Crée la table des versions et ses lignes si besoin."""
+    with app.app_context():
+        try:
+            with db.engine.begin() as connection:
+                table = DataVersion.__table__
+                table.create(connection, checkfirst=True)
+                existing = set(connection.execute(select(table.c.entity)).scalars())
+                missing = [{'entity': entity, 'version': 0} for entity in ENTITIES if entity not in existing]
+                if missing:
+                    connection.execute(table.insert(), missing)
+        except Exception as e:
+            app.logger.error(f"Versions de données indisponibles, ETag désactivés : {str(e)}")
+            return
+    app.extensions['data_versions'] = True
+
+
+def bump_data_versions(connection, entities):
+    """Incrémente les versions dans la transaction en cours : visibles au commit, annulées au rollback."""
+    if not has_app_context() or 'data_versions' not in current_app.extensions:
+        return
+    entities = sorted(set(entities) & set(ENTITIES))
+    if entities:
+        table = DataVersion.__table__
+        connection.execute(
+            update(table).where(table.c.entity.in_(entities)).values(version=table.c.version + 1)
+        )
+
+
+def get_data_versions(entities):
+    table = DataVersion.__table__
+    rows = dict(db.session.execute(
+        select(table.c.entity, table.c.version).where(table.c.entity.in_(entities))
+    ).all())
+    return [rows.get(entity, 0) for entity in entities]
+
+
+def conditional_on(*entities, key=None):
+    """Décorateur de vue JSON : ETag calculé à partir des versions de données.
+
+    Si le navigateur renvoie un ETag encore valide (If-None-Match), la vue
+    n'est pas exécutée et la réponse est un 304 vide. `key` ajoute à l'ETag
+    ce dont la réponse dépend en dehors des données (la date du jour...).
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if 'data_versions' not in current_app.extensions:
+                return f(*args, **kwargs)
+            parts = (
+                request.endpoint,
+                sorted(kwargs.items()),
+                request.query_string,
+                get_data_versions(entities),
+                key() if key else None
+            )
+            etag = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # Le navigateur garde la réponse mais revalide à chaque appel
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
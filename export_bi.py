@@ -0,0 +1,27 @@
+import argparse
+
+from app import create_app, db
+from bi_export import BIExporter
+
+def export_bi(full=False, export_format=None):
+    """Met à jour l'export colonnaire (Parquet/Arrow) des tickets pour la BI."""
+    app = create_app()
+    with app.app_context():
+        exporter = BIExporter.from_config(app.config)
+        if export_format:
+            exporter = BIExporter(exporter.folder, export_format, exporter.batch_size)
+        with db.engine.connect() as conn:
+            written = exporter.run(conn, full=full)
+        if not written:
+            print("Aucune partition modifiée depuis le dernier export")
+        for month, datasets in sorted(written.items()):
+            details = ', '.join(f"{name}: {count}" for name, count in datasets.items())
+            print(f"{month} réécrit ({details})")
+        print(f"Export BI disponible dans {exporter.folder}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export colonnaire des tickets, produits, réceptions et avoirs")
+    parser.add_argument('--full', action='store_true', help="réécrit toutes les partitions")
+    parser.add_argument('--format', choices=['parquet', 'arrow'], help="format des fichiers (par défaut BI_EXPORT_FORMAT)")
+    args = parser.parse_args()
+    export_bi(full=args.full, export_format=args.format)
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+
+from werkzeug.datastructures import MultiDict
+
+from extensions import db
+from models import Ticket, Client, ExportJob
+from loaders import with_ticket_profile
+from ticket_filters import apply_ticket_filters
+from exports import EXPORT_WRITERS
+
+
+class ExportJobManager:
+    """Exécute les exports de tickets dans un pool de threads et gère leurs fichiers."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        self._progress = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.folder = app.config['EXPORT_FOLDER']
+        os.makedirs(self.folder, exist_ok=True)
+        self.executor = ThreadPoolExecutor(
+            max_workers=app.config['EXPORT_WORKERS'],
+            thread_name_prefix='export'
+        )
+        app.extensions['export_jobs'] = self
+
+    @staticmethod
+    def params_hash(export_format, params, user_id):
+        payload = json.dumps([export_format, user_id, sorted(params)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path_for(self, job):
+        return os.path.join(self.folder, job.filename) if job.filename else None
+
+    def progress(self, job_id):
+        """Nombre de lignes écrites par une tâche en cours dans ce processus."""
+        return self._progress.get(job_id)
+
+    def submit(self, export_format, form, user_id):
+        """Met un export en file, ou renvoie une tâche identique récente."""
+        if export_format not in EXPORT_WRITERS:
+            raise ValueError(f"Format d'export inconnu : {export_format}")
+        self.cleanup()
+
+        params = [(key, value) for key in form.keys() for value in form.getlist(key)]
+        params_hash = self.params_hash(export_format, params, user_id)
+        window_start = datetime.now(timezone.utc) - timedelta(seconds=self.app.config['EXPORT_DEDUP_WINDOW'])
+        existing = ExportJob.query.filter(
+            ExportJob.params_hash == params_hash,
+            ExportJob.status != 'erreur',
+            ExportJob.created_at >= window_start
+        ).order_by(ExportJob.created_at.desc()).first()
+        if existing:
+            return existing
+
+        job = ExportJob(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            format=export_format,
+            params=json.dumps(params, ensure_ascii=False),
+            params_hash=params_hash,
+            status='en_attente'
+        )
+        db.session.add(job)
+        db.session.commit()
+        self.executor.submit(self._run, job.id)
+        return job
+
+    def _set_progress(self, job_id, count):
+        with self._lock:
+            self._progress[job_id] = count
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            job = db.session.get(ExportJob, job_id)
+            if job is None:
+                return
+            path = None
+            try:
+                query = with_ticket_profile(Ticket.query.join(Client), 'export', client_joined=True)
+                query = apply_ticket_filters(query, MultiDict(json.loads(job.params or '[]')))
+                job.status = 'en_cours'
+                job.total = query.order_by(None).count()
+                db.session.commit()
+
+                job.filename = f'{job.id}.{job.format}'
+                path = self.path_for(job)
+                temp_path = path + '.part'
+                tickets = query.order_by(Ticket.created_at.desc(), Ticket.id.desc()).yield_per(1000)
+                EXPORT_WRITERS[job.format](tickets, temp_path, progress=lambda count: self._set_progress(job_id, count))
+                os.replace(temp_path, path)
+
+                job.status = 'termine'
+                job.finished_at = datetime.now(timezone.utc)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error(f"Erreur lors de l'export {job_id}: {str(e)}")
+                job = db.session.get(ExportJob, job_id)
+                job.status = 'erreur'
+                job.error = str(e)
+                job.finished_at = datetime.now(timezone.utc)
+                db.session.commit()
+                if path and os.path.exists(path + '.part'):
+                    os.remove(path + '.part')
+            finally:
+                with self._lock:
+                    self._progress.pop(job_id, None)
+
+    def cleanup(self):
+        """Supprime les tâches et fichiers plus anciens que EXPORT_RETENTION heures.
+
+        Les tâches encore en attente ou en cours après EXPORT_JOB_TIMEOUT secondes
+        (processus arrêté pendant l'export) passent en erreur : la déduplication
+        ne les renvoie plus et la page cesse d'attendre leur fin.
+        """
+        now = datetime.now(timezone.utc)
+        stale = ExportJob.query.filter(
+            ExportJob.status.in_(('en_attente', 'en_cours')),
+            ExportJob.created_at < now - timedelta(seconds=self.app.config['EXPORT_JOB_TIMEOUT'])
+        ).all()
+        for job in stale:
+            job.status = 'erreur'
+            job.error = 'Export interrompu (délai dépassé)'
+            job.finished_at = now
+        if stale:
+            db.session.commit()
+
+        limit = now - timedelta(hours=self.app.config['EXPORT_RETENTION'])
+        expired = ExportJob.query.filter(ExportJob.created_at < limit).all()
+        for job in expired:
+            path = self.path_for(job)
+            try:
+                if path and os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                self.app.logger.error(f"Erreur lors de la suppression de l'export {path}: {str(e)}")
+            db.session.delete(job)
+        if expired:
+            db.session.commit()
+
+    def shutdown(self, wait=True):
+        if self.executor:
+            self.executor.shutdown(wait=wait)
+
+
+export_jobs = ExportJobManager()
@@ -0,0 +1,211 @@
+import csv
+from datetime import datetime
+from io import StringIO
+
+from pdf_writer import StreamingPDF
+
+# Taille approximative des blocs envoyés au client pendant le streaming
+CSV_CHUNK_SIZE = 64 * 1024
+
+CSV_HEADERS = [
+    'N° Ticket',
+    'Client',
+    'N° Compte',
+    'Type retour',
+    'Statut',
+    'Date création',
+    'Montant total',
+    'Attribution faute',
+    'Motif retour'
+]
+
+
+def ticket_csv_row(ticket):
+    return [
+        ticket.ticket_number,
+        ticket.client.name,
+        ticket.client.account_number,
+        ticket.return_type,
+        ticket.status,
+        ticket.created_at.strftime('%d/%m/%Y %H:%M'),
+        f"{ticket.total_refund:.2f} €",
+        ticket.fault_attribution,
+        ticket.return_reason
+    ]
+
+
+def generate_tickets_csv(tickets):
+    """Génère le CSV ligne par ligne : la mémoire reste constante quel que soit le volume.
+
+    `tickets` doit être un itérable paresseux (requête avec yield_per).
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return data
+
+    writer.writerow(CSV_HEADERS)
+    for ticket in tickets:
+        writer.writerow(ticket_csv_row(ticket))
+        if buffer.tell() >= CSV_CHUNK_SIZE:
+            yield flush()
+    yield flush()
+
+
+PDF_HEADERS = [
+    'N° Ticket',
+    'Client',
+    'Type',
+    'Statut',
+    'Date',
+    'Montant'
+]
+
+# Largeurs des colonnes (mm), alignements, et mise en page A4 du rapport
+PDF_COL_WIDTHS = [30, 40, 30, 30, 30, 30]
+PDF_COL_ALIGNS = ['L', 'L', 'L', 'L', 'C', 'R']
+PDF_MARGIN = 10
+PDF_ROW_HEIGHT = 7
+PDF_HEADER_HEIGHT = 8
+PDF_TABLE_TOP = 26
+
+
+def track_progress(tickets, progress, every=500):
+    """Itère sur les tickets en signalant le nombre de lignes traitées à `progress`."""
+    count = 0
+    for ticket in tickets:
+        yield ticket
+        count += 1
+        if progress and count % every == 0:
+            progress(count)
+    if progress:
+        progress(count)
+
+
+def pdf_amount(value):
+    return f"{value or 0:.2f} €"
+
+
+class TicketsPDFReport:
+    """Rapport PDF des tickets : en-tête répété, total par page et total général.
+
+    Les pages sont écrites au fil de l'eau par StreamingPDF : la mémoire
+    utilisée ne dépend pas du nombre de tickets, à condition que `tickets`
+    soit un itérable paresseux (requête avec yield_per) dont le client est
+    préchargé (profil 'export').
+    """
+
+    def __init__(self, f, title='Export des tickets'):
+        self.pdf = StreamingPDF(f)
+        self.title = title
+        self.generated_at = datetime.now().strftime('%d/%m/%Y %H:%M')
+        self.table_width = sum(PDF_COL_WIDTHS)
+        # Deux lignes réservées en bas de page : total de la page et total général
+        usable = self.pdf.height - PDF_MARGIN - PDF_TABLE_TOP - PDF_HEADER_HEIGHT - 2 * PDF_ROW_HEIGHT
+        self.rows_per_page = int(usable // PDF_ROW_HEIGHT)
+        self.rows_on_page = 0
+        self.y = None
+        self.page_total = 0.0
+        self.grand_total = 0.0
+        self.count = 0
+
+    def _row(self, values, style='', fill=None, height=PDF_ROW_HEIGHT, aligns=PDF_COL_ALIGNS):
+        x = PDF_MARGIN
+        for value, width, align in zip(values, PDF_COL_WIDTHS, aligns):
+            self.pdf.rect(x, self.y, width, height, fill=fill)
+            self.pdf.text(x, self.y, value, style=style, size=9, width=width, height=height, align=align)
+            x += width
+        self.y += height
+
+    def _summary(self, label, amount):
+        label_width = self.table_width - PDF_COL_WIDTHS[-1]
+        self.pdf.rect(PDF_MARGIN, self.y, label_width, PDF_ROW_HEIGHT, fill=0.95)
+        self.pdf.text(PDF_MARGIN, self.y, label, style='B', width=label_width, height=PDF_ROW_HEIGHT, align='R')
+        self.pdf.rect(PDF_MARGIN + label_width, self.y, PDF_COL_WIDTHS[-1], PDF_ROW_HEIGHT, fill=0.95)
+        self.pdf.text(
+            PDF_MARGIN + label_width, self.y, pdf_amount(amount),
+            style='B', width=PDF_COL_WIDTHS[-1], height=PDF_ROW_HEIGHT, align='R'
+        )
+        self.y += PDF_ROW_HEIGHT
+
+    def _start_page(self):
+        self.pdf.add_page()
+        self.pdf.text(PDF_MARGIN, PDF_MARGIN, self.title, style='B', size=14, width=self.table_width, height=8)
+        self.pdf.text(
+            PDF_MARGIN, PDF_MARGIN, f'Page {self.pdf.page_count}',
+            size=8, width=self.table_width, height=8, align='R'
+        )
+        self.pdf.text(
+            PDF_MARGIN, PDF_MARGIN + 8, f'Généré le {self.generated_at}',
+            size=8, width=self.table_width, height=5
+        )
+        self.y = PDF_TABLE_TOP
+        self._row(PDF_HEADERS, style='B', fill=0.85, height=PDF_HEADER_HEIGHT, aligns=['C'] * len(PDF_HEADERS))
+        self.rows_on_page = 0
+        self.page_total = 0.0
+
+    def _end_page(self):
+        self._summary(f'Total page {self.pdf.page_count}', self.page_total)
+
+    def add_ticket(self, ticket):
+        if self.y is None:
+            self._start_page()
+        elif self.rows_on_page >= self.rows_per_page:
+            self._end_page()
+            self._start_page()
+        amount = ticket.total_refund or 0.0
+        self._row([
+            ticket.ticket_number,
+            ticket.client.name,
+            ticket.return_type,
+            ticket.status,
+            ticket.created_at.strftime('%d/%m/%Y'),
+            pdf_amount(amount)
+        ])
+        self.rows_on_page += 1
+        self.page_total += amount
+        self.grand_total += amount
+        self.count += 1
+
+    def close(self):
+        if self.y is None:
+            self._start_page()
+        self._end_page()
+        self._summary(f'Total général ({self.count} tickets)', self.grand_total)
+        self.pdf.close()
+
+
+def render_tickets_pdf(tickets, f):
+    """Écrit le rapport PDF des tickets dans le fichier binaire `f`."""
+    report = TicketsPDFReport(f)
+    for ticket in tickets:
+        report.add_ticket(ticket)
+    report.close()
+    return report
+
+
+def write_tickets_csv(tickets, path, progress=None):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for chunk in generate_tickets_csv(track_progress(tickets, progress)):
+            f.write(chunk)
+
+
+def write_tickets_pdf(tickets, path, progress=None):
+    with open(path, 'wb') as f:
+        render_tickets_pdf(track_progress(tickets, progress), f)
+
+
+# Écrivains de fichiers utilisés par les tâches d'export en arrière-plan
+EXPORT_WRITERS = {
+    'csv': write_tickets_csv,
+    'pdf': write_tickets_pdf,
+}
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'pdf': 'application/pdf',
+}
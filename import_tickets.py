@@ -0,0 +1,37 @@
+import argparse
+import os
+
+from app import create_app
+from notifications import notify_ticket_import
+from ticket_import import read_import_file, import_tickets
+
+def import_file(path, dry_run=False, notify=True):
+    """Importe les tickets d'un fichier CSV/XLSX (tout ou rien)."""
+    app = create_app()
+    with app.app_context():
+        with open(path, 'rb') as f:
+            rows = read_import_file(f, path)
+        result = import_tickets(rows, dry_run=dry_run, max_rows=None)
+        if not result.ok:
+            for error in result.errors:
+                print(f"Ligne {error['line']} : {error['message']}")
+            print(f"{len(result.errors)} erreur(s), aucun ticket créé")
+            return False
+        if dry_run:
+            print(f"{result.row_count} ligne(s) valides : {result.planned_count} ticket(s) seraient créés")
+            return True
+        print(f"{len(result.ticket_numbers)} ticket(s) et {result.product_count} produit(s) créés "
+              f"({result.ticket_numbers[0]} à {result.ticket_numbers[-1]})")
+        app.logger.info(f"Import de {len(result.ticket_numbers)} ticket(s) depuis {path}")
+        if notify:
+            notify_ticket_import(result, os.path.basename(path))
+        return True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import groupé de tickets depuis un fichier CSV ou XLSX")
+    parser.add_argument('path', help="fichier .csv ou .xlsx, une ligne par produit")
+    parser.add_argument('--dry-run', action='store_true', help="contrôle le fichier sans rien créer")
+    parser.add_argument('--no-notify', action='store_true', help="n'envoie pas l'email récapitulatif")
+    args = parser.parse_args()
+    if not import_file(args.path, dry_run=args.dry_run, notify=not args.no_notify):
+        raise SystemExit(1)
@@ -0,0 +1,44 @@
+from sqlalchemy.orm import selectinload, joinedload, contains_eager
+
+from models import Ticket, Product
+
+
+def _client_loader(client_joined):
+    # Si la requête joint déjà Client (filtres de recherche), on réutilise la jointure
+    return contains_eager(Ticket.client) if client_joined else joinedload(Ticket.client)
+
+
+# Profils de chargement des tickets : chaque profil précharge exactement les
+# relations lues par les vues correspondantes, en un nombre constant de requêtes.
+TICKET_LOADER_PROFILES = {
+    'list': lambda client_joined: [
+        _client_loader(client_joined),
+    ],
+    'detail': lambda client_joined: [
+        _client_loader(client_joined),
+        selectinload(Ticket.products).selectinload(Product.receptions),
+        selectinload(Ticket.messages),
+        selectinload(Ticket.attachments),
+        selectinload(Ticket.reception_logs),
+    ],
+    'logistics': lambda client_joined: [
+        _client_loader(client_joined),
+        selectinload(Ticket.products).selectinload(Product.receptions),
+    ],
+    'export': lambda client_joined: [
+        _client_loader(client_joined),
+    ],
+}
+
+
+def ticket_loader_options(profile, client_joined=False):
+    """Retourne les options de chargement du profil demandé."""
+    try:
+        return TICKET_LOADER_PROFILES[profile](client_joined)
+    except KeyError:
+        raise ValueError(f'Profil de chargement inconnu : {profile}')
+
+
+def with_ticket_profile(query, profile, client_joined=False):
+    """Applique un profil de chargement à une requête sur Ticket."""
+    return query.options(*ticket_loader_options(profile, client_joined))
@@ -0,0 +1,186 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Attributs standard d'un LogRecord : tout le reste vient de `extra` et part dans le JSON
+RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class RequestUserFilter(logging.Filter):
+    """Ajoute `user` aux enregistrements : l'utilisateur de la requête en cours, ou '-'."""
+
+    def filter(self, record):
+        # Import local : le client de bureau (alder_sav) utilise ce module sans Flask
+        from flask import g, has_request_context
+
+        user = None
+        if has_request_context():
+            # Utilisateur déjà chargé par Flask-Login : pas de requête SQL depuis un log
+            user = getattr(g, '_login_user', None)
+        record.user = getattr(user, 'username', None) or '-'
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement, relue par log_reader."""
+
+    def format(self, record):
+        data = {
+            'timestamp': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'user': getattr(record, 'user', None) or '-',
+            'message': record.getMessage(),
+            'location': f'{record.pathname}:{record.lineno}',
+            'thread': record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc_info'] = record.exc_text
+        if record.stack_info:
+            data['stack_info'] = record.stack_info
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRS and key not in data and key != 'user':
+                data[key] = value
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class StructuredQueueHandler(QueueHandler):
+    """QueueHandler qui garde la trace d'exception à part au lieu de l'ajouter au message."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class LogPipeline:
+    """File de logs unique du processus.
+
+    Les appelants (threads des requêtes compris) ne font que déposer
+    l'enregistrement dans une file ; un QueueListener se charge des écritures
+    disque et console. Les filtres ajoutés par `add_filter` s'exécutent dans
+    le thread appelant, avant la mise en file (contexte de requête disponible).
+    """
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.queue_handler = StructuredQueueHandler(self.queue)
+        self.listener = None
+        self._handlers = []
+        self._lock = threading.Lock()
+
+    def _restart(self):
+        if self.listener is not None:
+            self.listener.stop()
+        self.listener = QueueListener(self.queue, *self._handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def install(self, level=logging.INFO):
+        """Branche la file sur le logger racine (une seule fois par processus)."""
+        root = logging.getLogger()
+        with self._lock:
+            if self.queue_handler not in root.handlers:
+                # Les handlers synchrones déjà posés (basicConfig...) passent derrière la file
+                for handler in list(root.handlers):
+                    root.removeHandler(handler)
+                    self._handlers.append(handler)
+                root.addHandler(self.queue_handler)
+                atexit.register(self.stop)
+                self._restart()
+        root.setLevel(level)
+
+    def add_handler(self, handler):
+        """Ajoute une destination ; ignore un second fichier identique."""
+        with self._lock:
+            target = getattr(handler, 'baseFilename', None)
+            if target and any(getattr(h, 'baseFilename', None) == target for h in self._handlers):
+                handler.close()
+                return
+            self._handlers.append(handler)
+            if self.listener is not None:
+                self._restart()
+
+    def add_filter(self, log_filter):
+        if not any(type(f) is type(log_filter) for f in self.queue_handler.filters):
+            self.queue_handler.addFilter(log_filter)
+
+    def add_file(self, path, max_bytes=10000000, backup_count=10, level=logging.NOTSET, structured=True):
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        handler.setFormatter(JSONFormatter() if structured else logging.Formatter(TEXT_FORMAT))
+        handler.setLevel(level)
+        self.add_handler(handler)
+        return handler
+
+    def add_console(self, level=logging.NOTSET, fmt=TEXT_FORMAT):
+        if any(type(h) is logging.StreamHandler for h in self._handlers):
+            return
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(fmt))
+        handler.setLevel(level)
+        self.add_handler(handler)
+
+    def set_level(self, name, level):
+        """Change à chaud le niveau d'un logger ('' ou 'root' pour la racine)."""
+        if isinstance(level, str):
+            level = level.upper()
+            if not isinstance(logging.getLevelName(level), int):
+                raise ValueError(f'Niveau de log invalide : {level}')
+        logger = logging.getLogger(None if name in ('', 'root') else name)
+        logger.setLevel(level)
+        return logging.getLevelName(logger.level)
+
+    def levels(self):
+        """Niveaux explicitement réglés, par logger."""
+        levels = {'root': logging.getLevelName(logging.getLogger().level)}
+        for name, logger in sorted(logging.root.manager.loggerDict.items()):
+            if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET:
+                levels[name] = logging.getLevelName(logger.level)
+        return levels
+
+    def stop(self):
+        """Vide la file dans les destinations puis arrête le thread (appelé à l'arrêt)."""
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+            for handler in self._handlers:
+                handler.flush()
+
+
+log_pipeline = LogPipeline()
+
+
+def parse_levels(value):
+    """Lit 'module=NIVEAU,autre=NIVEAU' (variable LOG_LEVELS)."""
+    levels = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(log_file=None, level=logging.INFO, console=False, levels=None):
+    """Point d'entrée des scripts : file unique, fichier JSON, console éventuelle."""
+    log_pipeline.install(level)
+    if log_file:
+        log_pipeline.add_file(log_file)
+    if console:
+        log_pipeline.add_console()
+    for name, module_level in (levels or {}).items():
+        log_pipeline.set_level(name, module_level)
+    return log_pipeline
@@ -0,0 +1,268 @@
+import glob
+import json
+import logging
+import os
+import re
+from bisect import bisect_right
+from datetime import datetime
+
+# Lignes texte des fichiers écrits avant le passage au JSON (log_pipeline)
+LOG_LINE = re.compile(
+    r'^(?P<timestamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) (?P<level>[A-Z]+)'
+    r'(?: \[(?P<user>[^\]]*)\])?: (?P<message>.*?)(?: \[in (?P<location>[^\]]*)\])?$'
+)
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S,%f'
+
+BLOCK_SIZE = 64 * 1024
+
+
+def encode_log_cursor(inode, offset):
+    return f'{inode}-{offset}'
+
+
+def decode_log_cursor(cursor):
+    try:
+        inode, offset = cursor.split('-', 1)
+        return int(inode), int(offset)
+    except Exception:
+        raise ValueError('Curseur de logs invalide')
+
+
+def _decode(raw):
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('cp1252', 'replace')
+
+
+def _level_number(name):
+    number = logging.getLevelName(name)
+    return number if isinstance(number, int) else logging.NOTSET
+
+
+def _parse_json(line):
+    try:
+        data = json.loads(line)
+        timestamp = datetime.fromisoformat(data['timestamp'])
+    except (ValueError, KeyError, TypeError):
+        return None
+    message = data.get('message', '')
+    if data.get('exc_info'):
+        message = f"{message}\n{data['exc_info']}"
+    return timestamp, data.get('level', ''), data.get('user') or '-', message, data.get('location')
+
+
+def parse_header(line):
+    """Retourne (timestamp, niveau, utilisateur, message, emplacement) si la ligne ouvre un enregistrement."""
+    if line.startswith('{'):
+        return _parse_json(line)
+    match = LOG_LINE.match(line)
+    if not match:
+        return None
+    try:
+        timestamp = datetime.strptime(match.group('timestamp'), TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+    return (
+        timestamp,
+        match.group('level'),
+        match.group('user') or '-',
+        match.group('message'),
+        match.group('location')
+    )
+
+
+def reverse_lines(f, end):
+    """Lignes (offset, octets) du fichier binaire `f`, lues à reculons depuis `end`."""
+    position = end
+    remainder = b''
+    while position > 0:
+        size = min(BLOCK_SIZE, position)
+        position -= size
+        f.seek(position)
+        lines = (f.read(size) + remainder).split(b'\n')
+        # La première ligne du bloc peut commencer dans le bloc précédent
+        remainder = lines.pop(0)
+        offset = position + len(remainder) + 1
+        offsets = []
+        for line in lines:
+            offsets.append(offset)
+            offset += len(line) + 1
+        for offset, line in zip(reversed(offsets), reversed(lines)):
+            if line.strip():
+                yield offset, line
+    if remainder.strip():
+        yield 0, remainder
+
+
+class LogReader:
+    """Lecture paginée de app.log et de ses fichiers tournés, du plus récent au plus ancien.
+
+    La lecture part de la fin du fichier (ou d'un curseur inode-offset, stable
+    malgré la rotation) et remonte par blocs : une page ne lit que quelques
+    dizaines de Ko. Un index annexe par fichier (un couple offset/date tous les
+    LOG_INDEX_STEP octets) permet de sauter directement à la borne de fin
+    d'un filtre par date.
+    """
+
+    def __init__(self, folder, filename='app.log', index_step=64 * 1024):
+        self.folder = folder
+        self.filename = filename
+        self.index_step = index_step
+        self.index_folder = os.path.join(folder, '.index')
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['LOG_FOLDER'], index_step=config['LOG_INDEX_STEP'])
+
+    def files(self):
+        """Fichiers de log du plus récent (app.log) au plus ancien (app.log.N)."""
+        base = os.path.join(self.folder, self.filename)
+        rotated = []
+        for path in glob.glob(base + '.*'):
+            suffix = path[len(base) + 1:]
+            if suffix.isdigit():
+                rotated.append((int(suffix), path))
+        paths = [base] if os.path.exists(base) else []
+        return paths + [path for _, path in sorted(rotated)]
+
+    # Index annexe
+
+    def _index_path(self, inode):
+        return os.path.join(self.index_folder, f'{inode}.json')
+
+    def load_index(self, path):
+        """Retourne l'index du fichier, complété jusqu'à sa taille actuelle."""
+        stat = os.stat(path)
+        index_path = self._index_path(stat.st_ino)
+        index = None
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, encoding='utf-8') as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = None
+        else:
+            # Nouveau fichier, donc rotation : les index des fichiers supprimés sont inutiles
+            self.cleanup_indexes()
+        # Fichier tronqué ou inode réutilisé : on reconstruit
+        if index is None or index['size'] > stat.st_size:
+            index = {'size': 0, 'entries': []}
+        if index['size'] < stat.st_size:
+            self._extend_index(path, index, stat.st_size)
+            os.makedirs(self.index_folder, exist_ok=True)
+            temp_path = index_path + '.part'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f)
+            os.replace(temp_path, index_path)
+        return index
+
+    def _extend_index(self, path, index, size):
+        entries = index['entries']
+        next_mark = entries[-1][0] + self.index_step if entries else 0
+        with open(path, 'rb') as f:
+            f.seek(index['size'])
+            offset = index['size']
+            while offset < size:
+                line = f.readline()
+                if not line:
+                    break
+                if not line.endswith(b'\n'):
+                    # Ligne en cours d'écriture : on la relira la prochaine fois
+                    break
+                if offset >= next_mark:
+                    header = parse_header(_decode(line.rstrip(b'\r\n')))
+                    if header:
+                        entries.append([offset, header[0].isoformat()])
+                        next_mark = offset + self.index_step
+                offset += len(line)
+        index['size'] = offset
+
+    def cleanup_indexes(self):
+        """Supprime les index des fichiers qui n'existent plus."""
+        if not os.path.isdir(self.index_folder):
+            return
+        inodes = {str(os.stat(path).st_ino) for path in self.files()}
+        for name in os.listdir(self.index_folder):
+            if name.split('.')[0] not in inodes:
+                os.remove(os.path.join(self.index_folder, name))
+
+    def _start_offset(self, path, size, until):
+        """Offset à partir duquel remonter pour ne lire que des lignes antérieures à `until`."""
+        if until is None:
+            return size
+        entries = self.load_index(path)['entries']
+        keys = [datetime.fromisoformat(timestamp) for _, timestamp in entries]
+        position = bisect_right(keys, until)
+        if position < len(entries):
+            return entries[position][0]
+        return size
+
+    # Lecture
+
+    def _records(self, path, end):
+        """Enregistrements du fichier à reculons ; les lignes de suite (traces) sont rattachées."""
+        continuation = []
+        with open(path, 'rb') as f:
+            for offset, raw in reverse_lines(f, end):
+                line = _decode(raw.rstrip(b'\r'))
+                header = parse_header(line)
+                if header is None:
+                    continuation.append(line)
+                    continue
+                timestamp, level, user, message, location = header
+                if continuation:
+                    message = '\n'.join([message] + list(reversed(continuation)))
+                    continuation = []
+                yield {
+                    'offset': offset,
+                    'timestamp': timestamp,
+                    'level': level,
+                    'user': user,
+                    'message': message,
+                    'location': location,
+                }
+
+    def read(self, cursor=None, limit=100, level=None, since=None, until=None, user=None):
+        """Retourne (enregistrements, curseur de la page suivante plus ancienne).
+
+        `level` est un niveau minimal (WARNING affiche aussi ERROR et CRITICAL) ;
+        un niveau inconnu lève ValueError.
+        """
+        min_level = logging.getLevelName(level.upper()) if level else None
+        if level and not isinstance(min_level, int):
+            raise ValueError('Niveau de log invalide')
+        cursor_inode, cursor_offset = decode_log_cursor(cursor) if cursor else (None, None)
+
+        records = []
+        files = self.files()
+        if cursor_inode is not None:
+            # Le fichier du curseur a pu tourner : on le retrouve par son inode
+            inodes = [os.stat(path).st_ino for path in files]
+            if cursor_inode not in inodes:
+                return records, None
+            files = files[inodes.index(cursor_inode):]
+
+        for position, path in enumerate(files):
+            stat = os.stat(path)
+            if cursor_inode is not None and position == 0:
+                end = min(cursor_offset, stat.st_size)
+            else:
+                end = self._start_offset(path, stat.st_size, until)
+            for record in self._records(path, end):
+                if len(records) >= limit:
+                    last = records[-1]
+                    return records, encode_log_cursor(last['inode'], last['offset'])
+                if until is not None and record['timestamp'] > until:
+                    continue
+                if since is not None and record['timestamp'] < since:
+                    # Les fichiers sont chronologiques : tout le reste est plus ancien
+                    return records, None
+                if min_level is not None and _level_number(record['level']) < min_level:
+                    continue
+                if user and record['user'] != user:
+                    continue
+                record['file'] = os.path.basename(path)
+                record['inode'] = stat.st_ino
+                records.append(record)
+        return records, None
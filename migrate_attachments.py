@@ -0,0 +1,38 @@
+import argparse
+import os
+
+from app import create_app
+from attachment_store import attachment_store
+
+def migrate_attachments(batch_size, collect):
+    """Range les anciennes pièces jointes dans le stockage par empreinte, puis nettoie si demandé.
+
+    À lancer une fois après migrate_db.py (colonne content_hash), un seul
+    exemplaire à la fois : l'application ne migre rien d'elle-même.
+    """
+    app = create_app()
+    lock_path = os.path.join(attachment_store.root, 'migration.lock')
+    try:
+        lock = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        print(f"Migration déjà en cours (supprimer {lock_path} si ce n'est pas le cas)")
+        return False
+    try:
+        with app.app_context():
+            migrated, missing = attachment_store.migrate_legacy(batch_size=batch_size)
+            print(f"{migrated} pièce(s) jointe(s) migrée(s), {missing} fichier(s) introuvable(s)")
+            if collect:
+                removed = attachment_store.collect_garbage()
+                print(f"{removed} fichier(s) orphelin(s) supprimé(s)")
+    finally:
+        os.close(lock)
+        os.remove(lock_path)
+    return True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Migration des pièces jointes vers le stockage par empreinte")
+    parser.add_argument('--batch-size', type=int, default=100, help="pièces jointes par transaction")
+    parser.add_argument('--gc', action='store_true', help="supprime aussi les fichiers qui ne sont plus référencés")
+    args = parser.parse_args()
+    if not migrate_attachments(args.batch_size, args.gc):
+        raise SystemExit(1)
@@ -1,6 +1,6 @@
 from flask import Flask
 from extensions import db
-from models import Product, ReceptionLog
+from models import Product, ReceptionLog, TicketDailyStat, ExportJob, DataVersion, NumberSequence, sync_ticket_sequence, UserAction, UserActionArchive, refresh_refund_totals, refresh_daily_stats
 from config import Config
 from sqlalchemy import text, inspect
 
@@ -32,7 +32,57 @@ def migrate():
             else:
                 print("Colonne 'quantity_received' existe déjà dans la table 'reception_log'")
             
+            # Ajouter la colonne refund_total à la table ticket et la remplir
+            if not column_exists('ticket', 'refund_total'):
+                conn.execute(text('ALTER TABLE ticket ADD COLUMN refund_total FLOAT NOT NULL DEFAULT 0'))
+                print("Colonne 'refund_total' ajoutée à la table 'ticket'")
+            else:
+                print("Colonne 'refund_total' existe déjà dans la table 'ticket'")
+            refresh_refund_totals(conn)
+            print("Totaux remboursés recalculés pour tous les tickets")
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_ticket_client_refund ON ticket (client_id, refund_total)'))
+            
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_ticket_client_created_at ON ticket (client_id, created_at)'))
+            
+            # Empreinte des pièces jointes (stockage par contenu) ; les fichiers sont migrés par l'application
+            if not column_exists('attachment', 'content_hash'):
+                conn.execute(text('ALTER TABLE attachment ADD COLUMN content_hash VARCHAR(64)'))
+                print("Colonne 'content_hash' ajoutée à la table 'attachment'")
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_attachment_content_hash ON attachment (content_hash)'))
+            
+            # Créer et remplir la table de cumuls journaliers
+            TicketDailyStat.__table__.create(conn, checkfirst=True)
+            refresh_daily_stats(conn)
+            print("Table 'ticket_daily_stats' recalculée")
+            
+            # Créer la table des tâches d'export
+            ExportJob.__table__.create(conn, checkfirst=True)
+            
+            # Créer la table des versions de données (ETag des API JSON)
+            DataVersion.__table__.create(conn, checkfirst=True)
+            
+            # Compteur des numéros de ticket, aligné sur les tickets existants
+            NumberSequence.__table__.create(conn, checkfirst=True)
+            sync_ticket_sequence(conn)
+            print("Compteur des numéros de ticket synchronisé")
+            
+            # Index composite utilisé par la pagination par curseur des tickets
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_ticket_created_at_id ON ticket (created_at, id)'))
+            print("Index 'ix_ticket_created_at_id' vérifié sur la table 'ticket'")
+            
+            conn.commit()
+        
+        # Table du journal d'audit, dans sa base dédiée si AUDIT_DATABASE_URL est définie
+        audit_engine = db.engines[UserAction.metadata.info.get('bind_key')]
+        UserAction.__table__.create(audit_engine, checkfirst=True)
+        UserActionArchive.__table__.create(audit_engine, checkfirst=True)
+        with audit_engine.connect() as conn:
+            # Index composites de la pagination par curseur du journal d'audit
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_user_action_timestamp_id ON user_action (timestamp, id)'))
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_user_action_user_timestamp_id ON user_action (user_id, timestamp, id)'))
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_user_action_type_timestamp_id ON user_action (action_type, timestamp, id)'))
             conn.commit()
+        print("Index du journal d'audit vérifiés")
         print("Migration terminée avec succès!")
 
 if __name__ == '__main__':
@@ -1,10 +1,15 @@
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta, time
 from extensions import db
-import os
-from sqlalchemy import event
-from sqlalchemy.orm import validates
+from batching import chunked
+from config import Config
+import threading
+from itertools import chain
+from sqlalchemy import event, inspect, select, update, insert, delete, case, cast, func, and_, or_
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import validates, Session
+from sqlalchemy.orm.attributes import set_committed_value
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -89,6 +94,12 @@ class Client(db.Model):
         return email.lower() if email else None
 
 class Ticket(db.Model):
+    __table_args__ = (
+        db.Index('ix_ticket_created_at_id', 'created_at', 'id'),
+        db.Index('ix_ticket_client_refund', 'client_id', 'refund_total'),
+        db.Index('ix_ticket_client_created_at', 'client_id', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     ticket_number = db.Column(db.String(20), unique=True, nullable=False)
     client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False)
@@ -107,33 +118,34 @@ class Ticket(db.Model):
     credit_note_date = db.Column(db.DateTime)
     credit_note_validated = db.Column(db.Boolean, default=False)
     credit_note_validated_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    # Total remboursé dénormalisé, maintenu par refresh_refund_totals() après chaque flush
+    refund_total = db.Column(db.Float, default=0.0, nullable=False)
     
     products = db.relationship('Product', backref='ticket', lazy=True, cascade='all, delete-orphan')
     reception_logs = db.relationship('ReceptionLog', backref='ticket', lazy=True)
     messages = db.relationship('Message', backref='ticket', lazy=True)
     attachments = db.relationship('Attachment', backref='ticket', lazy=True, cascade='all, delete-orphan')
     
-    def generate_ticket_number(self):
-        last_ticket = Ticket.query.order_by(Ticket.id.desc()).first()
-        if last_ticket:
-            last_number = int(last_ticket.ticket_number[3:])
-            new_number = last_number + 1
-        else:
-            new_number = 1
-        return f'TKT{new_number:06d}'
-    
-    @property
-    def total_refund(self):
+    def compute_refund_total(self):
+        """Recalcule le total remboursé à partir des produits chargés."""
         total = 0
         if self.shipping_cost_refund:
-            total += self.shipping_cost_amount
+            total += self.shipping_cost_amount or 0
         if self.packaging_cost_refund:
-            total += self.packaging_cost_amount
+            total += self.packaging_cost_amount or 0
         for product in self.products:
-            if product.refund_amount:
-                total += product.refund_amount
+            if product.price:
+                total += product.price
         return total
     
+    @hybrid_property
+    def total_refund(self):
+        return self.refund_total or 0.0
+    
+    @total_refund.expression
+    def total_refund(cls):
+        return cls.refund_total
+    
     @validates('return_type')
     def validate_return_type(self, key, return_type):
         valid_types = ['retour_client', 'retour_magasin', 'retour_garantie']
@@ -207,6 +219,9 @@ class Message(db.Model):
             raise ValueError('Le message ne peut pas être vide')
         return content
 
+# Types d'image décodables par Pillow, seuls servis en aperçu
+RASTER_IMAGE_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/bmp', 'image/tiff')
+
 class Attachment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), nullable=False)
@@ -215,6 +230,8 @@ class Attachment(db.Model):
     original_filename = db.Column(db.String(255), nullable=False)
     file_type = db.Column(db.String(50))
     file_size = db.Column(db.Integer)
+    # Empreinte SHA-256 du contenu (attachment_store) ; vide pour les anciens fichiers uploads/<ticket_id>/
+    content_hash = db.Column(db.String(64), index=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     
     @validates('filename', 'original_filename')
@@ -229,21 +246,282 @@ class Attachment(db.Model):
             raise ValueError('La taille du fichier ne peut pas être négative')
         return file_size
 
-# Événements pour la gestion des fichiers
-@event.listens_for(Attachment, 'after_delete')
-def delete_attachment_file(mapper, connection, target):
-    try:
-        file_path = os.path.join('uploads', str(target.ticket_id), target.filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-    except Exception as e:
-        print(f"Erreur lors de la suppression du fichier {file_path}: {str(e)}")
+    @property
+    def is_image(self):
+        # Images matricielles seulement : un SVG (script possible) n'est jamais affiché en ligne
+        return self.file_type in RASTER_IMAGE_TYPES
+
+# Les fichiers des pièces jointes supprimées sont libérés au commit par attachment_store
+
+# Numérotation des tickets (TKTnnnnnn) par compteur atomique
+TICKET_NUMBER_PREFIX = 'TKT'
+TICKET_SEQUENCE = 'ticket'
+
+def format_ticket_number(number):
+    return f'{TICKET_NUMBER_PREFIX}{number:06d}'
+
+def _insert_ignore(connection, table, **values):
+    """INSERT sans erreur si la ligne existe déjà (création concurrente par un autre processus)."""
+    if connection.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        connection.execute(insert(table).values(**values))
+        return
+    connection.execute(dialect_insert(table).values(**values).on_conflict_do_nothing())
+
+def sync_ticket_sequence(connection):
+    """Aligne le compteur sur le plus grand numéro de ticket existant (création, migration).
+
+    Sans risque en concurrence : la ligne est créée si absente, et le compteur
+    n'est jamais ramené en arrière.
+    """
+    ticket_table = Ticket.__table__
+    sequence_table = NumberSequence.__table__
+    highest = connection.execute(
+        select(func.max(cast(func.substr(ticket_table.c.ticket_number, len(TICKET_NUMBER_PREFIX) + 1), db.Integer)))
+        .where(ticket_table.c.ticket_number.like(f'{TICKET_NUMBER_PREFIX}%'))
+    ).scalar() or 0
+    _insert_ignore(connection, sequence_table, name=TICKET_SEQUENCE, value=highest)
+    connection.execute(
+        update(sequence_table)
+        .where(sequence_table.c.name == TICKET_SEQUENCE, sequence_table.c.value < highest)
+        .values(value=highest)
+    )
+
+def init_ticket_sequence(app):
+    """Crée le compteur des numéros de ticket au démarrage s'il manque."""
+    with app.app_context():
+        try:
+            with db.engine.begin() as connection:
+                sequence_table = NumberSequence.__table__
+                sequence_table.create(connection, checkfirst=True)
+                exists = connection.execute(
+                    select(sequence_table.c.name).where(sequence_table.c.name == TICKET_SEQUENCE)
+                ).first()
+                if exists is None and inspect(connection).has_table(Ticket.__tablename__):
+                    sync_ticket_sequence(connection)
+        except Exception as e:
+            app.logger.error(f"Erreur lors de l'initialisation du compteur des tickets : {str(e)}")
+
+def reserve_ticket_numbers(connection, count=1):
+    """Réserve `count` numéros consécutifs par un seul UPDATE ; retourne le premier.
+
+    Le verrou posé par l'UPDATE sérialise les réservations concurrentes :
+    deux transactions ne peuvent pas obtenir le même numéro.
+    """
+    sequence_table = NumberSequence.__table__
+    statement = update(sequence_table).where(
+        sequence_table.c.name == TICKET_SEQUENCE
+    ).values(value=sequence_table.c.value + count)
+    if connection.dialect.update_returning:
+        last = connection.execute(statement.returning(sequence_table.c.value)).scalar()
+    else:
+        last = None
+        if connection.execute(statement).rowcount:
+            last = connection.execute(
+                select(sequence_table.c.value).where(sequence_table.c.name == TICKET_SEQUENCE)
+            ).scalar()
+    if last is None:
+        # Compteur absent (tables créées après le démarrage) : initialisé depuis les tickets existants
+        sync_ticket_sequence(connection)
+        return reserve_ticket_numbers(connection, count)
+    return last - count + 1
+
+class TicketNumberAllocator:
+    """Distribue les numéros de ticket.
+
+    Par défaut (bloc de 1), chaque numéro est réservé dans la transaction qui
+    insère le ticket : un UPDATE atomique, sans trou si elle est annulée.
+    Avec TICKET_NUMBER_BLOCK_SIZE > 1, chaque processus réserve un bloc dans
+    une courte transaction séparée puis le distribue depuis la mémoire : le
+    compteur n'est plus verrouillé pendant les créations, au prix de trous
+    dans la numérotation (numéros non utilisés à l'arrêt). SQLite n'ayant
+    qu'un seul écrivain, ce mode y est ignoré : la transaction séparée
+    attendrait celle qui insère le ticket.
+    """
+
+    def __init__(self, block_size=1):
+        self.block_size = max(1, int(block_size))
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def allocate(self, connection, count=1):
+        """Retourne le premier de `count` numéros consécutifs."""
+        if self.block_size == 1 or count > 1 or connection.dialect.name == 'sqlite':
+            return reserve_ticket_numbers(connection, count)
+        with self._lock:
+            if self._next >= self._end:
+                with connection.engine.begin() as block_connection:
+                    self._next = reserve_ticket_numbers(block_connection, self.block_size)
+                self._end = self._next + self.block_size
+            number = self._next
+            self._next += 1
+            return number
+
+ticket_number_allocator = TicketNumberAllocator(Config.TICKET_NUMBER_BLOCK_SIZE)
 
 # Événements pour la validation des données
 @event.listens_for(Ticket, 'before_insert')
 def set_ticket_number(mapper, connection, target):
     if not target.ticket_number:
-        target.ticket_number = target.generate_ticket_number()
+        target.ticket_number = format_ticket_number(ticket_number_allocator.allocate(connection))
+
+# Maintenance du total remboursé dénormalisé
+REFUND_TICKET_FIELDS = ('shipping_cost_refund', 'shipping_cost_amount', 'packaging_cost_refund', 'packaging_cost_amount')
+REFUND_PRODUCT_FIELDS = ('price', 'ticket_id')
+
+def refund_total_expression():
+    """Expression SQL du total remboursé d'un ticket (frais + montants produits)."""
+    ticket_table = Ticket.__table__
+    product_table = Product.__table__
+    products_sum = select(func.coalesce(func.sum(product_table.c.price), 0.0)).where(
+        product_table.c.ticket_id == ticket_table.c.id
+    ).scalar_subquery()
+    return (
+        case((ticket_table.c.shipping_cost_refund == True, func.coalesce(ticket_table.c.shipping_cost_amount, 0.0)), else_=0.0)
+        + case((ticket_table.c.packaging_cost_refund == True, func.coalesce(ticket_table.c.packaging_cost_amount, 0.0)), else_=0.0)
+        + products_sum
+    )
+
+def refresh_refund_totals(connection, ticket_ids=None):
+    """Recalcule refund_total en SQL pour les tickets donnés (tous si None)."""
+    ticket_table = Ticket.__table__
+    stmt = update(ticket_table).values(refund_total=refund_total_expression())
+    if ticket_ids is None:
+        connection.execute(stmt)
+        return
+    for chunk in chunked(ticket_ids):
+        connection.execute(stmt.where(ticket_table.c.id.in_(chunk)))
+
+def _tickets_touched_by_flush(session):
+    ticket_ids = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Product):
+            state = inspect(obj)
+            if obj in session.dirty and not any(state.attrs[name].history.has_changes() for name in REFUND_PRODUCT_FIELDS):
+                continue
+            ticket_ids.add(obj.ticket_id)
+            ticket_ids.update(state.attrs.ticket_id.history.deleted)
+        elif isinstance(obj, Ticket) and obj not in session.deleted:
+            state = inspect(obj)
+            if obj in session.new or any(state.attrs[name].history.has_changes() for name in REFUND_TICKET_FIELDS):
+                ticket_ids.add(obj.id)
+    ticket_ids.discard(None)
+    return ticket_ids
+
+def _sync_refund_totals(session, connection, ticket_ids):
+    refresh_refund_totals(connection, ticket_ids)
+    # Synchroniser les instances déjà chargées sans les marquer comme modifiées
+    loaded = {}
+    for obj in list(session.identity_map.values()):
+        identity = inspect(obj).identity
+        if isinstance(obj, Ticket) and identity and identity[0] in ticket_ids:
+            loaded[identity[0]] = obj
+    if loaded:
+        ticket_table = Ticket.__table__
+        rows = connection.execute(
+            select(ticket_table.c.id, ticket_table.c.refund_total).where(ticket_table.c.id.in_(list(loaded)))
+        )
+        for ticket_id, refund_total in rows:
+            set_committed_value(loaded[ticket_id], 'refund_total', refund_total)
+
+# Maintenance de la table de cumuls journaliers ticket_daily_stats
+STATS_TICKET_FIELDS = ('created_at', 'client_id', 'status', 'return_type', 'credit_note_validated')
+
+def ticket_day_expression():
+    return func.date(Ticket.__table__.c.created_at, type_=db.Date)
+
+def _bucket_filter(table, day_column, buckets):
+    return or_(*[and_(day_column == day, table.c.client_id == client_id) for day, client_id in buckets])
+
+def _ticket_bucket_filter(buckets):
+    # Filtre par plage horaire pour profiter de l'index (client_id, created_at)
+    ticket_table = Ticket.__table__
+    return or_(*[
+        and_(
+            ticket_table.c.client_id == client_id,
+            ticket_table.c.created_at >= datetime.combine(day, time.min),
+            ticket_table.c.created_at < datetime.combine(day + timedelta(days=1), time.min)
+        )
+        for day, client_id in buckets
+    ])
+
+def refresh_daily_stats(connection, buckets=None):
+    """Recalcule les cumuls journaliers des couples (jour, client) donnés (tous si None)."""
+    stats_table = TicketDailyStat.__table__
+    ticket_table = Ticket.__table__
+    day = ticket_day_expression()
+    aggregate = select(
+        day,
+        ticket_table.c.client_id,
+        ticket_table.c.status,
+        ticket_table.c.return_type,
+        func.count(ticket_table.c.id),
+        func.coalesce(func.sum(ticket_table.c.refund_total), 0.0),
+        func.coalesce(func.sum(case((ticket_table.c.credit_note_validated == True, ticket_table.c.refund_total), else_=0.0)), 0.0)
+    ).group_by(day, ticket_table.c.client_id, ticket_table.c.status, ticket_table.c.return_type)
+    columns = ['day', 'client_id', 'status', 'return_type', 'ticket_count', 'refund_sum', 'validated_refund_sum']
+
+    if buckets is None:
+        connection.execute(delete(stats_table))
+        connection.execute(insert(stats_table).from_select(columns, aggregate))
+        return
+
+    # Deux paramètres par couple (jour, client) : blocs plus petits
+    for chunk in chunked(buckets, 100):
+        connection.execute(delete(stats_table).where(_bucket_filter(stats_table, stats_table.c.day, chunk)))
+        connection.execute(insert(stats_table).from_select(columns, aggregate.where(_ticket_bucket_filter(chunk))))
+
+def _previous_value(state, name):
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.obj(), name)
+
+def _stat_buckets_touched_by_flush(session, connection, refund_ticket_ids):
+    buckets = set()
+    ticket_ids = set(refund_ticket_ids)
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, Ticket):
+            continue
+        state = inspect(obj)
+        if obj in session.new:
+            ticket_ids.add(obj.id)
+            continue
+        if obj not in session.deleted and not any(state.attrs[name].history.has_changes() for name in STATS_TICKET_FIELDS):
+            continue
+        # Couple (jour, client) d'origine du ticket, avant modification ou suppression
+        created_at = _previous_value(state, 'created_at')
+        client_id = _previous_value(state, 'client_id')
+        if created_at and client_id:
+            buckets.add((created_at.date(), client_id))
+        if obj not in session.deleted:
+            ticket_ids.add(obj.id)
+    ticket_ids.discard(None)
+    if ticket_ids:
+        ticket_table = Ticket.__table__
+        for chunk in chunked(ticket_ids):
+            rows = connection.execute(
+                select(ticket_table.c.created_at, ticket_table.c.client_id).where(ticket_table.c.id.in_(chunk))
+            )
+            buckets.update((created_at.date(), client_id) for created_at, client_id in rows if created_at)
+    return buckets
+
+@event.listens_for(Session, 'after_flush')
+def maintain_ticket_aggregates(session, flush_context):
+    refund_ticket_ids = _tickets_touched_by_flush(session)
+    has_ticket_changes = any(isinstance(obj, Ticket) for obj in chain(session.new, session.dirty, session.deleted))
+    if not refund_ticket_ids and not has_ticket_changes:
+        return
+    connection = session.connection()
+    if refund_ticket_ids:
+        _sync_refund_totals(session, connection, refund_ticket_ids)
+    buckets = _stat_buckets_touched_by_flush(session, connection, refund_ticket_ids)
+    if buckets:
+        refresh_daily_stats(connection, buckets)
 
 @event.listens_for(User, 'before_insert')
 def set_user_defaults(mapper, connection, target):
@@ -266,10 +544,25 @@ Ticket.credit_note_validator = db.relationship('User', foreign_keys=[Ticket.cred
 Product.receptions = db.relationship('ReceptionLog', backref='product', lazy=True)
 
 class UserAction(db.Model):
+    # Le journal d'audit peut vivre dans une base séparée (AUDIT_DATABASE_URL) :
+    # pas de clé étrangère vers user, la jointure est déclarée côté ORM
+    __bind_key__ = 'audit' if Config.AUDIT_DATABASE_URL else None
+    # Index couvrant la pagination par curseur (timestamp, id), avec ou sans filtre
+    __table_args__ = (
+        db.Index('ix_user_action_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_user_action_user_timestamp_id', 'user_id', 'timestamp', 'id'),
+        db.Index('ix_user_action_type_timestamp_id', 'action_type', 'timestamp', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    user = db.relationship('User', backref='actions')
+    user_id = db.Column(db.Integer)
+    user = db.relationship(
+        'User',
+        primaryjoin='foreign(UserAction.user_id) == User.id',
+        backref=db.backref('actions', lazy=True),
+        viewonly=True
+    )
     action_type = db.Column(db.String(20))  # create, update, delete, login, logout
     module = db.Column(db.String(50))  # tickets, users, etc.
     details = db.Column(db.Text)
@@ -287,6 +580,23 @@ class UserAction(db.Model):
             'ip_address': self.ip_address
         }
 
+class UserActionArchive(db.Model):
+    """Actions d'audit anciennes, déplacées hors de user_action par archive_user_actions()."""
+    __tablename__ = 'user_action_archive'
+    __bind_key__ = UserAction.__bind_key__
+    __table_args__ = (
+        db.Index('ix_user_action_archive_timestamp_id', 'timestamp', 'id'),
+    )
+
+    # L'id d'origine est conservé
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    timestamp = db.Column(db.DateTime)
+    user_id = db.Column(db.Integer)
+    action_type = db.Column(db.String(20))
+    module = db.Column(db.String(50))
+    details = db.Column(db.Text)
+    ip_address = db.Column(db.String(45))
+
 class Settings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     company_name = db.Column(db.String(100), default='ALDER')
@@ -309,4 +619,59 @@ class Settings(db.Model):
             settings = cls()
             db.session.add(settings)
             db.session.commit()
-        return settings 
\ No newline at end of file
+        return settings
+
+class TicketDailyStat(db.Model):
+    """Cumuls journaliers des tickets par client, statut et type de retour."""
+    __tablename__ = 'ticket_daily_stats'
+
+    day = db.Column(db.Date, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey('client.id'), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    return_type = db.Column(db.String(50), primary_key=True)
+    ticket_count = db.Column(db.Integer, nullable=False, default=0)
+    refund_sum = db.Column(db.Float, nullable=False, default=0.0)
+    validated_refund_sum = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.Index('ix_ticket_daily_stats_client_day', 'client_id', 'day'),
+    )
+
+class NumberSequence(db.Model):
+    """Compteurs de numérotation (numéros de ticket), incrémentés atomiquement."""
+    __tablename__ = 'number_sequence'
+
+    name = db.Column(db.String(30), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+class DataVersion(db.Model):
+    """Version des données par type d'entité, incrémentée dans la transaction qui les modifie."""
+    __tablename__ = 'data_version'
+
+    entity = db.Column(db.String(30), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class ExportJob(db.Model):
+    """Tâche d'export de tickets exécutée en arrière-plan."""
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    format = db.Column(db.String(10), nullable=False)
+    params = db.Column(db.Text)  # filtres du formulaire, en JSON
+    params_hash = db.Column(db.String(64), index=True)
+    status = db.Column(db.String(20), default='en_attente')  # en_attente, en_cours, termine, erreur
+    total = db.Column(db.Integer)
+    filename = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'format': self.format,
+            'status': self.status,
+            'total': self.total,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
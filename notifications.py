@@ -3,15 +3,8 @@ from flask_mail import Mail, Message
 from threading import Thread
 import logging
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('notifications.log'),
-        logging.StreamHandler()
-    ]
-)
+# Les enregistrements passent par la file de log_pipeline installée par l'application
+logger = logging.getLogger(__name__)
 
 mail = Mail()
 
@@ -31,9 +24,9 @@ def send_async_email(app, msg):
     with app.app_context():
         try:
             mail.send(msg)
-            logging.info(f"Email envoyé avec succès à {msg.recipients}")
+            logger.info(f"Email envoyé avec succès à {msg.recipients}")
         except Exception as e:
-            logging.error(f"Erreur lors de l'envoi de l'email : {str(e)}")
+            logger.error(f"Erreur lors de l'envoi de l'email : {str(e)}")
 
 def send_email(subject, recipients, body, html=None):
     """Envoie un email de manière asynchrone."""
@@ -52,7 +45,7 @@ def send_email(subject, recipients, body, html=None):
         
         return True
     except Exception as e:
-        logging.error(f"Erreur lors de la préparation de l'email : {str(e)}")
+        logger.error(f"Erreur lors de la préparation de l'email : {str(e)}")
         return False
 
 def notify_new_ticket(ticket):
@@ -91,7 +84,7 @@ def notify_new_ticket(ticket):
         
         return send_email(subject, recipients, body, html)
     except Exception as e:
-        logging.error(f"Erreur lors de la notification de nouveau ticket : {str(e)}")
+        logger.error(f"Erreur lors de la notification de nouveau ticket : {str(e)}")
         return False
 
 def notify_status_change(ticket, old_status):
@@ -129,7 +122,7 @@ def notify_status_change(ticket, old_status):
         
         return send_email(subject, recipients, body, html)
     except Exception as e:
-        logging.error(f"Erreur lors de la notification de changement de statut : {str(e)}")
+        logger.error(f"Erreur lors de la notification de changement de statut : {str(e)}")
         return False
 
 def notify_anomaly(ticket, anomaly_type, details):
@@ -167,5 +160,91 @@ def notify_anomaly(ticket, anomaly_type, details):
         
         return send_email(subject, recipients, body, html)
     except Exception as e:
-        logging.error(f"Erreur lors de la notification d'anomalie : {str(e)}")
-        return False 
\ No newline at end of file
+        logger.error(f"Erreur lors de la notification d'anomalie : {str(e)}")
+        return False 
+
+def notify_ticket_import(result, source):
+    """Notifie, en un seul email, des tickets créés par un import groupé."""
+    try:
+        from models import Settings
+        settings = Settings.query.first()
+        if not settings or not settings.notify_new_ticket or not settings.notification_email:
+            return False
+
+        count = len(result.ticket_numbers)
+        subject = f"Import de {count} ticket(s) depuis {source}"
+        recipients = [settings.notification_email]
+        numbers = ', '.join(result.ticket_numbers)
+        
+        body = f"""
+        Un import groupé a créé {count} ticket(s) et {result.product_count} produit(s) :
+        
+        Fichier : {source}
+        Tickets : {numbers}
+        
+        Pour plus de détails, connectez-vous à l'application.
+        """
+        
+        html = f"""
+        <h2>Import de {count} ticket(s)</h2>
+        <p>Un import groupé a été effectué :</p>
+        <ul>
+            <li><strong>Fichier :</strong> {source}</li>
+            <li><strong>Tickets créés :</strong> {count}</li>
+            <li><strong>Produits :</strong> {result.product_count}</li>
+        </ul>
+        <p>{numbers}</p>
+        <p>Pour plus de détails, <a href="{current_app.config.get('BASE_URL')}/logistics">connectez-vous à l'application</a>.</p>
+        """
+        
+        return send_email(subject, recipients, body, html)
+    except Exception as e:
+        logger.error(f"Erreur lors de la notification d'import : {str(e)}")
+        return False
+
+def notify_status_changes(changes):
+    """Notifie des changements de statut d'une action groupée.
+
+    Un seul email récapitulatif à l'adresse de notification des paramètres,
+    quel que soit le nombre de tickets (au lieu d'un email par ticket).
+    """
+    try:
+        from models import Settings
+        settings = Settings.query.first()
+        if not settings or not settings.notify_status_change or not settings.notification_email or not changes:
+            return False
+
+        count = len(changes)
+        subject = f"Changement de statut de {count} ticket(s)"
+        lines = '\n'.join(
+            f"        {change['ticket_number']} : {change['old_status']} -> {change['new_status']} "
+            f"({change['client_name']}, {change['account_number']})"
+            for change in changes
+        )
+        rows = ''.join(
+            f"<tr><td>{change['ticket_number']}</td><td>{change['client_name']}</td>"
+            f"<td>{change['account_number']}</td><td>{change['old_status']}</td><td>{change['new_status']}</td></tr>"
+            for change in changes
+        )
+        
+        body = f"""
+        Le statut de {count} ticket(s) a été modifié :
+        
+{lines}
+        
+        Pour plus de détails, connectez-vous à l'application.
+        """
+        
+        html = f"""
+        <h2>Changement de statut de {count} ticket(s)</h2>
+        <table>
+            <tr><th>Ticket</th><th>Client</th><th>Compte</th><th>Ancien statut</th><th>Nouveau statut</th></tr>
+            {rows}
+        </table>
+        <p>Pour plus de détails, <a href="{current_app.config.get('BASE_URL')}/search">connectez-vous à l'application</a>.</p>
+        """
+        
+        return send_email(subject, [settings.notification_email], body, html)
+    except Exception as e:
+        logger.error(f"Erreur lors de la notification des changements de statut : {str(e)}")
+        return False
@@ -0,0 +1,109 @@
+import base64
+from datetime import datetime
+
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(sort_value, row_id):
+    """Encode la position (valeur de tri, id) d'une ligne en curseur opaque."""
+    raw = f"{sort_value.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Décode un curseur produit par encode_cursor. Lève ValueError si invalide."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        sort_value, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except Exception:
+        raise ValueError('Curseur de pagination invalide')
+
+
+class KeysetPage:
+    """Page de résultats obtenue par pagination par clé (keyset)."""
+
+    def __init__(self, items, sort_attr, next_cursor=None, prev_cursor=None, per_page=None):
+        self.items = items
+        self.sort_attr = sort_attr
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.per_page = per_page
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class StaticPagination(Pagination):
+    """Pagination par numéro de page reconstruite à partir de résultats déjà calculés (cache)."""
+
+    def __init__(self, items, page, per_page, total):
+        self._static_items = items
+        self._static_total = total
+        super().__init__(page=page, per_page=per_page, max_per_page=None, error_out=False)
+
+    def _query_items(self):
+        return self._static_items
+
+    def _query_count(self):
+        return self._static_total
+
+
+def keyset_paginate(query, sort_column, id_column, per_page, after=None, before=None):
+    """Pagine une requête triée par (sort_column, id_column) décroissants sans OFFSET.
+
+    `after` renvoie la page suivante (lignes plus anciennes que le curseur),
+    `before` la page précédente (lignes plus récentes). Le couple de colonnes
+    doit être couvert par un index composite pour que le parcours reste borné.
+    """
+    sort_attr = sort_column.key
+    id_attr = id_column.key
+    per_page = max(1, int(per_page))
+
+    if before:
+        sort_value, row_id = decode_cursor(before)
+        query = query.filter(or_(
+            sort_column > sort_value,
+            and_(sort_column == sort_value, id_column > row_id)
+        ))
+        rows = query.order_by(sort_column.asc(), id_column.asc()).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        # On vient d'une page plus ancienne : il existe forcément une page suivante
+        has_next = bool(items)
+        has_prev = has_more
+    else:
+        if after:
+            sort_value, row_id = decode_cursor(after)
+            query = query.filter(or_(
+                sort_column < sort_value,
+                and_(sort_column == sort_value, id_column < row_id)
+            ))
+        rows = query.order_by(sort_column.desc(), id_column.desc()).limit(per_page + 1).all()
+        items = rows[:per_page]
+        has_next = len(rows) > per_page
+        has_prev = bool(after) and bool(items)
+
+    next_cursor = None
+    prev_cursor = None
+    if items:
+        if has_next:
+            last = items[-1]
+            next_cursor = encode_cursor(getattr(last, sort_attr), getattr(last, id_attr))
+        if has_prev:
+            first = items[0]
+            prev_cursor = encode_cursor(getattr(first, sort_attr), getattr(first, id_attr))
+
+    return KeysetPage(items, sort_attr, next_cursor=next_cursor, prev_cursor=prev_cursor, per_page=per_page)
@@ -0,0 +1,172 @@
+import zlib
+from array import array
+
+from fpdf.fonts import fpdf_charwidths
+
+# Points par millimètre
+MM = 72 / 25.4
+
+# Polices standard PDF : aucune police à embarquer, métriques reprises de FPDF
+FONTS = {
+    '': ('F1', 'Helvetica', 'helvetica'),
+    'B': ('F2', 'Helvetica-Bold', 'helveticaB'),
+}
+
+# Objets réservés : catalogue, arbre des pages, puis une police par style
+CATALOG_OBJ = 1
+PAGES_OBJ = 2
+FIRST_PAGE_OBJ = 3 + len(FONTS)
+
+
+class StreamingPDF:
+    """Écrit un PDF page par page dans un fichier binaire ouvert.
+
+    Contrairement à FPDF, qui garde toutes les pages puis le document complet
+    en mémoire jusqu'à `output()`, chaque page est écrite dès qu'elle est
+    terminée. Seuls les décalages des objets (8 octets par objet) sont conservés
+    pour la table de références finale. Coordonnées en millimètres depuis le
+    coin supérieur gauche, comme dans FPDF.
+    """
+
+    def __init__(self, f, width=210, height=297, compress=True):
+        self.f = f
+        self.width = width
+        self.height = height
+        self.compress = compress
+        self.page_count = 0
+        self._offsets = array('Q')
+        self._position = 0
+        self._content = None
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _write(self, data):
+        if isinstance(data, str):
+            data = data.encode('latin-1')
+        self.f.write(data)
+        self._position += len(data)
+
+    def _begin_object(self, number):
+        # Les objets sont numérotés dans l'ordre d'écriture, sauf les objets réservés
+        index = number - 1
+        while len(self._offsets) <= index:
+            self._offsets.append(0)
+        self._offsets[index] = self._position
+        self._write(f'{number} 0 obj\n')
+
+    def _write_object(self, number, body):
+        self._begin_object(number)
+        self._write(body)
+        self._write('\nendobj\n')
+
+    @staticmethod
+    def encode(text):
+        """Encode le texte pour les polices standard (WinAnsi, « € » compris)."""
+        return str(text if text is not None else '').encode('cp1252', 'replace')
+
+    @staticmethod
+    def string_width(text, style='', size=9):
+        """Largeur du texte en millimètres."""
+        widths = fpdf_charwidths[FONTS[style][2]]
+        return sum(widths[chr(byte)] for byte in StreamingPDF.encode(text)) * size / 1000 / MM
+
+    def fit(self, text, width, style='', size=9):
+        """Tronque le texte avec « ... » pour qu'il tienne dans `width` millimètres."""
+        text = str(text if text is not None else '')
+        if self.string_width(text, style, size) <= width:
+            return text
+        while text and self.string_width(text + '...', style, size) > width:
+            text = text[:-1]
+        return text + '...'
+
+    def add_page(self):
+        if self._content is not None:
+            self._end_page()
+        self.page_count += 1
+        self._content = []
+
+    def text(self, x, y, text, style='', size=9, width=None, height=0, align='L', padding=1):
+        """Écrit `text` dans la cellule (x, y, width, height), centré verticalement."""
+        if width is not None:
+            text = self.fit(text, width - 2 * padding, style, size)
+            text_width = self.string_width(text, style, size)
+            if align == 'R':
+                x = x + width - padding - text_width
+            elif align == 'C':
+                x = x + (width - text_width) / 2
+            else:
+                x = x + padding
+        baseline = y + height / 2 + 0.3 * size / MM
+        escaped = self.encode(text).replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+        self._content.append(
+            b'BT /%s %.2f Tf %.2f %.2f Td (%s) Tj ET' % (
+                FONTS[style][0].encode(), size, x * MM, (self.height - baseline) * MM, escaped
+            )
+        )
+
+    def rect(self, x, y, width, height, fill=None):
+        """Trace un rectangle ; `fill` est un niveau de gris entre 0 et 1."""
+        operator = b'S'
+        if fill is not None:
+            self._content.append(b'%.3f g' % fill)
+            operator = b'B'
+        self._content.append(
+            b'%.2f %.2f %.2f %.2f re %s' % (
+                x * MM, (self.height - y) * MM, width * MM, -height * MM, operator
+            )
+        )
+        if fill is not None:
+            self._content.append(b'0 g')
+
+    def line(self, x1, y1, x2, y2):
+        self._content.append(
+            b'%.2f %.2f m %.2f %.2f l S' % (
+                x1 * MM, (self.height - y1) * MM, x2 * MM, (self.height - y2) * MM
+            )
+        )
+
+    def _end_page(self):
+        stream = b'0.2 w\n' + b'\n'.join(self._content)
+        self._content = None
+        stream_filter = ''
+        if self.compress:
+            stream = zlib.compress(stream)
+            stream_filter = '/Filter /FlateDecode '
+
+        page_obj = FIRST_PAGE_OBJ + 2 * (self.page_count - 1)
+        fonts = ' '.join(f'/{name} {3 + i} 0 R' for i, (name, _, _) in enumerate(FONTS.values()))
+        self._write_object(page_obj, (
+            f'<</Type /Page /Parent {PAGES_OBJ} 0 R '
+            f'/MediaBox [0 0 {self.width * MM:.2f} {self.height * MM:.2f}] '
+            f'/Resources <</Font <<{fonts}>>>> /Contents {page_obj + 1} 0 R>>'
+        ))
+        self._begin_object(page_obj + 1)
+        self._write(f'<<{stream_filter}/Length {len(stream)}>>\nstream\n')
+        self._write(stream)
+        self._write('\nendstream\nendobj\n')
+
+    def close(self):
+        """Termine la dernière page puis écrit polices, arbre des pages et références."""
+        if self._content is None:
+            self.add_page()
+        self._end_page()
+
+        for i, (_, base_font, _) in enumerate(FONTS.values()):
+            self._write_object(
+                3 + i, f'<</Type /Font /Subtype /Type1 /BaseFont /{base_font} /Encoding /WinAnsiEncoding>>'
+            )
+
+        self._begin_object(PAGES_OBJ)
+        self._write('<</Type /Pages /Kids [')
+        for page in range(self.page_count):
+            self._write(f'{FIRST_PAGE_OBJ + 2 * page} 0 R ')
+        self._write(f'] /Count {self.page_count}>>\nendobj\n')
+        self._write_object(CATALOG_OBJ, f'<</Type /Catalog /Pages {PAGES_OBJ} 0 R>>')
+
+        xref_position = self._position
+        self._write(f'xref\n0 {len(self._offsets) + 1}\n0000000000 65535 f \n')
+        for offset in self._offsets:
+            self._write(f'{offset:010d} 00000 n \n')
+        self._write(
+            f'trailer\n<</Size {len(self._offsets) + 1} /Root {CATALOG_OBJ} 0 R>>\n'
+            f'startxref\n{xref_position}\n%%EOF\n'
+        )
@@ -0,0 +1,147 @@
+import atexit
+import threading
+from datetime import datetime, timezone, timedelta
+
+from sqlalchemy import update, bindparam
+
+from extensions import db
+from models import User
+
+REDIS_PENDING_KEY = 'presence:pending'
+
+
+def _aware(value):
+    # SQLite rend des dates naïves, stockées en UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class MemoryPresenceBuffer:
+    """Dernières activités en attente d'écriture, propres au processus."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def get(self, user_id):
+        return self._pending.get(user_id)
+
+    def put(self, user_id, seen_at):
+        with self._lock:
+            self._pending[user_id] = seen_at
+
+    def drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+
+class RedisPresenceBuffer:
+    """Dernières activités partagées entre processus dans un hash Redis."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, user_id):
+        value = self.client.hget(REDIS_PENDING_KEY, user_id)
+        return datetime.fromisoformat(value.decode()) if value else None
+
+    def put(self, user_id, seen_at):
+        self.client.hset(REDIS_PENDING_KEY, user_id, seen_at.isoformat())
+
+    def drain(self):
+        # Lecture et suppression atomiques : chaque activité n'est écrite qu'une fois
+        pipe = self.client.pipeline()
+        pipe.hgetall(REDIS_PENDING_KEY)
+        pipe.delete(REDIS_PENDING_KEY)
+        pending, _ = pipe.execute()
+        return {int(user_id): datetime.fromisoformat(value.decode()) for user_id, value in pending.items()}
+
+
+class PresenceTracker:
+    """Regroupe les mises à jour de User.last_seen.
+
+    Une requête authentifiée ne provoque aucune écriture : la date d'activité
+    est mise en attente, sauf si celle connue date de moins de
+    PRESENCE_FRESHNESS secondes. Un thread écrit toutes les attentes en un seul
+    UPDATE groupé toutes les PRESENCE_FLUSH_INTERVAL secondes, et une dernière
+    fois à l'arrêt du processus.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.buffer = None
+        self._stop = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.freshness = timedelta(seconds=app.config['PRESENCE_FRESHNESS'])
+        self.interval = app.config['PRESENCE_FLUSH_INTERVAL']
+        self.buffer = self._create_buffer(app)
+        app.extensions['presence'] = self
+        self._thread = threading.Thread(target=self._run, name='presence-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    @staticmethod
+    def _create_buffer(app):
+        if app.config['PRESENCE_BACKEND'] == 'redis':
+            try:
+                import redis
+                client = redis.Redis.from_url(app.config['REDIS_URL'])
+                client.ping()
+                return RedisPresenceBuffer(client)
+            except Exception as e:
+                app.logger.error(f"Redis indisponible pour la présence, repli en mémoire : {str(e)}")
+        return MemoryPresenceBuffer()
+
+    def touch(self, user_id, last_seen=None, now=None):
+        """Note l'activité d'un utilisateur ; `last_seen` est la valeur déjà chargée."""
+        now = now or datetime.now(timezone.utc)
+        known = _aware(last_seen)
+        pending = self.buffer.get(user_id)
+        if pending is not None and (known is None or pending > known):
+            known = pending
+        if known is not None and now - known < self.freshness:
+            return False
+        self.buffer.put(user_id, now)
+        return True
+
+    def flush(self):
+        """Écrit toutes les activités en attente ; retourne le nombre d'utilisateurs mis à jour."""
+        pending = self.buffer.drain()
+        if not pending:
+            return 0
+        statement = update(User.__table__).where(
+            User.__table__.c.id == bindparam('user_id')
+        ).values(last_seen=bindparam('seen_at'))
+        rows = [{'user_id': user_id, 'seen_at': seen_at} for user_id, seen_at in pending.items()]
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(statement, rows)
+        except Exception as e:
+            self.app.logger.error(f"Erreur lors de l'écriture des présences : {str(e)}")
+            # On remet les activités en attente, sans écraser de plus récentes
+            for user_id, seen_at in pending.items():
+                current = self.buffer.get(user_id)
+                if current is None or current < seen_at:
+                    self.buffer.put(user_id, seen_at)
+            return 0
+        return len(rows)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def shutdown(self):
+        self._stop.set()
+        if self.app is not None:
+            self.flush()
+
+
+presence = PresenceTracker()
@@ -0,0 +1,16 @@
+from app import create_app, db
+from models import TicketDailyStat, refresh_daily_stats
+
+def rebuild_stats():
+    """Reconstruit entièrement la table ticket_daily_stats à partir des tickets."""
+    app = create_app()
+    with app.app_context():
+        with db.engine.connect() as conn:
+            TicketDailyStat.__table__.create(conn, checkfirst=True)
+            refresh_daily_stats(conn)
+            conn.commit()
+            count = conn.execute(db.select(db.func.count()).select_from(TicketDailyStat.__table__)).scalar()
+        print(f"{count} ligne(s) de cumuls journaliers recalculée(s)")
+
+if __name__ == '__main__':
+    rebuild_stats()
@@ -0,0 +1,217 @@
+import hashlib
+import os
+import threading
+import uuid
+from itertools import chain
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from batching import chunked
+from data_versions import bump_data_versions
+from extensions import cache
+from models import Client, Ticket, Product, REFUND_TICKET_FIELDS, REFUND_PRODUCT_FIELDS
+
+TAG_PREFIX = 'tag:'
+RESPONSE_PREFIX = 'resp:'
+
+# Champs d'un ticket qui changent les montants d'avoirs (comptabilité, tableau de bord)
+CREDIT_NOTE_FIELDS = REFUND_TICKET_FIELDS + (
+    'credit_note_number', 'credit_note_date', 'credit_note_validated', 'status', 'client_id', 'created_at'
+)
+
+
+class ResponseCache:
+    """Cache des données des pages de consultation, invalidé par étiquettes.
+
+    Chaque étiquette ('ticket', 'client', 'credit_note', 'client:<id>') a un
+    jeton de version stocké dans le cache ; la clé d'une entrée inclut les
+    jetons de ses étiquettes. Invalider une étiquette revient à changer son
+    jeton : les anciennes entrées ne sont plus jamais lues et expirent seules.
+    Redis est utilisé s'il répond à REDIS_URL (cache partagé entre processus),
+    sinon un cache mémoire propre au processus.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.backend = None
+        self.timeout = 60
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def init_app(self, app):
+        self.app = app
+        self.timeout = app.config['RESPONSE_CACHE_TIMEOUT']
+        self.backend = self._select_backend(app)
+        if self.backend == 'redis':
+            config = {
+                'CACHE_TYPE': 'RedisCache',
+                'CACHE_REDIS_URL': app.config['REDIS_URL'],
+                'CACHE_KEY_PREFIX': app.config['RESPONSE_CACHE_PREFIX'],
+            }
+        else:
+            config = {
+                'CACHE_TYPE': 'SimpleCache',
+                'CACHE_THRESHOLD': app.config['RESPONSE_CACHE_THRESHOLD'],
+            }
+        config['CACHE_DEFAULT_TIMEOUT'] = self.timeout
+        cache.init_app(app, config=config)
+        app.extensions['response_cache'] = self
+
+    @staticmethod
+    def _select_backend(app):
+        backend = app.config['RESPONSE_CACHE_BACKEND']
+        if backend in ('auto', 'redis'):
+            try:
+                import redis
+                redis.Redis.from_url(app.config['REDIS_URL'], socket_connect_timeout=1).ping()
+                return 'redis'
+            except Exception as e:
+                if backend == 'redis':
+                    app.logger.error(f"Redis indisponible pour le cache, repli en mémoire : {str(e)}")
+        return 'memory'
+
+    # Étiquettes
+
+    def _versions(self, tags):
+        keys = [TAG_PREFIX + tag for tag in tags]
+        versions = cache.get_many(*keys)
+        missing = {key: uuid.uuid4().hex for key, version in zip(keys, versions) if version is None}
+        if missing:
+            # Jeton aléatoire : une étiquette évincée ne ressuscite pas d'anciennes entrées
+            for key, version in missing.items():
+                cache.add(key, version, timeout=0)
+            versions = cache.get_many(*keys)
+        return versions
+
+    def invalidate(self, *tags):
+        """Périme toutes les entrées portant l'une des étiquettes."""
+        if not tags or self.app is None:
+            return
+        try:
+            cache.set_many({TAG_PREFIX + tag: uuid.uuid4().hex for tag in tags}, timeout=0)
+        except Exception as e:
+            self.app.logger.error(f"Erreur lors de l'invalidation du cache ({', '.join(tags)}) : {str(e)}")
+
+    # Lecture
+
+    def _count(self, name, outcome):
+        with self._lock:
+            stats = self._stats.setdefault(name, {'hits': 0, 'misses': 0, 'errors': 0})
+            stats[outcome] += 1
+
+    def get_or_set(self, name, tags, compute, key=None, timeout=None):
+        """Retourne la valeur en cache pour (name, key), sinon compute() mise en cache.
+
+        Une panne du cache n'empêche pas la réponse : la valeur est recalculée.
+        """
+        try:
+            versions = self._versions(tags)
+            digest = hashlib.sha1(repr((key, versions)).encode('utf-8')).hexdigest()
+            cache_key = f'{RESPONSE_PREFIX}{name}:{digest}'
+            value = cache.get(cache_key)
+        except Exception as e:
+            self.app.logger.error(f"Erreur de lecture du cache {name} : {str(e)}")
+            self._count(name, 'errors')
+            return compute()
+        if value is not None:
+            self._count(name, 'hits')
+            return value
+        self._count(name, 'misses')
+        value = compute()
+        try:
+            cache.set(cache_key, value, timeout=timeout or self.timeout)
+        except Exception as e:
+            self.app.logger.error(f"Erreur d'écriture du cache {name} : {str(e)}")
+        return value
+
+    def stats(self):
+        """Compteurs de succès/échecs du processus courant, par page."""
+        with self._lock:
+            endpoints = {}
+            for name, stats in sorted(self._stats.items()):
+                lookups = stats['hits'] + stats['misses']
+                endpoints[name] = dict(stats, hit_ratio=round(stats['hits'] / lookups, 3) if lookups else None)
+        return {'backend': self.backend, 'pid': os.getpid(), 'timeout': self.timeout, 'endpoints': endpoints}
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+
+response_cache = ResponseCache()
+
+
+def _ticket_client_ids(connection, ticket_ids):
+    ticket_table = Ticket.__table__
+    client_ids = set()
+    for chunk in chunked(ticket_ids):
+        client_ids.update(connection.execute(
+            select(ticket_table.c.client_id).where(ticket_table.c.id.in_(chunk))
+        ).scalars())
+    return client_ids
+
+
+def tags_touched_by_flush(session):
+    """Étiquettes de cache concernées par les objets du flush en cours."""
+    tags = set()
+    client_ids = set()
+    product_ticket_ids = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Client):
+            tags.add('client')
+            client_ids.add(obj.id)
+        elif isinstance(obj, Ticket):
+            state = inspect(obj)
+            if obj in session.dirty and not state.modified:
+                continue
+            tags.add('ticket')
+            client_ids.add(obj.client_id)
+            client_ids.update(state.attrs.client_id.history.deleted)
+            if obj in session.new or obj in session.deleted or \
+                    any(state.attrs[name].history.has_changes() for name in CREDIT_NOTE_FIELDS):
+                tags.add('credit_note')
+        elif isinstance(obj, Product):
+            state = inspect(obj)
+            tags.add('ticket')
+            product_ticket_ids.add(obj.ticket_id)
+            product_ticket_ids.update(state.attrs.ticket_id.history.deleted)
+            if obj not in session.dirty or any(state.attrs[name].history.has_changes() for name in REFUND_PRODUCT_FIELDS):
+                tags.add('credit_note')
+    product_ticket_ids.discard(None)
+    if product_ticket_ids:
+        client_ids.update(_ticket_client_ids(session.connection(), product_ticket_ids))
+    client_ids.discard(None)
+    tags.update(f'client:{client_id}' for client_id in client_ids)
+    return tags
+
+
+def record_changes(session, tags):
+    """Note des modifications faites dans la transaction de `session`.
+
+    Les versions de données (ETag) sont incrémentées tout de suite, dans la
+    transaction ; les étiquettes du cache sont invalidées au commit. Les
+    écritures en masse (hors ORM) appellent cette fonction elles-mêmes.
+    """
+    tags = set(tags)
+    if not tags:
+        return
+    session.info.setdefault('response_cache_tags', set()).update(tags)
+    bump_data_versions(session.connection(), [tag for tag in tags if ':' not in tag])
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_cache_tags(session, flush_context):
+    record_changes(session, tags_touched_by_flush(session))
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_cache_tags(session):
+    tags = session.info.pop('response_cache_tags', None)
+    if tags:
+        response_cache.invalidate(*sorted(tags))
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_cache_tags(session):
+    session.info.pop('response_cache_tags', None)
@@ -1,28 +1,21 @@
 import schedule
 import time
 import logging
+from log_pipeline import setup_logging
 from backup_db import main as backup_main
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('backup_scheduler.log'),
-        logging.StreamHandler()
-    ]
-)
+logger = logging.getLogger('backup_scheduler')
 
 def run_backup():
     """Exécute la sauvegarde et gère les erreurs."""
     try:
         backup_main()
     except Exception as e:
-        logging.error(f"Erreur lors de l'exécution de la sauvegarde : {e}")
+        logger.error(f"Erreur lors de l'exécution de la sauvegarde : {e}")
 
 def main():
     """Fonction principale qui planifie les sauvegardes."""
-    logging.info("Démarrage du planificateur de sauvegardes")
+    logger.info("Démarrage du planificateur de sauvegardes")
     
     # Exécuter une sauvegarde immédiatement au démarrage
     run_backup()
@@ -36,8 +29,10 @@ def main():
             schedule.run_pending()
             time.sleep(1)
         except Exception as e:
-            logging.error(f"Erreur dans la boucle principale : {e}")
+            logger.error(f"Erreur dans la boucle principale : {e}")
             time.sleep(60)  # Attendre une minute en cas d'erreur
 
 if __name__ == '__main__':
+    # Journal JSON écrit par le thread de log_pipeline
+    setup_logging('backup_scheduler.log', console=True)
     main() 
\ No newline at end of file
@@ -0,0 +1,266 @@
+from itertools import chain
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, text, bindparam, literal_column, select, table, column, false
+from sqlalchemy.orm import Session
+
+from batching import chunked
+from extensions import db
+from models import Client, Ticket, Product, Message
+
+# Champs de recherche exposés par les formulaires, et leur colonne SQL de repli
+TICKET_FIELDS = {
+    'ticket_number': Ticket.ticket_number,
+    'client_name': Client.name,
+    'client_email': Client.email,
+    'account_number': Client.account_number,
+}
+CLIENT_FIELDS = {
+    'account_number': Client.account_number,
+    'name': Client.name,
+    'email': Client.email,
+}
+
+# Le tokenizer trigram ne sait pas chercher moins de 3 caractères
+MIN_TERM_LENGTH = 3
+
+
+class LikeSearchBackend:
+    """Recherche par ILIKE, sans index : utilisée quand FTS5 n'est pas disponible."""
+
+    name = 'like'
+    maintains_index = False
+
+    def setup(self, connection):
+        pass
+
+    def reindex_tickets(self, connection, ticket_ids=None):
+        pass
+
+    def reindex_clients(self, connection, client_ids=None):
+        pass
+
+    def remove_tickets(self, connection, ticket_ids):
+        pass
+
+    def remove_clients(self, connection, client_ids):
+        pass
+
+    def ticket_condition(self, field, term):
+        return TICKET_FIELDS[field].ilike(f'%{term}%')
+
+    def client_condition(self, field, term):
+        return CLIENT_FIELDS[field].ilike(f'%{term}%')
+
+    def search_condition(self, query):
+        """Condition SQL de la recherche libre, sans limite (requête jointe à Client)."""
+        conditions = [column.ilike(f'%{term}%') for term in query.split() for column in TICKET_FIELDS.values()]
+        return db.or_(*conditions) if conditions else false()
+
+    def search_tickets(self, query, limit):
+        conditions = [column.ilike(f'%{term}%') for term in query.split() for column in TICKET_FIELDS.values()]
+        if not conditions:
+            return []
+        rows = db.session.query(Ticket.id).join(Client).filter(db.or_(*conditions)).order_by(
+            Ticket.created_at.desc()
+        ).limit(limit)
+        return [(ticket_id, None) for ticket_id, in rows]
+
+
+class SQLiteFTS5Backend(LikeSearchBackend):
+    """Index plein texte SQLite FTS5 (tokenizer trigram : recherche de sous-chaînes indexée)."""
+
+    name = 'sqlite_fts5'
+    maintains_index = True
+
+    TICKET_COLUMNS = ('ticket_number', 'client_name', 'client_email', 'account_number', 'product_refs', 'messages')
+    CLIENT_COLUMNS = ('account_number', 'name', 'email')
+
+    def setup(self, connection):
+        existing = connection.execute(text(
+            "SELECT name FROM sqlite_master WHERE name IN ('ticket_search', 'client_search')"
+        )).scalars().all()
+        if 'ticket_search' not in existing:
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE ticket_search USING fts5({', '.join(self.TICKET_COLUMNS)}, tokenize='trigram')"
+            ))
+        if 'client_search' not in existing:
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE client_search USING fts5({', '.join(self.CLIENT_COLUMNS)}, tokenize='trigram')"
+            ))
+        if len(existing) < 2 and inspect(connection).has_table('ticket'):
+            self.reindex_tickets(connection)
+            self.reindex_clients(connection)
+
+    def reindex_tickets(self, connection, ticket_ids=None):
+        populate = """
+            INSERT INTO ticket_search (rowid, ticket_number, client_name, client_email, account_number, product_refs, messages)
+            SELECT t.id, t.ticket_number, c.name, COALESCE(c.email, ''), c.account_number,
+                   COALESCE((SELECT group_concat(p.product_ref, ' ') FROM product p WHERE p.ticket_id = t.id), ''),
+                   COALESCE((SELECT group_concat(m.content, ' ') FROM message m WHERE m.ticket_id = t.id), '')
+            FROM ticket t JOIN client c ON c.id = t.client_id
+        """
+        if ticket_ids is None:
+            connection.execute(text('DELETE FROM ticket_search'))
+            connection.execute(text(populate))
+            return
+        for chunk in chunked(ticket_ids):
+            params = {'ids': chunk}
+            connection.execute(
+                text('DELETE FROM ticket_search WHERE rowid IN :ids').bindparams(bindparam('ids', expanding=True)), params
+            )
+            connection.execute(
+                text(populate + ' WHERE t.id IN :ids').bindparams(bindparam('ids', expanding=True)), params
+            )
+
+    def reindex_clients(self, connection, client_ids=None):
+        populate = """
+            INSERT INTO client_search (rowid, account_number, name, email)
+            SELECT id, account_number, name, COALESCE(email, '') FROM client
+        """
+        if client_ids is None:
+            connection.execute(text('DELETE FROM client_search'))
+            connection.execute(text(populate))
+            return
+        for chunk in chunked(client_ids):
+            params = {'ids': chunk}
+            connection.execute(
+                text('DELETE FROM client_search WHERE rowid IN :ids').bindparams(bindparam('ids', expanding=True)), params
+            )
+            connection.execute(
+                text(populate + ' WHERE id IN :ids').bindparams(bindparam('ids', expanding=True)), params
+            )
+
+    def remove_tickets(self, connection, ticket_ids):
+        for chunk in chunked(ticket_ids):
+            connection.execute(
+                text('DELETE FROM ticket_search WHERE rowid IN :ids').bindparams(bindparam('ids', expanding=True)),
+                {'ids': chunk}
+            )
+
+    def remove_clients(self, connection, client_ids):
+        for chunk in chunked(client_ids):
+            connection.execute(
+                text('DELETE FROM client_search WHERE rowid IN :ids').bindparams(bindparam('ids', expanding=True)),
+                {'ids': chunk}
+            )
+
+    @staticmethod
+    def _phrase(term):
+        return '"' + term.replace('"', '""') + '"'
+
+    def _match(self, index_name, expression):
+        index = table(index_name, column('rowid'))
+        return select(index.c.rowid).where(literal_column(index_name).op('MATCH')(expression))
+
+    def ticket_condition(self, field, term):
+        if len(term) < MIN_TERM_LENGTH:
+            return super().ticket_condition(field, term)
+        return Ticket.id.in_(self._match('ticket_search', f'{field} : {self._phrase(term)}'))
+
+    def client_condition(self, field, term):
+        if len(term) < MIN_TERM_LENGTH:
+            return super().client_condition(field, term)
+        return Client.id.in_(self._match('client_search', f'{field} : {self._phrase(term)}'))
+
+    def _search_expression(self, query):
+        terms = [term for term in query.split() if len(term) >= MIN_TERM_LENGTH]
+        return ' AND '.join(self._phrase(term) for term in terms) if terms else None
+
+    def search_condition(self, query):
+        # Sous-requête sur l'index : le filtre reste dans le SQL, sans liste d'identifiants tronquée
+        expression = self._search_expression(query)
+        if expression is None:
+            return super().search_condition(query)
+        return Ticket.id.in_(self._match('ticket_search', expression))
+
+    def search_tickets(self, query, limit):
+        expression = self._search_expression(query)
+        if expression is None:
+            return super().search_tickets(query, limit)
+        rows = db.session.execute(text(
+            'SELECT rowid, bm25(ticket_search) AS rank FROM ticket_search '
+            'WHERE ticket_search MATCH :expression ORDER BY rank LIMIT :limit'
+        ), {'expression': expression, 'limit': limit})
+        return [(ticket_id, rank) for ticket_id, rank in rows]
+
+
+SEARCH_BACKENDS = {
+    'like': LikeSearchBackend,
+    'sqlite_fts5': SQLiteFTS5Backend,
+}
+
+
+def _fts5_available(connection):
+    try:
+        connection.execute(text("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(value, tokenize='trigram')"))
+        connection.execute(text('DROP TABLE temp.fts5_probe'))
+        return True
+    except Exception:
+        return False
+
+
+def get_search_backend():
+    """Retourne le moteur de recherche de l'application courante."""
+    return current_app.extensions['search_index']
+
+
+def init_search_index(app):
+    """Choisit le moteur de recherche (SEARCH_BACKEND) et prépare ses tables."""
+    backend_name = app.config.get('SEARCH_BACKEND', 'auto')
+    with app.app_context():
+        try:
+            with db.engine.begin() as connection:
+                if backend_name == 'auto':
+                    is_sqlite = db.engine.dialect.name == 'sqlite'
+                    backend_name = 'sqlite_fts5' if is_sqlite and _fts5_available(connection) else 'like'
+                backend = SEARCH_BACKENDS[backend_name]()
+                backend.setup(connection)
+        except Exception as e:
+            app.logger.error(f"Index de recherche indisponible, repli sur ILIKE : {str(e)}")
+            backend = LikeSearchBackend()
+    app.extensions['search_index'] = backend
+    return backend
+
+
+def _previous_values(obj, name):
+    history = inspect(obj).attrs[name].history
+    return list(history.deleted) + [getattr(obj, name)]
+
+
+@event.listens_for(Session, 'after_flush')
+def sync_search_index(session, flush_context):
+    if not has_app_context() or 'search_index' not in current_app.extensions:
+        return
+    backend = current_app.extensions['search_index']
+    if not backend.maintains_index:
+        return
+
+    ticket_ids, client_ids = set(), set()
+    removed_tickets, removed_clients = set(), set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        deleted = obj in session.deleted
+        if isinstance(obj, Ticket):
+            (removed_tickets if deleted else ticket_ids).add(obj.id)
+        elif isinstance(obj, Client):
+            (removed_clients if deleted else client_ids).add(obj.id)
+        elif isinstance(obj, (Product, Message)):
+            ticket_ids.update(_previous_values(obj, 'ticket_id'))
+
+    connection = session.connection()
+    if client_ids:
+        backend.reindex_clients(connection, client_ids)
+        ticket_table = Ticket.__table__
+        ticket_ids.update(connection.execute(
+            select(ticket_table.c.id).where(ticket_table.c.client_id.in_(list(client_ids)))
+        ).scalars())
+    if removed_clients:
+        backend.remove_clients(connection, removed_clients)
+    if removed_tickets:
+        backend.remove_tickets(connection, removed_tickets)
+    ticket_ids -= removed_tickets
+    ticket_ids.discard(None)
+    if ticket_ids:
+        backend.reindex_tickets(connection, ticket_ids)
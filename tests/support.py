@@ -0,0 +1,31 @@
+"""Environnement commun aux tests : base SQLite et stockage temporaires.
+
+À importer avant `app` : la configuration lit DATABASE_URL à l'import, une
+seule base sert donc à tous les modules de test d'un même lancement.
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+TEMP_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEMP_DIR, 'test.db')
+os.environ.setdefault('REDIS_URL', 'redis://localhost:1/0')
+os.environ.setdefault('RESPONSE_CACHE_BACKEND', 'memory')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import app  # noqa: E402
+from extensions import db  # noqa: E402
+
+app.config['ATTACHMENT_STORE_FOLDER'] = os.path.join(TEMP_DIR, 'store')
+with app.app_context():
+    db.create_all()
+
+
+@atexit.register
+def _cleanup():
+    with app.app_context():
+        db.engine.dispose()
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
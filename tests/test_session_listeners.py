@@ -0,0 +1,186 @@
+import io
+import os
+import unittest
+
+# En premier : prépare la base temporaire avant l'import de la configuration
+from support import app
+from sqlalchemy import func
+
+from extensions import db
+from models import User, Client, Ticket, Product, Attachment, TicketDailyStat
+from data_versions import get_data_versions
+from search_index import get_search_backend
+from attachment_store import attachment_store
+
+
+class TestSessionListeners(unittest.TestCase):
+    """Tests des événements de session : cumuls, index de recherche, versions et fichiers.
+
+    Chaque test passe par l'ORM comme les routes (création, modification,
+    suppression puis commit) et vérifie ce que les listeners ont maintenu.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        with app.app_context():
+            attachment_store.init_app(app)
+            attachment_store.grace = 0
+            user = User('tester', 'tester@example.com', 'secret')
+            db.session.add(user)
+            db.session.commit()
+            cls.user_id = user.id
+        cls.client_count = 0
+
+    def setUp(self):
+        """Un client par test : ses cumuls ne dépendent que du test."""
+        self.context = app.app_context()
+        self.context.push()
+        TestSessionListeners.client_count += 1
+        number = TestSessionListeners.client_count
+        client = Client(account_number=f'LST{number:03d}', name=f'Client Listener {number}', email=f'lst{number}@example.com')
+        db.session.add(client)
+        db.session.commit()
+        self.client_id = client.id
+
+    def tearDown(self):
+        db.session.rollback()
+        db.session.remove()
+        self.context.pop()
+
+    def create_ticket(self, **values):
+        ticket = Ticket(client_id=self.client_id, return_type='retour_client', **values)
+        db.session.add(ticket)
+        db.session.commit()
+        return ticket
+
+    def daily_stats(self):
+        """(tickets, montant, montant validé) cumulés du client du test."""
+        return tuple(db.session.query(
+            func.coalesce(func.sum(TicketDailyStat.ticket_count), 0),
+            func.coalesce(func.sum(TicketDailyStat.refund_sum), 0.0),
+            func.coalesce(func.sum(TicketDailyStat.validated_refund_sum), 0.0)
+        ).filter(TicketDailyStat.client_id == self.client_id).one())
+
+    def refund_total(self, ticket_id):
+        db.session.expire_all()
+        return db.session.get(Ticket, ticket_id).refund_total
+
+    def test_refund_total_and_daily_stats(self):
+        """Le total remboursé et les cumuls journaliers suivent tickets et produits."""
+        ticket = self.create_ticket(shipping_cost_refund=True, shipping_cost_amount=10.0)
+        self.assertEqual(self.refund_total(ticket.id), 10.0)
+        self.assertEqual(self.daily_stats(), (1, 10.0, 0.0))
+
+        product = Product('Écran', 25.0, ticket.id, product_ref=f'REF-LST-{ticket.id}')
+        db.session.add(product)
+        db.session.commit()
+        self.assertEqual(self.refund_total(ticket.id), 35.0)
+        self.assertEqual(self.daily_stats(), (1, 35.0, 0.0))
+
+        product = db.session.get(Product, product.id)
+        product.price = 40.0
+        ticket = db.session.get(Ticket, ticket.id)
+        ticket.status = 'valide'
+        ticket.credit_note_validated = True
+        db.session.commit()
+        self.assertEqual(self.refund_total(ticket.id), 50.0)
+        self.assertEqual(self.daily_stats(), (1, 50.0, 50.0))
+
+        db.session.delete(db.session.get(Product, product.id))
+        db.session.commit()
+        self.assertEqual(self.refund_total(ticket.id), 10.0)
+
+        db.session.delete(db.session.get(Ticket, ticket.id))
+        db.session.commit()
+        self.assertEqual(self.daily_stats(), (0, 0.0, 0.0))
+
+    def test_rollback_leaves_daily_stats_unchanged(self):
+        """Une transaction annulée ne laisse rien dans les cumuls."""
+        self.create_ticket()
+        db.session.add(Ticket(client_id=self.client_id, return_type='retour_magasin'))
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual(self.daily_stats(), (1, 0.0, 0.0))
+
+    def test_search_index_follows_changes(self):
+        """Le ticket est trouvé par son client, et ne l'est plus une fois supprimé."""
+        search = get_search_backend()
+        ticket = self.create_ticket()
+        client_name = db.session.get(Client, self.client_id).name
+        hits = [ticket_id for ticket_id, rank in search.search_tickets(client_name, 50)]
+        self.assertIn(ticket.id, hits)
+
+        client = db.session.get(Client, self.client_id)
+        client.name = 'Renommé Listener'
+        db.session.commit()
+        self.assertNotIn(ticket.id, [ticket_id for ticket_id, rank in search.search_tickets(client_name, 50)])
+        self.assertIn(ticket.id, [ticket_id for ticket_id, rank in search.search_tickets('Renommé Listener', 50)])
+
+        ticket_id = ticket.id
+        db.session.delete(db.session.get(Ticket, ticket_id))
+        db.session.commit()
+        self.assertNotIn(ticket_id, [ticket_id for ticket_id, rank in search.search_tickets('Renommé Listener', 50)])
+
+    def test_search_index_product_refs(self):
+        """Ajouter un produit réindexe son ticket (références produit, FTS5 seulement)."""
+        if not get_search_backend().maintains_index:
+            self.skipTest('Index FTS5 indisponible : les références produit ne sont pas indexées')
+        ticket = self.create_ticket()
+        reference = f'PRODREF{ticket.id:05d}'
+        db.session.add(Product('Clavier', 15.0, ticket.id, product_ref=reference))
+        db.session.commit()
+        hits = [ticket_id for ticket_id, rank in get_search_backend().search_tickets(reference, 10)]
+        self.assertEqual(hits, [ticket.id])
+
+    def test_data_versions(self):
+        """Les versions changent au commit d'une modification, pas après une annulation."""
+        before = get_data_versions(('ticket', 'client', 'credit_note'))
+        ticket = self.create_ticket()
+        after_create = get_data_versions(('ticket', 'client', 'credit_note'))
+        self.assertGreater(after_create[0], before[0])
+
+        ticket = db.session.get(Ticket, ticket.id)
+        ticket.status = 'refuse'
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual(get_data_versions(('ticket', 'client', 'credit_note')), after_create)
+
+        ticket = db.session.get(Ticket, ticket.id)
+        ticket.credit_note_validated = True
+        db.session.commit()
+        after_credit_note = get_data_versions(('ticket', 'client', 'credit_note'))
+        self.assertGreater(after_credit_note[0], after_create[0])
+        self.assertGreater(after_credit_note[2], after_create[2])
+
+    def test_attachment_file_released_after_commit(self):
+        """Le fichier d'une pièce jointe est supprimé au commit de sa suppression, pas avant."""
+        ticket = self.create_ticket()
+        content = f'bon de commande {ticket.id}'.encode('utf-8')
+        digest, size = attachment_store.save(io.BytesIO(content))
+        attachments = [
+            Attachment(ticket_id=ticket.id, user_id=self.user_id, filename=f'{digest}-{i}', original_filename='bon.pdf',
+                       file_type='application/pdf', file_size=size, content_hash=digest)
+            for i in range(2)
+        ]
+        db.session.add_all(attachments)
+        db.session.commit()
+        path = attachment_store.path_for_hash(digest)
+
+        # Suppression annulée : le fichier reste
+        db.session.delete(db.session.get(Attachment, attachments[0].id))
+        db.session.flush()
+        db.session.rollback()
+        self.assertTrue(os.path.exists(path))
+
+        # Encore référencé par la seconde pièce jointe : le fichier reste
+        db.session.delete(db.session.get(Attachment, attachments[0].id))
+        db.session.commit()
+        self.assertTrue(os.path.exists(path))
+
+        db.session.delete(db.session.get(Attachment, attachments[1].id))
+        db.session.commit()
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+
+# En premier : prépare la base temporaire avant l'import de la configuration
+from support import app
+
+from extensions import db
+from models import User, Client, Ticket
+from ticket_batch import bulk_validate_credit_notes
+
+
+class TestBulkValidateCreditNotes(unittest.TestCase):
+    """Tests de la validation groupée des avoirs : unicité des numéros et tout ou rien."""
+
+    @classmethod
+    def setUpClass(cls):
+        with app.app_context():
+            user = User('batcher', 'batcher@example.com', 'secret')
+            client = Client(account_number='BAT001', name='Client Lot', email='bat001@example.com')
+            db.session.add_all([user, client])
+            db.session.commit()
+            cls.user_id = user.id
+            cls.client_id = client.id
+
+    def setUp(self):
+        self.context = app.app_context()
+        self.context.push()
+
+    def tearDown(self):
+        db.session.rollback()
+        db.session.remove()
+        self.context.pop()
+
+    def create_ticket(self, credit_note_number=None):
+        ticket = Ticket(client_id=self.client_id, return_type='retour_client')
+        ticket.credit_note_number = credit_note_number
+        db.session.add(ticket)
+        db.session.commit()
+        return ticket.id
+
+    def credit_note(self, ticket_id):
+        """(numéro, validé) de l'avoir du ticket, relu en base."""
+        db.session.expire_all()
+        ticket = db.session.get(Ticket, ticket_id)
+        return ticket.credit_note_number, ticket.credit_note_validated
+
+    def validate(self, *entries):
+        return bulk_validate_credit_notes(
+            [{'ticket_id': ticket_id, 'credit_note_number': number, 'credit_note_date': '2026-10-01'}
+             for ticket_id, number in entries],
+            self.user_id
+        )
+
+    def test_validates_every_ticket(self):
+        """Chaque ticket du lot reçoit son numéro d'avoir et est validé."""
+        first, second = self.create_ticket(), self.create_ticket()
+        result = self.validate((first, 'AV-OK-1'), (second, 'AV-OK-2'))
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual(result.to_dict()['updated'], 2)
+        self.assertEqual(self.credit_note(first), ('AV-OK-1', True))
+        self.assertEqual(self.credit_note(second), ('AV-OK-2', True))
+
+    def test_number_used_by_another_ticket(self):
+        """Un numéro déjà attribué hors du lot est refusé, et aucun ticket n'est modifié."""
+        owner = self.create_ticket('AV-PRIS')
+        first, second = self.create_ticket(), self.create_ticket()
+        result = self.validate((first, 'AV-LIBRE'), (second, 'AV-PRIS'))
+        self.assertFalse(result.ok)
+        self.assertEqual(result.errors, [{'ticket_id': second, 'message': "Ce numéro d'avoir existe déjà : AV-PRIS"}])
+        self.assertEqual(self.credit_note(first), (None, False))
+        self.assertEqual(self.credit_note(owner), ('AV-PRIS', False))
+
+    def test_ticket_gives_up_its_old_number(self):
+        """Un ticket du lot qui change de numéro libère l'ancien pour un autre ticket du lot."""
+        first = self.create_ticket('AV-ANCIEN')
+        second = self.create_ticket()
+        result = self.validate((first, 'AV-NOUVEAU'), (second, 'AV-ANCIEN'))
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual(self.credit_note(first), ('AV-NOUVEAU', True))
+        self.assertEqual(self.credit_note(second), ('AV-ANCIEN', True))
+
+    def test_tickets_swap_numbers(self):
+        """Deux tickets du lot peuvent échanger leurs numéros."""
+        first, second = self.create_ticket('AV-SWAP-1'), self.create_ticket('AV-SWAP-2')
+        result = self.validate((first, 'AV-SWAP-2'), (second, 'AV-SWAP-1'))
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual(self.credit_note(first), ('AV-SWAP-2', True))
+        self.assertEqual(self.credit_note(second), ('AV-SWAP-1', True))
+
+    def test_ticket_keeping_its_number_blocks_it(self):
+        """Un ticket du lot qui garde son numéro ne le libère pas."""
+        first = self.create_ticket('AV-GARDE')
+        second = self.create_ticket()
+        result = self.validate((first, 'AV-GARDE'), (second, 'AV-GARDE'))
+        self.assertFalse(result.ok)
+        self.assertEqual(self.credit_note(first), ('AV-GARDE', False))
+
+    def test_errors_roll_back_the_whole_batch(self):
+        """Doublon dans le lot, date invalide ou ticket inconnu : rien n'est écrit."""
+        first, second, third = self.create_ticket(), self.create_ticket(), self.create_ticket()
+        result = bulk_validate_credit_notes([
+            {'ticket_id': first, 'credit_note_number': 'AV-DBL', 'credit_note_date': '2026-10-01'},
+            {'ticket_id': second, 'credit_note_number': 'AV-DBL', 'credit_note_date': '2026-10-01'},
+            {'ticket_id': third, 'credit_note_number': 'AV-DATE', 'credit_note_date': '01/10/2026'},
+            {'ticket_id': 999999, 'credit_note_number': 'AV-INCONNU', 'credit_note_date': '2026-10-01'},
+        ], self.user_id)
+        self.assertFalse(result.ok)
+        self.assertEqual(sorted(error['ticket_id'] for error in result.errors), [second, third, 999999])
+        self.assertEqual(result.to_dict()['updated'], 0)
+        for ticket_id in (first, second, third):
+            self.assertEqual(self.credit_note(ticket_id), (None, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
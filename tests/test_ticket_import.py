@@ -0,0 +1,114 @@
+import unittest
+
+# En premier : prépare la base temporaire avant l'import de la configuration
+from support import app
+
+from extensions import db
+from models import Client, Ticket, Product
+from ticket_import import ImportResult, validate_rows, import_tickets
+
+
+def row(line, reference=None, product_ref=None, account_number='IMP001', **values):
+    """Ligne de fichier déjà lue : (n° de ligne, dict) comme read_import_file."""
+    values = dict({'account_number': account_number, 'return_type': 'retour_client',
+                   'product_name': 'Produit', 'refund_amount': '10,50'}, **values)
+    if reference:
+        values['request_ref'] = reference
+    if product_ref:
+        values['product_ref'] = product_ref
+    return line, values
+
+
+class TestTicketImport(unittest.TestCase):
+    """Tests de l'import de tickets : regroupement, références produit et tout ou rien."""
+
+    @classmethod
+    def setUpClass(cls):
+        with app.app_context():
+            client = Client(account_number='IMP001', name='Client Import', email='imp001@example.com')
+            db.session.add(client)
+            db.session.commit()
+            ticket = Ticket(client_id=client.id, return_type='retour_client')
+            db.session.add(ticket)
+            db.session.commit()
+            db.session.add(Product('Existant', 5.0, ticket.id, product_ref='IMP-EXISTANT'))
+            db.session.commit()
+
+    def setUp(self):
+        self.context = app.app_context()
+        self.context.push()
+
+    def tearDown(self):
+        db.session.rollback()
+        db.session.remove()
+        self.context.pop()
+
+    def counts(self):
+        return Ticket.query.count(), Product.query.count()
+
+    def test_rows_grouped_by_reference(self):
+        """Les lignes d'une même référence forment un ticket ; une ligne sans référence est seule."""
+        result = ImportResult()
+        tickets = validate_rows([
+            row(2, 'DEM-1', 'IMP-G-1'),
+            row(3, product_ref='IMP-G-2'),
+            row(4, 'DEM-1', 'IMP-G-3'),
+        ], result)
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual([ticket['line'] for ticket in tickets], [2, 3])
+        self.assertEqual([product['product_ref'] for product in tickets[0]['products']], ['IMP-G-1', 'IMP-G-3'])
+        self.assertEqual(tickets[0]['products'][0]['price'], 10.5)
+
+    def test_import_creates_tickets_and_products(self):
+        """L'import crée les tickets groupés et leurs produits en une transaction."""
+        before = self.counts()
+        result = import_tickets([
+            row(2, 'DEM-2', 'IMP-C-1'),
+            row(3, 'DEM-2', 'IMP-C-2'),
+            row(4, 'DEM-3', 'IMP-C-3'),
+        ])
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual(len(result.ticket_numbers), 2)
+        self.assertEqual(result.product_count, 3)
+        self.assertEqual(self.counts(), (before[0] + 2, before[1] + 3))
+        ticket = Ticket.query.filter_by(ticket_number=result.ticket_numbers[0]).one()
+        self.assertEqual(ticket.refund_total, 21.0)
+
+    def test_duplicate_product_ref_in_file(self):
+        """Une référence produit répétée dans le fichier est signalée sur sa seconde ligne."""
+        result = ImportResult()
+        validate_rows([row(2, product_ref='IMP-DBL'), row(3, product_ref='IMP-DBL')], result)
+        self.assertEqual(result.errors, [
+            {'line': 3, 'message': 'Référence produit en double dans le fichier (ligne 2) : IMP-DBL'}
+        ])
+
+    def test_product_ref_already_in_database(self):
+        """Une référence produit déjà présente en base est refusée."""
+        result = ImportResult()
+        validate_rows([row(2, product_ref='IMP-NEUF'), row(3, product_ref='IMP-EXISTANT')], result)
+        self.assertEqual(result.errors, [{'line': 3, 'message': 'Référence produit déjà utilisée : IMP-EXISTANT'}])
+
+    def test_errors_import_nothing(self):
+        """Une seule ligne en erreur et aucun ticket n'est créé, même pour les lignes valides."""
+        before = self.counts()
+        result = import_tickets([
+            row(2, 'DEM-4', 'IMP-R-1'),
+            row(3, 'DEM-5', 'IMP-R-2', account_number='INCONNU'),
+            row(4, 'DEM-6', 'IMP-R-3', refund_amount='abc'),
+        ])
+        self.assertFalse(result.ok)
+        self.assertEqual([error['line'] for error in result.errors], [3, 4])
+        self.assertEqual(result.ticket_numbers, [])
+        self.assertEqual(self.counts(), before)
+
+    def test_dry_run_imports_nothing(self):
+        """Un essai à blanc valide et compte les tickets sans rien écrire."""
+        before = self.counts()
+        result = import_tickets([row(2, 'DEM-7', 'IMP-D-1'), row(3, 'DEM-7', 'IMP-D-2')], dry_run=True)
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual(result.planned_count, 1)
+        self.assertEqual(self.counts(), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from batching import OperationResult, chunked
+from extensions import db
+from models import Ticket
+
+TICKET_STATUSES = ('en_attente', 'valide', 'refuse')
+
+
+class BatchResult(OperationResult):
+    """Résultat d'une action groupée : tickets modifiés ou erreurs par ticket (rien n'est modifié s'il y en a)."""
+
+    error_key = 'ticket_id'
+
+    def __init__(self):
+        super().__init__()
+        self.changes = []
+
+    def to_dict(self):
+        return dict(super().to_dict(), **{
+            'updated': len(self.changes) if self.ok else 0,
+            'ticket_numbers': [change['ticket_number'] for change in self.changes] if self.ok else []
+        })
+
+
+def _ticket_ids(values, result):
+    ids = []
+    for value in values or []:
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            result.error(value, f"Identifiant de ticket invalide : '{value}'")
+    return list(dict.fromkeys(ids))
+
+
+def _load_tickets(ticket_ids, result):
+    """Charge les tickets (et leur client) en une requête par bloc."""
+    tickets = {}
+    for chunk in chunked(ticket_ids):
+        query = Ticket.query.options(joinedload(Ticket.client)).filter(Ticket.id.in_(chunk))
+        tickets.update((ticket.id, ticket) for ticket in query)
+    for ticket_id in ticket_ids:
+        if ticket_id not in tickets:
+            result.error(ticket_id, 'Ticket introuvable')
+    return tickets
+
+
+def _change(ticket, old_status):
+    return {
+        'id': ticket.id,
+        'ticket_number': ticket.ticket_number,
+        'client_name': ticket.client.name if ticket.client else None,
+        'account_number': ticket.client.account_number if ticket.client else None,
+        'old_status': old_status,
+        'new_status': ticket.status
+    }
+
+
+def _commit(result):
+    if not result.ok:
+        db.session.rollback()
+        return result
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result
+
+
+def bulk_update_status(ticket_ids, status, max_tickets=None):
+    """Passe tous les tickets au statut `status` en une transaction ; tout ou rien.
+
+    Les tickets sont modifiés via l'ORM : les statistiques, l'index de recherche
+    et le cache sont mis à jour par les événements habituels, une seule fois.
+    """
+    result = BatchResult()
+    if status not in TICKET_STATUSES:
+        result.error(None, f"Statut invalide : '{status}'")
+        return result
+    ids = _ticket_ids(ticket_ids, result)
+    if not ids and result.ok:
+        result.error(None, 'Aucun ticket sélectionné')
+    if max_tickets and len(ids) > max_tickets:
+        result.error(None, f"Trop de tickets ({len(ids)}), maximum {max_tickets}")
+    if not result.ok:
+        return result
+
+    tickets = _load_tickets(ids, result)
+    now = datetime.now(timezone.utc)
+    for ticket_id in ids:
+        ticket = tickets.get(ticket_id)
+        if ticket is None or ticket.status == status:
+            continue
+        old_status = ticket.status
+        ticket.status = status
+        ticket.updated_at = now
+        result.changes.append(_change(ticket, old_status))
+    return _commit(result)
+
+
+def bulk_validate_credit_notes(entries, user_id, max_tickets=None):
+    """Valide les avoirs de plusieurs tickets en une transaction ; tout ou rien.
+
+    `entries` : liste de dicts ticket_id, credit_note_number, credit_note_date
+    (AAAA-MM-JJ). L'unicité des numéros est contrôlée dans le lot puis en base,
+    en une requête ensembliste.
+    """
+    result = BatchResult()
+    if not entries:
+        result.error(None, 'Aucun avoir à valider')
+        return result
+    if max_tickets and len(entries) > max_tickets:
+        result.error(None, f"Trop de tickets ({len(entries)}), maximum {max_tickets}")
+        return result
+
+    numbers = {}  # ticket_id -> numéro d'avoir demandé
+    dates = {}
+    owners = {}  # numéro -> ticket_id du lot
+    for entry in entries:
+        ticket_id = entry.get('ticket_id')
+        try:
+            ticket_id = int(ticket_id)
+        except (TypeError, ValueError):
+            result.error(ticket_id, f"Identifiant de ticket invalide : '{ticket_id}'")
+            continue
+        number = str(entry.get('credit_note_number') or '').strip()
+        date = str(entry.get('credit_note_date') or '').strip()
+        if not number or not date:
+            result.error(ticket_id, 'Numéro et date d\'avoir obligatoires')
+            continue
+        if ticket_id in numbers:
+            result.error(ticket_id, 'Ticket présent plusieurs fois dans le lot')
+            continue
+        try:
+            dates[ticket_id] = datetime.strptime(date, '%Y-%m-%d').date()
+        except ValueError:
+            result.error(ticket_id, f"Date d'avoir invalide : '{date}'")
+            continue
+        if number in owners:
+            result.error(ticket_id, f"Numéro d'avoir en double dans le lot : {number}")
+            continue
+        owners[number] = ticket_id
+        numbers[ticket_id] = number
+
+    # Numéros déjà attribués en base : une requête par bloc, pas une par ticket
+    ticket_table = Ticket.__table__
+    for chunk in chunked(owners):
+        rows = db.session.execute(
+            select(ticket_table.c.id, ticket_table.c.credit_note_number)
+            .where(ticket_table.c.credit_note_number.in_(chunk))
+        )
+        for owner_id, number in rows:
+            # Un ticket du lot qui change de numéro libère l'ancien
+            if owner_id != owners[number] and numbers.get(owner_id, number) == number:
+                result.error(owners[number], f"Ce numéro d'avoir existe déjà : {number}")
+
+    tickets = _load_tickets(list(numbers), result)
+    if not result.ok:
+        db.session.rollback()
+        return result
+
+    for ticket_id, number in numbers.items():
+        ticket = tickets.get(ticket_id)
+        if ticket is None:
+            continue
+        ticket.credit_note_number = number
+        ticket.credit_note_date = dates[ticket_id]
+        ticket.credit_note_validated = True
+        ticket.credit_note_validated_by = user_id
+        result.changes.append(_change(ticket, ticket.status))
+    return _commit(result)
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta, time
+
+from models import Ticket
+from search_index import get_search_backend
+
+
+def apply_ticket_filters(query, params):
+    """Applique les filtres du formulaire de recherche à une requête jointe à Client.
+
+    `params` est un MultiDict (request.form ou request.args) : la même fonction
+    sert à la recherche et aux exports.
+    """
+    # Recherche libre et filtres texte via l'index plein texte
+    search = get_search_backend()
+    q = params.get('q', '').strip()
+    if q:
+        query = query.filter(search.search_condition(q))
+
+    # Filtres sur les informations client
+    for field in ('account_number', 'client_name', 'client_email'):
+        value = params.get(field)
+        if value:
+            query = query.filter(search.ticket_condition(field, value))
+
+    # Filtres sur les informations ticket
+    ticket_number = params.get('ticket_number')
+    if ticket_number:
+        query = query.filter(search.ticket_condition('ticket_number', ticket_number))
+
+    status = params.getlist('status')
+    if status:
+        query = query.filter(Ticket.status.in_(status))
+
+    return_type = params.getlist('return_type')
+    if return_type:
+        query = query.filter(Ticket.return_type.in_(return_type))
+
+    # Filtres supplémentaires
+    fault_attribution = params.get('fault_attribution')
+    if fault_attribution:
+        query = query.filter(Ticket.fault_attribution == fault_attribution)
+
+    return_reason = params.get('return_reason')
+    if return_reason:
+        query = query.filter(Ticket.return_reason == return_reason)
+
+    has_attachments = params.get('has_attachments')
+    if has_attachments:
+        query = query.filter(Ticket.attachments.any())
+
+    # Filtres de date
+    date_range = params.get('date_range')
+    if date_range:
+        today = datetime.now().date()
+
+        if date_range == 'today':
+            query = query.filter(
+                Ticket.created_at >= datetime.combine(today, time.min),
+                Ticket.created_at <= datetime.combine(today, time.max)
+            )
+        elif date_range == 'yesterday':
+            yesterday = today - timedelta(days=1)
+            query = query.filter(
+                Ticket.created_at >= datetime.combine(yesterday, time.min),
+                Ticket.created_at <= datetime.combine(yesterday, time.max)
+            )
+        elif date_range == 'last_7_days':
+            seven_days_ago = today - timedelta(days=7)
+            query = query.filter(
+                Ticket.created_at >= datetime.combine(seven_days_ago, time.min),
+                Ticket.created_at <= datetime.combine(today, time.max)
+            )
+        elif date_range == 'last_30_days':
+            thirty_days_ago = today - timedelta(days=30)
+            query = query.filter(
+                Ticket.created_at >= datetime.combine(thirty_days_ago, time.min),
+                Ticket.created_at <= datetime.combine(today, time.max)
+            )
+        elif date_range == 'this_month':
+            first_day = today.replace(day=1)
+            query = query.filter(
+                Ticket.created_at >= datetime.combine(first_day, time.min),
+                Ticket.created_at <= datetime.combine(today, time.max)
+            )
+        elif date_range == 'last_month':
+            first_day_last_month = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+            last_day_last_month = today.replace(day=1) - timedelta(days=1)
+            query = query.filter(
+                Ticket.created_at >= datetime.combine(first_day_last_month, time.min),
+                Ticket.created_at <= datetime.combine(last_day_last_month, time.max)
+            )
+    else:
+        # Utilisation des dates personnalisées
+        start_date = params.get('start_date')
+        end_date = params.get('end_date')
+
+        if start_date:
+            query = query.filter(Ticket.created_at >= datetime.combine(
+                datetime.strptime(start_date, '%Y-%m-%d').date(),
+                time.min
+            ))
+
+        if end_date:
+            query = query.filter(Ticket.created_at <= datetime.combine(
+                datetime.strptime(end_date, '%Y-%m-%d').date(),
+                time.max
+            ))
+    
+    return query
@@ -0,0 +1,279 @@
+import csv
+import io
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select
+
+from batching import OperationResult, chunked
+from extensions import db
+from models import (Client, Ticket, Product, reserve_ticket_numbers, format_ticket_number,
+                    refresh_refund_totals, refresh_daily_stats)
+from response_cache import record_changes
+from search_index import get_search_backend
+
+try:
+    import openpyxl
+except ImportError:  # dépendance optionnelle, pour les fichiers .xlsx
+    openpyxl = None
+
+# Colonnes reconnues : nom interne -> en-têtes acceptés (casse et espaces ignorés)
+IMPORT_COLUMNS = {
+    'request_ref': ('request_ref', 'reference', 'référence', 'n° demande'),
+    'account_number': ('account_number', 'compte', 'n° compte'),
+    'return_type': ('return_type', 'type retour', 'type_retour'),
+    'fault_attribution': ('fault_attribution', 'attribution faute', 'attribution'),
+    'return_reason': ('return_reason', 'motif retour', 'motif'),
+    'return_reason_details': ('return_reason_details', 'détails', 'details'),
+    'shipping_cost_amount': ('shipping_cost_amount', 'frais transport', 'frais_transport'),
+    'packaging_cost_amount': ('packaging_cost_amount', 'frais emballage', 'frais_emballage'),
+    'product_ref': ('product_ref', 'réf produit', 'ref produit', 'ref_produit'),
+    'product_name': ('product_name', 'produit', 'désignation'),
+    'refund_amount': ('refund_amount', 'montant', 'montant remboursé'),
+}
+HEADER_ALIASES = {alias: name for name, aliases in IMPORT_COLUMNS.items() for alias in aliases}
+
+RETURN_TYPES = ('retour_client', 'retour_magasin', 'retour_garantie')
+PRODUCT_FIELDS = ('product_ref', 'product_name', 'refund_amount')
+
+
+class ImportResult(OperationResult):
+    """Résultat d'un import : numéros créés ou erreurs par ligne (rien n'est créé s'il y en a)."""
+
+    error_key = 'line'
+
+    def __init__(self):
+        super().__init__()
+        self.ticket_numbers = []
+        self.product_count = 0
+        self.row_count = 0
+        self.planned_count = 0
+        self.dry_run = False
+
+    def to_dict(self):
+        return dict(super().to_dict(), **{
+            'dry_run': self.dry_run,
+            'rows': self.row_count,
+            'tickets_to_create': self.planned_count,
+            'tickets': len(self.ticket_numbers),
+            'products': self.product_count,
+            'ticket_numbers': self.ticket_numbers
+        })
+
+
+# Lecture des fichiers
+
+def _normalize_header(header):
+    return ' '.join(str(header or '').strip().lower().split())
+
+
+def _rows_from_table(table):
+    """Transforme un tableau (en-têtes puis lignes) en (n° de ligne, dict)."""
+    table = iter(table)
+    headers = [HEADER_ALIASES.get(_normalize_header(header)) for header in next(table, [])]
+    if 'account_number' not in headers:
+        raise ValueError("Colonne 'account_number' (ou 'compte') introuvable")
+    for line, values in enumerate(table, start=2):
+        row = {}
+        for name, value in zip(headers, values):
+            if name and value is not None and str(value).strip() != '':
+                row[name] = value if isinstance(value, (int, float)) else str(value).strip()
+        if row:
+            yield line, row
+
+
+def read_csv(stream):
+    raw = stream.read()
+    try:
+        text = raw.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = raw.decode('cp1252')
+    # Les tableurs français exportent en général avec ';'
+    first_line = text.split('\n', 1)[0]
+    delimiter = ';' if first_line.count(';') >= first_line.count(',') else ','
+    return list(_rows_from_table(csv.reader(io.StringIO(text), delimiter=delimiter)))
+
+
+def read_xlsx(stream):
+    if openpyxl is None:
+        raise RuntimeError("L'import de fichiers .xlsx nécessite openpyxl (pip install openpyxl)")
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        return list(_rows_from_table(workbook.worksheets[0].iter_rows(values_only=True)))
+    finally:
+        workbook.close()
+
+
+def read_import_file(stream, filename):
+    """Lit un fichier CSV ou XLSX ; retourne la liste des (n° de ligne, dict)."""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.xlsx':
+        return read_xlsx(stream)
+    if extension in ('.csv', '.txt'):
+        return read_csv(stream)
+    raise ValueError(f"Format de fichier non pris en charge : {extension or filename}")
+
+
+# Validation
+
+def _amount(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    return float(str(value).replace('€', '').replace(' ', '').replace(',', '.'))
+
+
+def _existing_values(column, values):
+    """Valeurs de `column` déjà présentes en base -> id, en une requête par bloc."""
+    found = {}
+    for chunk in chunked(values):
+        rows = db.session.execute(select(column.table.c.id, column).where(column.in_(chunk)))
+        found.update((value, row_id) for row_id, value in rows)
+    return found
+
+
+def validate_rows(rows, result):
+    """Regroupe les lignes en tickets et contrôle toutes les valeurs avant toute écriture.
+
+    Les lignes d'un même `request_ref` forment un seul ticket (une ligne par
+    produit) ; une ligne sans référence est un ticket à elle seule.
+    """
+    tickets = []
+    by_ref = {}
+    product_refs = {}
+    for line, row in rows:
+        result.row_count += 1
+        ref = row.get('request_ref')
+        ticket = by_ref.get(ref) if ref else None
+        if ticket is None:
+            ticket = {'line': line, 'products': []}
+            account_number = str(row.get('account_number', '')).strip().upper()
+            if not account_number:
+                result.error(line, 'Numéro de compte client manquant')
+            return_type = row.get('return_type', '')
+            if return_type not in RETURN_TYPES:
+                result.error(line, f"Type de retour invalide : '{return_type}'")
+            ticket['account_number'] = account_number
+            ticket['return_type'] = return_type
+            for name in ('fault_attribution', 'return_reason', 'return_reason_details'):
+                ticket[name] = row.get(name)
+            for name in ('shipping_cost_amount', 'packaging_cost_amount'):
+                try:
+                    ticket[name] = _amount(row[name]) if name in row else 0.0
+                except ValueError:
+                    result.error(line, f"Montant invalide pour {name} : '{row[name]}'")
+            tickets.append(ticket)
+            if ref:
+                by_ref[ref] = ticket
+
+        if not any(name in row for name in PRODUCT_FIELDS):
+            continue
+        if not row.get('product_name') or 'refund_amount' not in row:
+            result.error(line, 'Produit incomplet : désignation et montant sont obligatoires')
+            continue
+        try:
+            price = _amount(row['refund_amount'])
+        except ValueError:
+            result.error(line, f"Montant invalide : '{row['refund_amount']}'")
+            continue
+        product_ref = row.get('product_ref')
+        if product_ref:
+            product_ref = str(product_ref)
+            if product_ref in product_refs:
+                result.error(line, f"Référence produit en double dans le fichier (ligne {product_refs[product_ref]}) : {product_ref}")
+            product_refs[product_ref] = line
+        ticket['products'].append({'line': line, 'name': row['product_name'], 'price': price, 'product_ref': product_ref})
+
+    # Clients et références produits contrôlés en une requête (par bloc) chacun
+    accounts = {ticket['account_number'] for ticket in tickets if ticket['account_number']}
+    clients = _existing_values(Client.__table__.c.account_number, accounts)
+    for ticket in tickets:
+        if ticket['account_number'] and ticket['account_number'] not in clients:
+            result.error(ticket['line'], f"Client inconnu : {ticket['account_number']}")
+        ticket['client_id'] = clients.get(ticket['account_number'])
+    for product_ref in _existing_values(Product.__table__.c.product_ref, product_refs):
+        result.error(product_refs[product_ref], f"Référence produit déjà utilisée : {product_ref}")
+    result.errors.sort(key=lambda error: error['line'])
+    return tickets
+
+
+# Insertion
+
+def insert_tickets(tickets, result):
+    """Insère les tickets validés et leurs produits dans la transaction de db.session."""
+    connection = db.session.connection()
+    now = datetime.now(timezone.utc)
+    first_number = reserve_ticket_numbers(connection, len(tickets))
+
+    ticket_rows = []
+    for offset, ticket in enumerate(tickets):
+        ticket['ticket_number'] = format_ticket_number(first_number + offset)
+        ticket_rows.append({
+            'ticket_number': ticket['ticket_number'],
+            'client_id': ticket['client_id'],
+            'return_type': ticket['return_type'],
+            'status': 'en_attente',
+            'created_at': now,
+            'updated_at': now,
+            'fault_attribution': ticket['fault_attribution'],
+            'return_reason': ticket['return_reason'],
+            'return_reason_details': ticket['return_reason_details'],
+            'shipping_cost_refund': ticket['shipping_cost_amount'] > 0,
+            'shipping_cost_amount': ticket['shipping_cost_amount'],
+            'packaging_cost_refund': ticket['packaging_cost_amount'] > 0,
+            'packaging_cost_amount': ticket['packaging_cost_amount'],
+        })
+    ticket_table = Ticket.__table__
+    ticket_ids = {}
+    for chunk in chunked(ticket_rows):
+        rows = connection.execute(
+            insert(ticket_table).returning(ticket_table.c.id, ticket_table.c.ticket_number),
+            chunk
+        )
+        ticket_ids.update((number, ticket_id) for ticket_id, number in rows)
+
+    product_rows = []
+    for ticket in tickets:
+        ticket_id = ticket_ids[ticket['ticket_number']]
+        for position, product in enumerate(ticket['products'], start=1):
+            product_rows.append({
+                'ticket_id': ticket_id,
+                'name': product['name'],
+                'price': product['price'],
+                'product_ref': product['product_ref'] or f"{ticket['ticket_number']}-{position}",
+                'created_at': now,
+                'updated_at': now,
+            })
+    for chunk in chunked(product_rows):
+        connection.execute(insert(Product.__table__), chunk)
+
+    # Les insertions groupées contournent les événements ORM : mêmes mises à jour, en bloc
+    ids = list(ticket_ids.values())
+    refresh_refund_totals(connection, ids)
+    refresh_daily_stats(connection, {(now.date(), ticket['client_id']) for ticket in tickets})
+    get_search_backend().reindex_tickets(connection, ids)
+    record_changes(db.session, {'ticket', 'credit_note'} | {f"client:{ticket['client_id']}" for ticket in tickets})
+
+    result.ticket_numbers = [ticket['ticket_number'] for ticket in tickets]
+    result.product_count = len(product_rows)
+
+
+def import_tickets(rows, dry_run=False, max_rows=None):
+    """Valide puis importe les lignes en une transaction ; tout ou rien."""
+    result = ImportResult()
+    result.dry_run = dry_run
+    if max_rows and len(rows) > max_rows:
+        result.error(0, f"Trop de lignes ({len(rows)}), maximum {max_rows}")
+        return result
+    tickets = validate_rows(rows, result)
+    result.planned_count = len(tickets)
+    if not tickets and result.ok:
+        result.error(0, 'Aucune ligne à importer')
+    if not result.ok or dry_run:
+        return result
+    try:
+        insert_tickets(tickets, result)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result